@@ -4,9 +4,27 @@ const int numSensors = 5; // Nombre de capteurs
 const float R_fixed = 9100.0; // Résistance fixe du pont diviseur (9.1kΩ)
 const float V_in = 3.3; // Tension d'alimentation (3.3V)
 
+// Mode binaire : 1 trame compacte par lecture au lieu de 5 lignes texte.
+// Les valeurs ADC brutes sont envoyées, la conversion en résistance est faite sur le PC.
+#define BINARY_MODE 0
+const unsigned long samplePeriodMs = 100; // Période d'échantillonnage (10 Hz)
+
+// Trame binaire (19 octets, little-endian) :
+// sync (0xA5 0x5A) | numéro de séquence u16 | temps u32 (ms) | 5 x ADC u16 | checksum u8
+// Le checksum est la somme modulo 256 des octets entre la synchronisation et le checksum.
+struct __attribute__((packed)) Frame {
+  uint8_t sync[2];
+  uint16_t sequence;
+  uint32_t millis;
+  uint16_t adc[numSensors];
+  uint8_t checksum;
+};
+
 // Tableau pour stocker les résistances calculées
 float sensorResistances[numSensors];
 unsigned long startTime;
+unsigned long nextSampleTime;
+uint16_t sequence = 0;
 
 void setup() {
   Serial.begin(9100); // Initialisation de la communication série
@@ -14,9 +32,42 @@ void setup() {
     ; // Attendre que le port série soit prêt
   }
   startTime = millis(); // Temps de départ pour l'horodatage
+  nextSampleTime = startTime;
+#if !BINARY_MODE
   Serial.println("Début de la collecte de données...");
+#endif
 }
 
+#if BINARY_MODE
+
+void loop() {
+  // Cadence fixe basée sur millis() plutôt qu'un delay() après l'envoi
+  if ((long)(millis() - nextSampleTime) < 0) {
+    return;
+  }
+  nextSampleTime += samplePeriodMs;
+
+  Frame frame;
+  frame.sync[0] = 0xA5;
+  frame.sync[1] = 0x5A;
+  frame.sequence = sequence++;
+  frame.millis = millis() - startTime;
+  for (int i = 0; i < numSensors; i++) {
+    frame.adc[i] = analogRead(sensorPins[i]);
+  }
+
+  const uint8_t *bytes = (const uint8_t *)&frame;
+  uint8_t sum = 0;
+  for (size_t k = sizeof(frame.sync); k < sizeof(Frame) - 1; k++) {
+    sum += bytes[k];
+  }
+  frame.checksum = sum;
+
+  Serial.write(bytes, sizeof(Frame));
+}
+
+#else
+
 void loop() {
   for (int i = 0; i < numSensors; i++) {
     // Lire la valeur analogique du capteur
@@ -40,5 +91,7 @@ void loop() {
     Serial.println(R_FSR); // Résistance calculée en Ohms
   }
 
-  delay(100); // Pause de 100 ms avant la prochaine lecture
+  delay(samplePeriodMs); // Pause de 100 ms avant la prochaine lecture
 }
+
+#endif
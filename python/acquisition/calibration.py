@@ -0,0 +1,183 @@
+"""
+Étalonnage des capteurs, côté PC.
+
+En mode binaire le firmware envoie les valeurs ADC brutes ; la conversion en
+résistance (et en pression) se fait ici, par blocs NumPy. L'ADC est sur 10
+bits : pour chaque capteur, les 1024 résistances et pressions possibles sont
+calculées une fois (`Calibration` les garde en tables), et convertir un bloc
+de trames revient à une indexation, sans calcul flottant par échantillon.
+
+Les paramètres sont dans `calibration.json`, à côté des modèles :
+
+    {"adc_max": 1023,
+     "sensors": {"1": {"r_fixed": 9100.0, "v_in": 3.3, "curve": [a, b]}, ...}}
+
+R_fixed et V_in du pont diviseur de chaque capteur (valeurs du firmware par
+défaut), et la courbe pression = a * R^b ajustée sur des mesures avec
+`python python/acquisition/calibration.py fit --sensor 2 mesures.csv`.
+
+Un ADC à 0 (V_out nul : capteur débranché ou au repos complet) donnait une
+résistance infinie et l'échantillon était perdu ; un ADC à adc_max donne 0.
+Ces valeurs sont maintenant ramenées à la plage mesurable et signalées comme
+saturées.
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+# Rendre les modules de python/ importables quand le script est lancé directement
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from acquisition.protocol import ADC_MAX, NUM_SENSORS, R_FIXED, V_IN, adc_to_resistance
+from utils.paths import MODELS_DIR
+
+CALIBRATION_FILE = "calibration.json"
+
+
+def fit_curve(resistances, pressures):
+    """Ajuste pression = a * R^b (droite en log-log) ; retourne [a, b]."""
+    resistances = np.asarray(resistances, dtype=np.float64)
+    pressures = np.asarray(pressures, dtype=np.float64)
+    valid = (resistances > 0) & (pressures > 0)
+    if valid.sum() < 2:
+        raise ValueError("Il faut au moins deux mesures de résistance et de pression positives")
+    b, log_a = np.polyfit(np.log(resistances[valid]), np.log(pressures[valid]), 1)
+    return [float(np.exp(log_a)), float(b)]
+
+
+class Calibration:
+    """
+    Tables de conversion ADC -> résistance / pression de chaque capteur
+    (capteur i = ligne i - 1), construites une fois à partir de `sensors`
+    ({capteur: {"r_fixed", "v_in", "curve"}}).
+    """
+
+    def __init__(self, sensors=None, adc_max=ADC_MAX, n_sensors=NUM_SENSORS):
+        self.adc_max = adc_max
+        self.sensors = {sensor_id: {"r_fixed": R_FIXED, "v_in": V_IN, "curve": None}
+                        for sensor_id in range(1, n_sensors + 1)}
+        for sensor_id, parameters in (sensors or {}).items():
+            self.sensors[int(sensor_id)].update(parameters)
+        self._build()
+
+    def _build(self):
+        adc = np.arange(self.adc_max + 1)
+        # Valeurs saturées ramenées aux extrémités mesurables : ADC 1 et adc_max - 1
+        clipped = np.clip(adc, 1, self.adc_max - 1)
+        self.resistance_table = np.empty((len(self.sensors), len(adc)), dtype=np.float64)
+        self.pressure_table = np.full((len(self.sensors), len(adc)), np.nan, dtype=np.float64)
+        for row, parameters in enumerate(self.sensors.values()):
+            self.resistance_table[row] = adc_to_resistance(clipped, parameters["r_fixed"], parameters["v_in"],
+                                                           self.adc_max)
+            if parameters["curve"] is not None:
+                a, b = parameters["curve"]
+                self.pressure_table[row] = a * self.resistance_table[row] ** b
+        self.saturated_table = (adc == 0) | (adc == self.adc_max)
+        # Début de la table de chaque capteur dans les tables aplaties
+        self._offsets = np.arange(len(self.sensors)) * len(adc)
+
+    def _lookup(self, table, adc):
+        index = np.minimum(adc, self.adc_max).astype(np.intp)
+        saturated = self.saturated_table.take(index)
+        index += self._offsets
+        return table.ravel().take(index), saturated
+
+    def resistance(self, adc):
+        """
+        adc : (n, capteurs) valeurs brutes. Retourne (résistances, saturés) de
+        même forme ; les valeurs saturées sont ramenées à la plage mesurable.
+        """
+        return self._lookup(self.resistance_table, adc)
+
+    def pressure(self, adc):
+        """Comme `resistance`, en pression (NaN pour les capteurs sans courbe)."""
+        return self._lookup(self.pressure_table, adc)
+
+    def resistance_to_pressure(self, sensor_id, resistances):
+        """Pression d'une série de résistances d'un capteur (par exemple lue dans une session)."""
+        curve = self.sensors[sensor_id]["curve"]
+        if curve is None:
+            raise ValueError(f"Pas de courbe d'étalonnage pour le capteur {sensor_id}")
+        a, b = curve
+        return a * np.asarray(resistances, dtype=np.float64) ** b
+
+    # ---------- Fichier ----------
+
+    def to_dict(self):
+        return {"adc_max": self.adc_max,
+                "sensors": {str(sensor_id): parameters for sensor_id, parameters in self.sensors.items()}}
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path) as file:
+            data = json.load(file)
+        return cls(data.get("sensors"), adc_max=data.get("adc_max", ADC_MAX))
+
+    def save(self, path):
+        """Écrit le fichier d'un coup (fichier temporaire puis os.replace)."""
+        temporary = f"{path}.tmp{os.getpid()}"
+        with open(temporary, "w") as file:
+            json.dump(self.to_dict(), file, indent=2)
+        os.replace(temporary, path)
+
+
+# Étalonnages déjà construits : {dossier: (mtime du fichier, Calibration)}
+_cache = {}
+
+
+def load_calibration(models_dir=MODELS_DIR):
+    """
+    Étalonnage du dossier des modèles (valeurs du firmware s'il n'y a pas de
+    fichier). Les tables ne sont reconstruites que si le fichier a changé.
+    """
+    path = os.path.join(models_dir, CALIBRATION_FILE)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        mtime = None
+    key = os.path.realpath(models_dir)
+    cached = _cache.get(key)
+    if cached is None or cached[0] != mtime:
+        cached = _cache[key] = (mtime, Calibration.from_file(path) if mtime is not None else Calibration())
+    return cached[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Étalonnage des capteurs du kimono.")
+    parser.add_argument("--models", default=MODELS_DIR, help="Dossier des modèles (contient calibration.json)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    fit = subparsers.add_parser("fit", help="Ajuster la courbe pression/résistance d'un capteur")
+    fit.add_argument("measures", help="CSV avec les colonnes Resistance et Pressure")
+    fit.add_argument("--sensor", type=int, required=True)
+    fit.add_argument("--r-fixed", type=float, help="Résistance fixe du pont de ce capteur (ohms)")
+    fit.add_argument("--v-in", type=float, help="Tension d'alimentation du pont (V)")
+    subparsers.add_parser("show", help="Afficher l'étalonnage")
+    args = parser.parse_args()
+
+    path = os.path.join(args.models, CALIBRATION_FILE)
+    calibration = load_calibration(args.models)
+    if args.command == "fit":
+        measures = np.genfromtxt(args.measures, delimiter=",", names=True)
+        # Nouvel étalonnage (tables reconstruites) : celui du cache n'est pas modifié
+        sensors = {sensor_id: dict(parameters) for sensor_id, parameters in calibration.sensors.items()}
+        parameters = sensors[args.sensor]
+        if args.r_fixed is not None:
+            parameters["r_fixed"] = args.r_fixed
+        if args.v_in is not None:
+            parameters["v_in"] = args.v_in
+        parameters["curve"] = fit_curve(measures["Resistance"], measures["Pressure"])
+        calibration = Calibration(sensors, adc_max=calibration.adc_max, n_sensors=len(sensors))
+        calibration.save(path)
+        print(f"Capteur {args.sensor} : pression = {parameters['curve'][0]:.4g} * R^{parameters['curve'][1]:.4g}")
+    else:
+        for sensor_id, parameters in calibration.sensors.items():
+            curve = parameters["curve"]
+            print(f"Capteur {sensor_id} : R_fixed {parameters['r_fixed']} ohms, V_in {parameters['v_in']} V, "
+                  f"courbe {'aucune' if curve is None else f'{curve[0]:.4g} * R^{curve[1]:.4g}'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Canal de contrôle entre l'interface (app.py) et le processus d'acquisition.
+
+Le processus d'acquisition est lancé avec multiprocessing et reçoit une
+extrémité d'un Pipe. Les commandes sont des chaînes ("start", "stop",
+"flush", "status", "stats") et chaque commande reçoit une réponse (dict).
+Chaque commande part avec un numéro que la réponse reprend : une réponse
+arrivée après l'expiration de son délai est ignorée au lieu d'être prise
+pour la réponse à la commande suivante.
+
+Côté acquisition, un thread bloqué sur `recv()` dépose les commandes dans
+une file en mémoire : la boucle de lecture n'a qu'à tester cette file, sans
+appel système par échantillon.
+"""
+import multiprocessing
+import queue
+import threading
+
+COMMANDS = ("start", "stop", "flush", "status", "stats")
+
+
+# ========== CÔTÉ ACQUISITION ==========
+
+class ControlListener:
+    """Reçoit les commandes du Pipe dans un thread et les expose sans bloquer."""
+
+    def __init__(self, conn):
+        self._conn = conn
+        self._commands = queue.SimpleQueue()
+        # Numéro de la dernière commande retournée par poll, repris par reply
+        self._request_id = None
+        self._thread = threading.Thread(target=self._listen, daemon=True)
+        self._thread.start()
+
+    def _listen(self):
+        while True:
+            try:
+                command = self._conn.recv()
+            except (EOFError, OSError):
+                # L'interface a disparu : on termine proprement l'enregistrement
+                self._commands.put((None, "stop"))
+                return
+            self._commands.put(command)
+
+    def poll(self):
+        """Retourne la prochaine commande en attente, ou None."""
+        if self._commands.empty():
+            return None
+        self._request_id, command = self._commands.get_nowait()
+        return command
+
+    def reply(self, **payload):
+        """Répond à la dernière commande retournée par `poll`."""
+        try:
+            self._conn.send({"id": self._request_id, **payload})
+        except (BrokenPipeError, OSError):
+            pass
+
+
+# ========== CÔTÉ INTERFACE ==========
+
+class AcquisitionClient:
+    """Lance le processus d'acquisition et lui envoie des commandes."""
+
+    def __init__(self, target, **kwargs):
+        self._conn, child_conn = multiprocessing.Pipe()
+        kwargs["control"] = child_conn
+        self.process = multiprocessing.Process(target=target, kwargs=kwargs, daemon=True)
+        self._lock = threading.Lock()
+        self._next_id = 0
+
+    def start(self):
+        self.process.start()
+
+    def request(self, command, timeout=10.0):
+        """Envoie une commande et attend sa réponse (TimeoutError si aucune)."""
+        if command not in COMMANDS:
+            raise ValueError(f"Commande inconnue : {command}")
+        with self._lock:
+            self._next_id += 1
+            request_id = self._next_id
+            self._conn.send((request_id, command))
+            # Attendre la réponse tant que le processus est vivant
+            waited = 0.0
+            while True:
+                while not self._conn.poll(0.1):
+                    waited += 0.1
+                    if not self.process.is_alive():
+                        raise RuntimeError("Le processus d'acquisition s'est arrêté.")
+                    if waited >= timeout:
+                        raise TimeoutError(f"Pas de réponse à '{command}' après {timeout} s")
+                reply = self._conn.recv()
+                # Réponse tardive à une commande précédente expirée : l'ignorer
+                if reply.pop("id", None) == request_id:
+                    return reply
+
+    def stop(self, timeout=30.0):
+        """Arrête l'enregistrement ; retourne dès que le dernier flush est terminé."""
+        reply = self.request("stop", timeout=timeout)
+        self.process.join(timeout=timeout)
+        return reply
+
+    def is_alive(self):
+        return self.process.is_alive()
@@ -1,16 +1,33 @@
-import serial
-import csv
-import numpy as np
-import math
+import argparse
+import logging
 import time
-import os  # Pour gérer le fichier d'arrêt
+import os
+import sys
+
+# Rendre les modules de python/ importables quand le script est lancé directement
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from acquisition.control import ControlListener
+from acquisition.pipeline import LOG_FORMAT, MODEL_CHOICES, DevicePipeline, binary_samples, logger, parse_line
+from acquisition.protocol import FRAME_SIZE, FrameDecoder
+from acquisition.sources import open_source
+from inference.streaming import MODELS_DIR
+from utils.diskwriter import FLUSH_INTERVAL, FSYNC_INTERVAL
+from utils.metrics import MetricsDumper
 
 # Paramètres de connexion série
 port = "COM5"  # Remplace par le port de ton Arduino
 baudrate = 9600
 timeout = 1
 
-# Fichiers CSV pour chaque capteur
+# Filtre des valeurs aberrantes : fenêtre glissante et nombre d'écarts-types
+filter_window = 100
+filter_n_std = 3.0
+
+# Fichier de session binaire (voir python/utils/session.py)
+session_file = 'data_session.kms'
+
+# Fichiers CSV pour chaque capteur (export optionnel)
 sensor_files = {
     1: 'data_capteur1_filtered.csv',
     2: 'data_capteur2_filtered.csv',
@@ -19,111 +36,231 @@ sensor_files = {
     5: 'data_capteur5_filtered.csv'
 }
 
-# Nom du fichier signal d'arrêt
-stop_signal_file = "stop_signal.txt"
-
-def remove_duplicates_by_time(rows):
-    unique_rows = []
-    seen_timestamps = set()
-    for row in rows:
-        timestamp = row[0]
-        if timestamp not in seen_timestamps:
-            unique_rows.append(row)
-            seen_timestamps.add(timestamp)
-    return unique_rows
-
-def filter_by_std_dev(rows):
-    resistances = [row[1] for row in rows]
-    mean_resistance = np.mean(resistances)
-    std_resistance = np.std(resistances)
-    return [
-        row for row in rows
-        if abs(row[1] - mean_resistance) <= 3 * std_resistance
-    ]
-
-try:
-    # Ouvrir la connexion série
-    ser = serial.Serial(port, baudrate, timeout=timeout)
-    time.sleep(2)  # Attendre que la connexion s'établisse
-
-    print("Début de la réception des données...")
-
-    # Fichiers pour écrire les données
-    file_handlers = {key: open(filename, mode='w', newline='') for key, filename in sensor_files.items()}
-    csv_writers = {key: csv.writer(fh) for key, fh in file_handlers.items()}
-
-    # Écrire les en-têtes pour chaque fichier
-    for writer in csv_writers.values():
-        writer.writerow(["Timestamp", "Resistance"])
-
-    # Dictionnaire pour stocker temporairement les données par capteur
-    data_buffer = {key: [] for key in sensor_files.keys()}
-
-    while True:
-        # Vérifier si le fichier d'arrêt existe
-        if os.path.exists(stop_signal_file):
-            print("Signal d'arrêt détecté. Arrêt de la réception des données.")
-            break
-
-        line = ser.readline().decode('utf-8').strip()
-        if line:
-            print(line)  # Afficher les données reçues pour le débogage
-            try:
-                # Extraire les données : Capteur, Temps, Résistance
-                sensor_id, timestamp, resistance = line.split(',')
-                sensor_id = int(sensor_id)
-                timestamp = float(timestamp)
-                resistance = float(resistance)
-
-                # Filtrer les valeurs infinies ou non finies
-                if not math.isfinite(resistance):
-                    print(f"Valeur infinie ou non valide ignorée : {line}")
-                    continue
-
-                # Ajouter la donnée au buffer du capteur correspondant
-                if sensor_id in data_buffer:
-                    data_buffer[sensor_id].append([timestamp, resistance])
-
-            except ValueError:
-                print("Erreur de format dans les données reçues :", line)
-
-        # Traiter les données tous les 100 lignes
-        for sensor_id, rows in data_buffer.items():
-            if len(rows) >= 100:
-                # Supprimer les doublons
-                rows = remove_duplicates_by_time(rows)
-
-                # Supprimer les valeurs incohérentes par rapport à l'écart-type
-                rows = filter_by_std_dev(rows)
-
-                # Convertir les timestamps et résistances en entiers (après vérification)
-                rows = [[int(ts), int(r)] for ts, r in rows if math.isfinite(r)]
-
-                # Écrire les données filtrées dans le fichier CSV correspondant
-                csv_writers[sensor_id].writerows(rows)
-
-                # Vider le buffer pour ce capteur
-                data_buffer[sensor_id] = []
-
-except KeyboardInterrupt:
-    print("Arrêt par l'utilisateur.")
-
-finally:
-    # Traiter les données restantes dans le buffer
-    for sensor_id, rows in data_buffer.items():
-        if rows:
-            rows = remove_duplicates_by_time(rows)
-            rows = filter_by_std_dev(rows)
-            rows = [[int(ts), int(r)] for ts, r in rows if math.isfinite(r)]
-            csv_writers[sensor_id].writerows(rows)
-
-    # Fermer les fichiers et la connexion série
-    for fh in file_handlers.values():
-        fh.close()
-    ser.close()
-    print("Fin de la réception des données.")
-
-    # Supprimer le fichier d'arrêt
-    if os.path.exists(stop_signal_file):
-        os.remove(stop_signal_file)
-        print(f"Fichier signal '{stop_signal_file}' supprimé.")
+def read_text_samples(ser, metrics):
+    """Lit une ligne texte 'capteur,temps,résistance' et retourne la liste des échantillons valides."""
+    started = time.perf_counter()
+    line = ser.readline()
+    read = time.perf_counter()
+    metrics.histogram("read").record(read - started)
+
+    # Un octet parasite ne doit pas arrêter l'enregistrement : la ligne sera comptée invalide
+    line = line.decode('utf-8', errors='replace').strip()
+    if not line:
+        return []
+    logger.debug(line)  # Données reçues, pour le débogage (--log-level DEBUG)
+    sample = parse_line(line)
+    metrics.histogram("parse").record(time.perf_counter() - read)
+    if sample is None:
+        metrics.incr("malformed")
+        logger.debug("Donnée invalide ignorée : %s", line)
+        return []
+    return [sample]
+
+
+def read_binary_samples(ser, decoder, metrics, calibration=None):
+    """
+    Lit tous les octets disponibles (au moins une trame), décode les trames
+    d'un bloc et convertit les valeurs ADC en résistances avec les tables de
+    `calibration` (voir calibration.py).
+    """
+    started = time.perf_counter()
+    data = ser.read(max(ser.in_waiting, FRAME_SIZE))
+    read = time.perf_counter()
+    metrics.histogram("read").record(read - started)
+    samples = binary_samples(decoder.feed(data), calibration, metrics)
+    metrics.histogram("parse").record(time.perf_counter() - read)
+    return samples
+
+
+def run(port=port, baudrate=baudrate, binary=False, control=None, session_path=session_file, csv_export=False,
+        window=filter_window, n_std=filter_n_std, source=None, output_dir=".", models_dir=MODELS_DIR,
+        on_prediction=None, on_event=None, live_buffer=None, log_level=None, metrics_file=None,
+        metrics_interval=5.0, fsync_interval=FSYNC_INTERVAL, flush_interval=FLUSH_INTERVAL, resume=False,
+        multi_model=None):
+    """
+    Boucle de réception. Sans canal de contrôle, l'enregistrement démarre tout
+    de suite et s'arrête avec Ctrl+C. Avec un canal de contrôle (voir
+    control.py), il démarre sur "start" et s'arrête sur "stop".
+
+    `source` remplace le port série (par exemple une ReplaySource, voir
+    sources.py) ; la boucle s'arrête quand elle est épuisée. `on_prediction`
+    est appelée avec (capteur, temps, prédiction) après chaque prédiction et
+    `on_event` avec (capteur, saisie) à la fin de chaque saisie.
+
+    `live_buffer` est le nom d'un SampleRing en mémoire partagée (voir
+    utils/ringbuffer.py) créé par l'interface : chaque échantillon y est
+    ajouté avec sa prédiction pour l'affichage en direct.
+
+    Le traitement de chaque échantillon (filtre, fichiers, prédiction,
+    saisies) est fait par pipeline.DevicePipeline ; multi.py enregistre
+    plusieurs kimonos à la fois avec la même chaîne.
+
+    Les compteurs et histogrammes de latence de chaque étape sont renvoyés
+    par la commande "stats" et, avec `metrics_file`, écrits en JSON toutes
+    les `metrics_interval` secondes. `log_level` ("INFO", "DEBUG", ...)
+    configure les messages quand le processus n'a pas encore de logging.
+
+    Les fichiers sont écrits en arrière-plan : un bloc est transmis au thread
+    d'écriture toutes les `flush_interval` secondes et synchronisé sur le
+    disque (fsync) toutes les `fsync_interval` secondes. `resume` reprend
+    une session interrompue au lieu de l'écraser. `multi_model` choisit le
+    modèle (voir pipeline.py : None = multi-sorties s'il existe).
+    """
+    if log_level is not None:
+        logging.basicConfig(level=log_level, format=LOG_FORMAT)
+    listener = ControlListener(control) if control is not None else None
+    recording = listener is None
+    started_at = time.time()
+    command = None
+    ser = None
+    decoder = FrameDecoder()
+    pipeline = DevicePipeline(output_dir=output_dir, session_path=session_path, csv_export=csv_export,
+                              window=window, n_std=n_std, models_dir=models_dir, live_buffer=live_buffer,
+                              on_prediction=on_prediction, on_event=on_event, sensor_ids=sensor_files.keys(),
+                              fsync_interval=fsync_interval, flush_interval=flush_interval, resume=resume,
+                              multi_model=multi_model)
+    metrics = pipeline.metrics
+    dumper = None
+
+    def stats():
+        if binary:
+            metrics.counters.update(frames=decoder.frames, lost_frames=decoder.lost_frames,
+                                    bad_checksums=decoder.bad_checksums)
+        try:
+            # Octets reçus par le système mais pas encore lus : le retard de la boucle
+            metrics.set("serial_backlog_bytes", ser.in_waiting)
+        except Exception:
+            pass
+        result = pipeline.stats()
+        if binary:
+            result["frames"] = decoder.frames
+            result["lost_frames"] = decoder.lost_frames
+            result["bad_checksums"] = decoder.bad_checksums
+        return result
+
+    try:
+        # Ouvrir la connexion série
+        if source is not None:
+            ser = source
+        else:
+            ser = open_source(port, baudrate, timeout)
+            time.sleep(2)  # Attendre que la connexion s'établisse
+
+        logger.info("Début de la réception des données...")
+
+        # Fichiers de la session, modèles et buffer du tableau de bord
+        pipeline.open()
+        # Un modèle réentraîné pendant l'enregistrement remplace l'ancien entre deux échantillons
+        pipeline.detector.registry.watch(on_reload=lambda name, metadata: logger.info(
+            f"Modèle rechargé : {name} (version {metadata.get('version')})"))
+        if metrics_file is not None:
+            dumper = MetricsDumper(stats, metrics_file, metrics_interval).start()
+
+        while True:
+            # Commandes de l'interface (simple lecture d'une file en mémoire)
+            command = listener.poll() if listener is not None else None
+            if command == "stop":
+                logger.info("Commande d'arrêt reçue. Arrêt de la réception des données.")
+                break
+            elif command == "start":
+                recording = True
+                listener.reply(ok=True, recording=recording)
+            elif command == "flush":
+                pipeline.flush()
+                listener.reply(ok=True, written=dict(pipeline.written))
+            elif command == "status":
+                listener.reply(ok=True, recording=recording, port=port, binary=binary,
+                               uptime=time.time() - started_at)
+            elif command == "stats":
+                listener.reply(ok=True, **stats())
+            elif command is not None:
+                listener.reply(ok=False, error=f"Commande inconnue : {command}")
+
+            if binary:
+                samples = read_binary_samples(ser, decoder, metrics, pipeline.calibration)
+            else:
+                samples = read_text_samples(ser, metrics)
+
+            # Écrire les blocs trop vieux même si le port ne reçoit plus rien
+            # (readline rend la main après `timeout`)
+            pipeline.tick()
+
+            # Les données sont lues en continu pour vider le port, mais
+            # enregistrées seulement après "start"
+            if not recording:
+                continue
+
+            pipeline.process(samples)
+
+    except KeyboardInterrupt:
+        logger.info("Arrêt par l'utilisateur.")
+
+    except EOFError:
+        logger.info("Fin de la source de données.")
+
+    finally:
+        # Clore les saisies en cours, écrire les données en attente et fermer les fichiers
+        error = pipeline.close()
+        if dumper is not None:
+            dumper.stop()
+        if pipeline.detector is not None:
+            pipeline.detector.registry.stop_watching()
+        if ser is not None:
+            ser.close()
+        if binary and ser is not None:
+            logger.info(f"Trames reçues : {decoder.frames}, perdues : {decoder.lost_frames}, "
+                        f"checksums invalides : {decoder.bad_checksums}")
+        logger.info("Fin de la réception des données.")
+
+        # Répondre à "stop" une fois le dernier flush terminé
+        if command == "stop":
+            listener.reply(ok=error is None, error=error, written=dict(pipeline.written))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Réception des données du kimono.")
+    parser.add_argument("--port", default=port, help="Port série de l'Arduino")
+    parser.add_argument("--baudrate", type=int, default=baudrate)
+    parser.add_argument("--binary", action="store_true",
+                        help="Trames binaires du firmware compilé avec BINARY_MODE 1")
+    parser.add_argument("--replay", help="Rejouer un dossier de CSV ou une session .kms au lieu du port série")
+    parser.add_argument("--synthetic", type=float, metavar="SECONDES",
+                        help="Rejouer des signaux synthétiques de cette durée au lieu du port série")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Vitesse du rejeu (1 = temps réel, 0 = aussi vite que possible)")
+    parser.add_argument("--window", type=int, default=filter_window,
+                        help="Taille de la fenêtre du filtre des valeurs aberrantes (échantillons)")
+    parser.add_argument("--n-std", type=float, default=filter_n_std,
+                        help="Seuil du filtre en nombre d'écarts-types")
+    parser.add_argument("--session", default=session_file, help="Fichier de session binaire (.kms)")
+    parser.add_argument("--models", default=MODELS_DIR, help="Dossier des modèles (et de calibration.json)")
+    parser.add_argument("--csv", action="store_true",
+                        help="Écrire aussi un fichier CSV par capteur (data_capteurN_filtered.csv)")
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                        help="DEBUG affiche chaque ligne reçue")
+    parser.add_argument("--metrics-file", help="Écrire les compteurs et latences en JSON dans ce fichier")
+    parser.add_argument("--metrics-interval", type=float, default=5.0, help="Période d'écriture (s)")
+    parser.add_argument("--flush-interval", type=float, default=FLUSH_INTERVAL,
+                        help="Âge maximal des données gardées en mémoire avant écriture (s)")
+    parser.add_argument("--fsync-interval", type=float, default=FSYNC_INTERVAL,
+                        help="Période des fsync : données perdues au plus en cas de coupure (s)")
+    parser.add_argument("--resume", action="store_true",
+                        help="Reprendre une session interrompue au lieu de l'écraser")
+    parser.add_argument("--model", choices=list(MODEL_CHOICES), default="auto",
+                        help="Modèle multi-sorties (un appel par trame) ou un modèle par capteur ; "
+                             "auto : multi-sorties s'il a été entraîné")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level, format=LOG_FORMAT)
+
+    source = None
+    if args.replay is not None or args.synthetic is not None:
+        source = open_source(args.port, replay=args.replay, synthetic=args.synthetic,
+                             speed=args.speed or None, binary=args.binary)
+    run(args.port, args.baudrate, args.binary, session_path=args.session, csv_export=args.csv,
+        window=args.window, n_std=args.n_std, source=source, models_dir=args.models, metrics_file=args.metrics_file,
+        metrics_interval=args.metrics_interval, fsync_interval=args.fsync_interval,
+        flush_interval=args.flush_interval, resume=args.resume, multi_model=MODEL_CHOICES[args.model])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Filtre en ligne des valeurs aberrantes, capteur par capteur.
+
+Remplace le filtre à 3 écarts-types appliqué par blocs de 100 lignes : chaque
+échantillon est accepté ou rejeté dès son arrivée, par rapport à la moyenne
+et à l'écart-type des `window` derniers échantillons (statistiques de Welford
+sur une fenêtre glissante, mémoire constante).
+"""
+import math
+
+# Nombre de mises à jour glissantes avant de recalculer la moyenne et la
+# variance exactement, pour éviter la dérive des arrondis sur les longues sessions
+RECOMPUTE_EVERY = 1000
+
+
+class OnlineOutlierFilter:
+    """
+    Comme l'ancien filtre par blocs, les statistiques incluent l'échantillon
+    testé et les valeurs rejetées : un vrai changement de niveau finit par
+    être accepté une fois la fenêtre remplie par le nouveau niveau.
+    """
+
+    def __init__(self, window=100, n_std=3.0):
+        if window < 1:
+            raise ValueError("La fenêtre doit contenir au moins un échantillon.")
+        self.window = window
+        self.n_std = n_std
+        self.reset()
+
+    def reset(self):
+        self._values = [0.0] * self.window  # buffer circulaire
+        self._head = 0
+        self._count = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._updates = 0
+        self.accepted = 0
+        self.rejected = 0
+
+    @property
+    def mean(self):
+        return self._mean
+
+    @property
+    def std(self):
+        return math.sqrt(self._m2 / self._count) if self._count else 0.0
+
+    def _add(self, value):
+        if self._count < self.window:
+            self._values[self._count] = value
+            self._count += 1
+            delta = value - self._mean
+            self._mean += delta / self._count
+            self._m2 += delta * (value - self._mean)
+            return
+
+        # Fenêtre pleine : remplacer la plus ancienne valeur
+        old = self._values[self._head]
+        self._values[self._head] = value
+        self._head = (self._head + 1) % self.window
+        old_mean = self._mean
+        self._mean += (value - old) / self.window
+        self._m2 += (value - old) * (value - self._mean + old - old_mean)
+
+        self._updates += 1
+        if self._updates >= RECOMPUTE_EVERY:
+            self._updates = 0
+            self._mean = sum(self._values) / self.window
+            self._m2 = sum((v - self._mean) ** 2 for v in self._values)
+        elif self._m2 < 0.0:
+            self._m2 = 0.0
+
+    def accept(self, value):
+        """Ajoute la valeur à la fenêtre et indique si elle doit être conservée."""
+        self._add(value)
+        # Petite tolérance relative pour les signaux constants (écart-type nul)
+        keep = abs(value - self._mean) <= self.n_std * self.std + 1e-9 * abs(self._mean)
+        if keep:
+            self.accepted += 1
+        else:
+            self.rejected += 1
+        return keep
@@ -0,0 +1,377 @@
+"""
+Acquisition de plusieurs kimonos dans un seul processus.
+
+Chaque kimono (port série, ou source rejouée pour les essais) a sa propre
+chaîne : décodeur (texte ou trames binaires), puis pipeline.DevicePipeline
+(filtre, session, prédiction, saisies) qui écrit dans son propre dossier.
+Une boucle asyncio unique fait tourner, pour chaque kimono, une tâche de
+lecture et une tâche de traitement reliées par une file bornée :
+
+- la lecture est déclenchée par le système (loop.add_reader sur le
+  descripteur du port, sans thread ni attente active) ; les sources sans
+  descripteur (rejeu, ports Windows) sont lues toutes les `poll_interval` s ;
+- les octets sont traités par blocs : une itération de la boucle traite tous
+  les échantillons arrivés depuis la précédente ;
+- quand la file d'un kimono est pleine, sa lecture s'arrête jusqu'à ce que
+  le traitement ait rattrapé son retard (les octets attendent dans le buffer
+  du port) : un kimono en retard ne fait pas grossir la mémoire. Ces arrêts
+  sont comptés (`stalls`).
+
+Les modèles sont chargés une fois pour tous les kimonos (registre partagé).
+Chaque kimono a ses compteurs et histogrammes de latence (lecture, décodage,
+puis ceux de la chaîne) et la profondeur de sa file ; `--metrics-file` les
+écrit en JSON à intervalle régulier.
+
+    python python/acquisition/multi.py --ports /dev/ttyUSB0 /dev/ttyUSB1 /dev/ttyUSB2 --binary --output-dir seance
+    python python/acquisition/multi.py --synthetic 600 --devices 8 --speed 1 --output-dir /tmp/seance --stats 5
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import sys
+import time
+
+# Rendre les modules de python/ importables quand le script est lancé directement
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from acquisition.pipeline import (LOG_FORMAT, MODEL_CHOICES, TICK_INTERVAL, DevicePipeline, LineParser, binary_samples,
+                                  logger)
+from acquisition.protocol import FrameDecoder
+from acquisition.sources import ReplaySource, open_source
+from inference.streaming import MODELS_DIR
+from utils.diskwriter import FLUSH_INTERVAL, FSYNC_INTERVAL
+from utils.metrics import MetricsDumper
+
+# Blocs d'octets en attente de traitement par kimono
+QUEUE_SIZE = 64
+# Période de lecture des sources sans descripteur de fichier (s)
+POLL_INTERVAL = 0.01
+
+
+# ========== UN KIMONO ==========
+
+class Device:
+    """Source d'un kimono, son décodeur, sa file et sa chaîne de traitement."""
+
+    def __init__(self, name, source, pipeline, binary=False, queue_size=QUEUE_SIZE, poll_interval=POLL_INTERVAL):
+        self.name = name
+        self.source = source
+        self.pipeline = pipeline
+        self.binary = binary
+        self.poll_interval = poll_interval
+        self.decoder = FrameDecoder() if binary else LineParser()
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.metrics = pipeline.metrics
+        self._read_time = self.metrics.histogram("read")
+        self._parse_time = self.metrics.histogram("parse")
+
+        self.bytes = 0
+        self.chunks = 0
+        self.samples = 0
+        self.stalls = 0
+        self.queue_peak = 0
+        self.error = None
+
+    # ---------- Lecture ----------
+
+    async def _put(self, data):
+        self.bytes += len(data)
+        self.chunks += 1
+        if self.queue.full():
+            self.stalls += 1
+        await self.queue.put(data)
+        self.queue_peak = max(self.queue_peak, self.queue.qsize())
+
+    async def read(self):
+        """Lit la source jusqu'à son épuisement (rejeu) ou l'annulation de la tâche."""
+        loop = asyncio.get_running_loop()
+        fileno = getattr(self.source, "fileno", None)
+        if fileno is not None:
+            try:
+                await self._read_events(loop, fileno())
+                return
+            except NotImplementedError:
+                pass  # boucle sans add_reader (Windows) : lecture périodique
+        await self._read_polling()
+
+    async def _read_events(self, loop, fd):
+        ready = asyncio.Event()
+        loop.add_reader(fd, ready.set)
+        try:
+            while True:
+                await ready.wait()
+                ready.clear()
+                started = time.perf_counter()
+                data = self.source.read(self.source.in_waiting or 1)
+                self._read_time.record(time.perf_counter() - started)
+                if not data:
+                    continue
+                if self.queue.full():
+                    # Ne plus être réveillé tant que le traitement n'a pas rattrapé son retard
+                    loop.remove_reader(fd)
+                    await self._put(data)
+                    loop.add_reader(fd, ready.set)
+                else:
+                    await self._put(data)
+        finally:
+            loop.remove_reader(fd)
+
+    async def _read_polling(self):
+        while not getattr(self.source, "exhausted", False):
+            waiting = self.source.in_waiting
+            if waiting:
+                started = time.perf_counter()
+                data = self.source.read(waiting)
+                self._read_time.record(time.perf_counter() - started)
+                await self._put(data)
+            else:
+                await asyncio.sleep(self.poll_interval)
+
+    # ---------- Traitement ----------
+
+    def _decode(self, data):
+        if self.binary:
+            return binary_samples(self.decoder.feed(data), self.pipeline.calibration, self.pipeline.metrics)
+        return self.decoder.feed(data)
+
+    async def consume(self):
+        """Traite les blocs de la file jusqu'au bloc None."""
+        while True:
+            data = await self.queue.get()
+            if data is None:
+                return
+            started = time.perf_counter()
+            samples = self._decode(data)
+            self._parse_time.record(time.perf_counter() - started)
+            self.samples += len(samples)
+            self.pipeline.process(samples)
+            # Laisser les autres kimonos avancer entre deux blocs
+            await asyncio.sleep(0)
+
+    def stats(self):
+        self.metrics.set("queue_depth", self.queue.qsize())
+        self.metrics.set("queue_peak", self.queue_peak)
+        if self.binary:
+            self.metrics.counters.update(lost_frames=self.decoder.lost_frames, bad_checksums=self.decoder.bad_checksums)
+        else:
+            self.metrics.counters["malformed"] = self.decoder.bad_lines
+        result = {
+            "bytes": self.bytes,
+            "chunks": self.chunks,
+            "samples": self.samples,
+            "queue_peak": self.queue_peak,
+            "stalls": self.stalls,
+            **self.pipeline.stats(),
+        }
+        if self.binary:
+            result["frames"] = self.decoder.frames
+            result["lost_frames"] = self.decoder.lost_frames
+            result["bad_checksums"] = self.decoder.bad_checksums
+        else:
+            result["bad_lines"] = self.decoder.bad_lines
+        if self.error is not None:
+            result["error"] = self.error
+        return result
+
+
+# ========== TOUS LES KIMONOS ==========
+
+class MultiAcquisition:
+    """
+    Enregistre tous les `devices` jusqu'à l'épuisement de leurs sources, la
+    fin de `duration` (s) ou `stop()`. Toutes les `stats_interval` s,
+    `on_stats` est appelée avec les compteurs (voir `stats`).
+    """
+
+    def __init__(self, devices, duration=None, settle_s=0.0, stats_interval=None, on_stats=None,
+                 metrics_file=None, metrics_interval=5.0):
+        self.devices = list(devices)
+        self.duration = duration
+        self.settle_s = settle_s
+        self.stats_interval = stats_interval
+        self.on_stats = on_stats
+        self.metrics_file = metrics_file
+        self.metrics_interval = metrics_interval
+        self._readers = []
+        self._started = None
+        self._cpu_started = None
+
+    def stop(self):
+        """Arrête la lecture ; les blocs déjà reçus sont traités avant la fermeture des fichiers."""
+        for task in self._readers:
+            task.cancel()
+
+    def stats(self):
+        elapsed = time.perf_counter() - self._started if self._started else 0.0
+        cpu = time.process_time() - self._cpu_started if self._started else 0.0
+        return {
+            "elapsed_s": elapsed,
+            "cpu_s": cpu,
+            "cpu_percent": 100 * cpu / elapsed if elapsed else 0.0,
+            "devices": {device.name: device.stats() for device in self.devices},
+        }
+
+    async def _report(self):
+        while True:
+            await asyncio.sleep(self.stats_interval)
+            self.on_stats(self.stats())
+
+    async def _tick(self):
+        # Écrire les blocs en attente même quand un kimono n'envoie plus rien
+        while True:
+            await asyncio.sleep(TICK_INTERVAL)
+            for device in self.devices:
+                device.pipeline.tick()
+
+    async def _read(self, device):
+        try:
+            await device.read()
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            # Un kimono débranché n'arrête pas les autres
+            device.error = f"{type(e).__name__}: {e}"
+            logger.error(f"[{device.name}] lecture arrêtée : {device.error}")
+        finally:
+            await device.queue.put(None)
+
+    async def run(self):
+        for device in self.devices:
+            device.pipeline.open()
+        registry = self.devices[0].pipeline.detector.registry if self.devices else None
+        if registry is not None:
+            registry.watch()
+        if self.settle_s:
+            await asyncio.sleep(self.settle_s)  # le temps que les cartes redémarrent à l'ouverture du port
+
+        self._started, self._cpu_started = time.perf_counter(), time.process_time()
+        self._readers = [asyncio.create_task(self._read(device)) for device in self.devices]
+        consumers = [asyncio.create_task(device.consume()) for device in self.devices]
+        reporter = asyncio.create_task(self._report()) if self.stats_interval and self.on_stats else None
+        ticker = asyncio.create_task(self._tick())
+        timer = asyncio.get_running_loop().call_later(self.duration, self.stop) if self.duration else None
+        dumper = MetricsDumper(self.stats, self.metrics_file, self.metrics_interval).start() if self.metrics_file else None
+        try:
+            await asyncio.gather(*consumers)
+        finally:
+            for task in self._readers + consumers + [ticker] + ([reporter] if reporter else []):
+                task.cancel()
+            if timer is not None:
+                timer.cancel()
+            if registry is not None:
+                registry.stop_watching()
+            for device in self.devices:
+                error = device.pipeline.close()
+                if error is not None and device.error is None:
+                    device.error = error
+                device.source.close()
+            if dumper is not None:
+                dumper.stop()
+        return self.stats()
+
+
+# ========== PROGRAMME PRINCIPAL ==========
+
+class DeviceLogger(logging.LoggerAdapter):
+    """Préfixe les messages d'un kimono par son nom."""
+
+    def process(self, msg, kwargs):
+        return f"[{self.extra['device']}] {msg}", kwargs
+
+
+def build_devices(args):
+    """Un Device par port (ou par source synthétique), chacun dans son dossier."""
+    if args.ports:
+        names = args.names or [os.path.basename(port) for port in args.ports]
+        sources = [open_source(port, args.baudrate, timeout=0) for port in args.ports]
+    else:
+        count = args.devices
+        names = args.names or [f"kimono{index + 1}" for index in range(count)]
+        speed = args.speed or None
+        if args.replay is not None:
+            sources = [ReplaySource.from_path(args.replay, speed=speed, binary=args.binary) for _ in range(count)]
+        else:
+            sources = [ReplaySource.synthetic(args.synthetic, seed=index, speed=speed, binary=args.binary)
+                       for index in range(count)]
+
+    devices = []
+    for name, source in zip(names, sources):
+        output_dir = os.path.join(args.output_dir, name)
+        os.makedirs(output_dir, exist_ok=True)
+        pipeline = DevicePipeline(output_dir=output_dir, csv_export=args.csv, models_dir=args.models,
+                                  logger=DeviceLogger(logger, {"device": name}), fsync_interval=args.fsync_interval,
+                                  flush_interval=args.flush_interval, resume=args.resume,
+                                  multi_model=MODEL_CHOICES[args.model])
+        devices.append(Device(name, source, pipeline, binary=args.binary, queue_size=args.queue_size))
+    return devices
+
+
+def print_stats(stats):
+    print(f"--- {stats['elapsed_s']:.0f} s, CPU {stats['cpu_percent']:.1f}% ---")
+    for name, device in stats["devices"].items():
+        line = (f"{name:<12} {device['samples']:>8} échantillons  {sum(device['written'].values()):>8} écrits  "
+                f"{sum(device['events'].values()):>5} saisies  file max {device['queue_peak']:>3}  "
+                f"arrêts {device['stalls']}")
+        if "lost_frames" in device:
+            line += f"  trames perdues {device['lost_frames']}"
+        if "error" in device:
+            line += f"  ERREUR {device['error']}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Enregistrement de plusieurs kimonos à la fois.")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--ports", nargs="+", help="Ports série des kimonos")
+    group.add_argument("--replay", help="Rejouer un dossier de CSV ou une session .kms sur chaque kimono")
+    group.add_argument("--synthetic", type=float, metavar="SECONDES", help="Signaux synthétiques de cette durée")
+    parser.add_argument("--devices", type=int, default=4, help="Nombre de kimonos rejoués (--replay/--synthetic)")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Vitesse du rejeu (1 = temps réel, 0 = aussi vite que possible)")
+    parser.add_argument("--names", nargs="+", help="Nom de chaque kimono (dossier de sortie)")
+    parser.add_argument("--baudrate", type=int, default=9600)
+    parser.add_argument("--binary", action="store_true",
+                        help="Trames binaires du firmware compilé avec BINARY_MODE 1")
+    parser.add_argument("--output-dir", default="seance", help="Un sous-dossier par kimono")
+    parser.add_argument("--models", default=MODELS_DIR)
+    parser.add_argument("--model", choices=list(MODEL_CHOICES), default="auto",
+                        help="Modèle multi-sorties (un appel par trame) ou un modèle par capteur ; "
+                             "auto : multi-sorties s'il a été entraîné")
+    parser.add_argument("--csv", action="store_true", help="Écrire aussi les CSV par capteur")
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE, help="Blocs en attente par kimono")
+    parser.add_argument("--duration", type=float, help="Arrêter après ce nombre de secondes")
+    parser.add_argument("--stats", type=float, metavar="SECONDES", help="Afficher les compteurs à cet intervalle")
+    parser.add_argument("--metrics-file", help="Écrire les compteurs et latences en JSON dans ce fichier")
+    parser.add_argument("--metrics-interval", type=float, default=5.0, help="Période d'écriture (s)")
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                        help="WARNING pour ne plus afficher les saisies de chaque kimono")
+    parser.add_argument("--flush-interval", type=float, default=FLUSH_INTERVAL,
+                        help="Âge maximal des données gardées en mémoire avant écriture (s)")
+    parser.add_argument("--fsync-interval", type=float, default=FSYNC_INTERVAL,
+                        help="Période des fsync : données perdues au plus en cas de coupure (s)")
+    parser.add_argument("--resume", action="store_true", help="Reprendre les sessions interrompues")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level, format=LOG_FORMAT)
+    if args.names and len(args.names) != (len(args.ports) if args.ports else args.devices):
+        parser.error("--names doit donner un nom par kimono")
+
+    acquisition = MultiAcquisition(build_devices(args), duration=args.duration, settle_s=2.0 if args.ports else 0.0,
+                                   stats_interval=args.stats, on_stats=print_stats,
+                                   metrics_file=args.metrics_file, metrics_interval=args.metrics_interval)
+
+    async def run():
+        try:
+            # Ctrl+C arrête la lecture et laisse finir le traitement des blocs reçus
+            asyncio.get_running_loop().add_signal_handler(signal.SIGINT, acquisition.stop)
+        except NotImplementedError:
+            pass
+        return await acquisition.run()
+
+    logger.info(f"Enregistrement de {len(acquisition.devices)} kimonos dans {args.output_dir}...")
+    print_stats(asyncio.run(run()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,410 @@
+"""
+Chaîne de traitement d'un kimono, de l'échantillon reçu aux fichiers.
+
+`DevicePipeline` regroupe ce que data_reception.py faisait pour chaque
+échantillon : suppression des doublons, filtre des valeurs aberrantes,
+écriture de la session (et des CSV), prédiction en temps réel, regroupement
+en saisies et buffer partagé du tableau de bord. Elle n'a pas d'état global :
+data_reception.py en crée une pour son port, multi.py une par kimono.
+
+`LineParser` découpe le flux texte du firmware reçu par blocs d'octets
+quelconques (le mode binaire utilise protocol.FrameDecoder).
+
+Chaque étape est mesurée dans `pipeline.metrics` (voir utils/metrics.py) :
+histogrammes "filter", "feature", "predict", "write" et "lag" (retard entre le
+millis() du firmware et la prédiction), compteurs des doublons, des rejets et
+des valeurs ADC saturées.
+Les lecteurs (data_reception.py, multi.py) y ajoutent "read" et "parse".
+
+Si le modèle multi-sorties (grip_model_multi, voir
+training/train_multi_output.py) est dans le dossier des modèles, les
+échantillons retenus sont alignés en trames de 100 ms (utils/alignment.py)
+et chaque trame est prédite pour les cinq capteurs en un seul appel
+(inference.streaming.FrameGripDetector) ; sinon chaque échantillon est
+prédit par le modèle de son capteur. `multi_model` (--model) force l'un ou
+l'autre.
+
+Les fichiers sont écrits par un thread d'écriture (utils/diskwriter.py) :
+`process` ne fait que remplir des blocs en mémoire, jamais d'appel disque,
+et un fsync toutes les `fsync_interval` secondes borne ce qu'un arrêt brutal
+peut faire perdre. Avec `resume=True`, une session interrompue est reprise
+(dernier enregistrement incomplet supprimé) au lieu d'être écrasée.
+"""
+import csv
+import logging
+import math
+import os
+import time
+
+import numpy as np
+
+from acquisition.filters import OnlineOutlierFilter
+from acquisition.calibration import load_calibration
+from acquisition.protocol import NUM_SENSORS
+from inference.streaming import MODELS_DIR, FrameGripDetector, StreamingGripDetector, has_multi_model
+from utils.alignment import FrameAligner
+from utils.diskwriter import FLUSH_INTERVAL, FSYNC_INTERVAL, BackgroundTextFile, DiskWriter
+from utils.events import EventSegmenter
+from utils.metrics import LagEstimator, Metrics
+from utils.ringbuffer import SampleRing
+from utils.session import STATUS_SATURATED, SessionWriter, compact
+
+SENSOR_IDS = (1, 2, 3, 4, 5)
+SESSION_FILE = "data_session.kms"
+CSV_FILE = "data_capteur{}_filtered.csv"
+PREDICTION_FILE = "data_capteur{}_predictions.csv"
+EVENTS_FILE = "data_events.csv"
+
+# Messages de l'acquisition (remplacent les print) : niveau réglable avec --log-level
+logger = logging.getLogger("kemono.acquisition")
+LOG_FORMAT = "%(asctime)s %(levelname)s %(message)s"
+# Période minimale entre deux vérifications de l'âge des blocs en mémoire (s)
+TICK_INTERVAL = 0.1
+# Valeurs de --model : modèle multi-sorties s'il existe, toujours, ou jamais
+MODEL_CHOICES = {"auto": None, "multi": True, "capteur": False}
+
+
+# ========== DÉCODAGE ==========
+
+def parse_line(line):
+    """
+    (capteur, temps, résistance, saturé) d'une ligne 'capteur,temps,résistance',
+    ou None si invalide. La saturation n'est connue qu'en mode binaire.
+    """
+    try:
+        sensor_id, timestamp, resistance = line.split(",")
+        sample = int(sensor_id), float(timestamp), float(resistance), False
+    except ValueError:
+        return None
+    # Valeurs infinies (ADC à 0) ou non valides
+    if not math.isfinite(sample[2]):
+        return None
+    return sample
+
+
+class LineParser:
+    """Découpe en lignes des blocs d'octets ; la ligne incomplète est gardée pour le bloc suivant."""
+
+    def __init__(self):
+        self._pending = b""
+        self.lines = 0
+        self.bad_lines = 0
+
+    def feed(self, data):
+        lines = (self._pending + bytes(data)).split(b"\n")
+        self._pending = lines.pop()
+        samples = []
+        for line in lines:
+            line = line.decode("utf-8", errors="replace").strip()
+            if not line:
+                continue
+            self.lines += 1
+            sample = parse_line(line)
+            if sample is None:
+                self.bad_lines += 1
+            else:
+                samples.append(sample)
+        return samples
+
+
+def binary_samples(frames, calibration=None, metrics=None):
+    """
+    Échantillons (capteur, temps, résistance, saturé) d'un bloc de trames,
+    convertis avec `calibration` (voir calibration.py). Les ADC saturés sont
+    gardés, ramenés à la plage mesurable, signalés par `saturé` et comptés
+    dans `metrics` ("saturated").
+    """
+    if len(frames) == 0:
+        return []
+    if calibration is None:
+        calibration = load_calibration()
+    resistances, saturated = calibration.resistance(frames["adc"])
+    if metrics is not None:
+        count = int(np.count_nonzero(saturated))
+        if count:
+            metrics.incr("saturated", count)
+    return list(zip(
+        np.tile(np.arange(1, NUM_SENSORS + 1), len(frames)).tolist(),
+        np.repeat(frames["millis"].astype(np.float64), NUM_SENSORS).tolist(),
+        resistances.ravel().tolist(),
+        saturated.ravel().tolist(),
+    ))
+
+
+# ========== CHAÎNE PAR KIMONO ==========
+
+class DevicePipeline:
+    """
+    Traite les échantillons d'un kimono. `open` crée les fichiers dans
+    `output_dir` et charge les modèles (partagés entre les kimonos d'un même
+    processus, voir inference/registry.py), `process` traite un bloc
+    d'échantillons, `close` clôt les saisies en cours et ferme les fichiers.
+    Les messages passent par `logger` (celui de l'acquisition par défaut).
+    `multi_model` : None pour utiliser le modèle multi-sorties s'il existe,
+    True ou False pour l'imposer ou l'écarter.
+    """
+
+    def __init__(self, output_dir=".", session_path=None, csv_export=False, window=100, n_std=3.0,
+                 models_dir=MODELS_DIR, live_buffer=None, on_prediction=None, on_event=None,
+                 sensor_ids=SENSOR_IDS, logger=logger, fsync_interval=FSYNC_INTERVAL,
+                 flush_interval=FLUSH_INTERVAL, resume=False, multi_model=None):
+        self.output_dir = output_dir
+        self.session_path = session_path or os.path.join(output_dir, SESSION_FILE)
+        self.csv_export = csv_export
+        self.models_dir = models_dir
+        self.live_buffer = live_buffer
+        self.on_prediction = on_prediction
+        self.on_event = on_event
+        self.sensor_ids = tuple(sensor_ids)
+        self.logger = logger
+        self.fsync_interval = fsync_interval
+        self.flush_interval = flush_interval
+        self.resume = resume
+        self.multi_model = multi_model
+        self.metrics = Metrics()
+        self.lag = LagEstimator()
+        self._filter_time = self.metrics.histogram("filter")
+        self._write_time = self.metrics.histogram("write")
+        self._lag_time = self.metrics.histogram("lag")
+
+        # Un filtre en ligne par capteur (mémoire constante)
+        self.filters = {key: OnlineOutlierFilter(window, n_std) for key in self.sensor_ids}
+        # Regroupement des prédictions en saisies (hystérésis + durée minimale)
+        self.segmenters = {key: EventSegmenter() for key in self.sensor_ids}
+        # Compteurs par capteur pour la commande "stats"
+        self.received = {key: 0 for key in self.sensor_ids}
+        self.written = {key: 0 for key in self.sensor_ids}
+        self._last_timestamps = {key: None for key in self.sensor_ids}
+
+        self.calibration = None
+        self.disk = None
+        self.session = None
+        self.detector = None
+        self.aligner = None
+        self.live = None
+        self._csv_handlers = {}
+        self._csv_writers = {}
+        self._prediction_handlers = {}
+        self._prediction_writers = {}
+        self._events_handler = None
+        self._events_writer = None
+        self._next_tick = 0.0
+
+    def _open_csv(self, name, header):
+        """Fichier CSV écrit par le thread d'écriture ; l'en-tête n'est pas répété à la reprise."""
+        handler = BackgroundTextFile(self.disk, os.path.join(self.output_dir, name),
+                                     flush_interval=self.flush_interval, append=self.resume)
+        writer = csv.writer(handler)
+        if not handler.resumed:
+            writer.writerow(header)
+            handler.flush()
+        return handler, writer
+
+    def open(self):
+        # Conversion ADC -> résistance du mode binaire, à côté des modèles
+        self.calibration = load_calibration(self.models_dir)
+        self.disk = DiskWriter(self.fsync_interval, metrics=self.metrics)
+        self.session = SessionWriter(self.session_path, n_sensors=len(self.sensor_ids), writer=self.disk,
+                                     flush_interval=self.flush_interval, append=self.resume, status=True)
+        if self.session.resumed:
+            self.logger.info(f"Reprise de la session {self.session_path}")
+        if self.csv_export:
+            for key in self.sensor_ids:
+                self._csv_handlers[key], self._csv_writers[key] = self._open_csv(
+                    CSV_FILE.format(key), ["Timestamp", "Resistance"])
+
+        # Détection des saisies en temps réel : un appel au modèle multi-sorties
+        # par trame alignée, ou un modèle par capteur
+        multi_model = self.multi_model
+        if multi_model is None:
+            multi_model = has_multi_model(self.models_dir)
+        if multi_model:
+            self.detector = FrameGripDetector(models_dir=self.models_dir, metrics=self.metrics)
+            self.aligner = FrameAligner()
+            self.logger.info(f"Modèle multi-sorties : une prédiction par trame de {self.aligner.period_ms} ms")
+        else:
+            self.detector = StreamingGripDetector(models_dir=self.models_dir, sensor_ids=self.sensor_ids,
+                                                  metrics=self.metrics)
+        for key in self.sensor_ids:
+            self._prediction_handlers[key], self._prediction_writers[key] = self._open_csv(
+                PREDICTION_FILE.format(key), ["Timestamp", "Resistance", "PredictionLabel"])
+        self._events_handler, self._events_writer = self._open_csv(
+            EVENTS_FILE, ["Capteur", "Debut", "Fin", "Duree", "ResistanceMin"])
+
+        if self.live_buffer is not None:
+            self.live = SampleRing.attach(self.live_buffer)
+        return self
+
+    def process(self, samples):
+        """
+        Traite une liste d'échantillons (capteur, temps, résistance, saturé).
+        Un échantillon saturé est enregistré dans la session avec son drapeau
+        (STATUS_SATURATED), mais ne passe ni par le filtre ni par le modèle :
+        sa résistance est une valeur ramenée, pas une mesure. Avec le modèle
+        multi-sorties, les prédictions sont faites à chaque trame complétée.
+        """
+        for sensor_id, timestamp, resistance, saturated in samples:
+            if sensor_id not in self.filters:
+                continue
+            self.received[sensor_id] += 1
+
+            # Supprimer les doublons (les temps du firmware sont croissants)
+            if timestamp == self._last_timestamps[sensor_id]:
+                self.metrics.incr("duplicates")
+                continue
+            self._last_timestamps[sensor_id] = timestamp
+
+            if saturated:
+                self.session.append(sensor_id, int(timestamp), int(resistance), status=STATUS_SATURATED)
+                self.written[sensor_id] += 1
+                continue
+
+            # Supprimer les valeurs incohérentes par rapport à l'écart-type glissant
+            started = time.perf_counter()
+            accepted = self.filters[sensor_id].accept(resistance)
+            self._filter_time.record(time.perf_counter() - started)
+            if not accepted:
+                continue
+
+            # Écrire l'échantillon en entiers (copie dans le bloc en cours, sans accès disque)
+            started = time.perf_counter()
+            timestamp, resistance = int(timestamp), int(resistance)
+            self.session.append(sensor_id, timestamp, resistance)
+            if self.csv_export:
+                self._csv_writers[sensor_id].writerow([timestamp, resistance])
+            self.written[sensor_id] += 1
+            writing = time.perf_counter() - started
+
+            if self.aligner is not None:
+                self._write_time.record(writing)
+                for frame in self.aligner.update(sensor_id, timestamp, resistance):
+                    self._process_frame(frame)
+                continue
+
+            # Prédiction immédiate
+            previous = self.detector.predictions[sensor_id]
+            prediction = self.detector.update(sensor_id, timestamp, resistance)
+            self._lag_time.record(self.lag.update(timestamp, time.monotonic()))
+            self._publish(sensor_id, timestamp, resistance, prediction, previous, writing)
+
+    def _process_frame(self, frame):
+        """Prédit une trame alignée (modèle multi-sorties) et publie la prédiction de chaque capteur."""
+        timestamp = int(frame["timestamp"])
+        previous = dict(self.detector.predictions)
+        predictions = self.detector.update(timestamp, frame["values"])
+        self._lag_time.record(self.lag.update(timestamp, time.monotonic()))
+        for sensor_id in self.sensor_ids:
+            resistance = frame["values"][sensor_id - 1]
+            # Capteur sans mesure récente : pas de ligne ni de point pour cette trame
+            if resistance != resistance:
+                continue
+            self._publish(sensor_id, timestamp, int(resistance), predictions[sensor_id], previous[sensor_id])
+
+    def _publish(self, sensor_id, timestamp, resistance, prediction, previous, writing=0.0):
+        """Fichier des prédictions, messages, tableau de bord, rappels et saisies d'une prédiction."""
+        started = time.perf_counter()
+        self._prediction_writers[sensor_id].writerow(
+            [timestamp, resistance, "Saisie" if prediction == 1 else "null"]
+        )
+        self._write_time.record(writing + time.perf_counter() - started)
+        if prediction != previous:
+            self.logger.info(f"Capteur {sensor_id} : {'saisie' if prediction == 1 else 'relâché'}")
+        if self.live is not None:
+            self.live.append(sensor_id, timestamp, resistance, prediction)
+        if self.on_prediction is not None:
+            self.on_prediction(sensor_id, timestamp, prediction)
+
+        event = self.segmenters[sensor_id].update(timestamp, self.detector.probabilities[sensor_id], resistance)
+        if event is not None:
+            self._write_event(sensor_id, event)
+
+    def _write_event(self, sensor_id, event):
+        self._events_writer.writerow([sensor_id, event["start"], event["end"], event["duration"],
+                                      int(event["peak_resistance"])])
+        # Les saisies sont rares : ne pas attendre un bloc plein pour les écrire
+        self._events_handler.flush()
+        self.logger.info(f"Capteur {sensor_id} : saisie de {event['duration'] / 1000:.1f} s")
+        if self.on_event is not None:
+            self.on_event(sensor_id, event)
+
+    def tick(self):
+        """
+        Transmet au thread d'écriture les blocs plus vieux que `flush_interval`,
+        même sans nouvel échantillon (capteur silencieux, port bloqué). À
+        appeler à chaque tour de la boucle de lecture : l'appel ne fait rien
+        avant `TICK_INTERVAL`.
+        """
+        now = time.monotonic()
+        if now < self._next_tick or self.session is None:
+            return
+        self._next_tick = now + TICK_INTERVAL
+        self.session.tick(now)
+        for fh in list(self._csv_handlers.values()) + list(self._prediction_handlers.values()):
+            fh.tick(now)
+        self._events_handler.tick(now)
+
+    def flush(self):
+        """Écrit les blocs en cours et attend qu'ils soient sur le disque (fsync)."""
+        if self.session is not None:
+            self.session.flush()
+        for fh in list(self._csv_handlers.values()) + list(self._prediction_handlers.values()):
+            fh.flush()
+        if self._events_handler is not None:
+            self._events_handler.flush()
+        if self.disk is not None:
+            self.disk.flush()
+
+    def stats(self):
+        if self.disk is not None:
+            self.metrics.set("disk_pending_jobs", self.disk.pending)
+            self.metrics.set("disk_bytes", self.disk.bytes_written)
+            # Blocs alloués en plus du pool parce que le disque prenait du retard
+            self.metrics.set("chunk_overruns", self.session.overruns)
+        return {
+            "received": dict(self.received),
+            "written": dict(self.written),
+            "rejected": {key: f.rejected for key, f in self.filters.items()},
+            "predictions": dict(self.detector.predictions) if self.detector is not None else {},
+            "events": {key: s.count for key, s in self.segmenters.items()},
+            "metrics": self.metrics.snapshot(),
+        }
+
+    def close(self):
+        """
+        Prédit les dernières trames, clôt les saisies en cours, écrit les
+        données en attente, ferme les fichiers et compacte la session. Retourne le message d'erreur du dernier flush, ou None.
+        """
+        error = None
+        try:
+            if self._events_handler is not None:
+                if self.aligner is not None:
+                    for frame in self.aligner.flush():
+                        self._process_frame(frame)
+                for sensor_id, segmenter in self.segmenters.items():
+                    event = segmenter.flush()
+                    if event is not None:
+                        self._write_event(sensor_id, event)
+            self.flush()
+        except Exception as e:
+            error = str(e)
+        if self.session is not None:
+            self.session.close()
+        for fh in list(self._csv_handlers.values()) + list(self._prediction_handlers.values()):
+            fh.close()
+        if self._events_handler is not None:
+            self._events_handler.close()
+        if self.disk is not None:
+            try:
+                self.disk.close()
+            except Exception as e:
+                error = error or str(e)
+        if self.session is not None and error is None:
+            # Une seule série de colonnes par capteur : lecture sans copie (voir utils/session.py)
+            try:
+                compact(self.session_path)
+            except Exception as e:
+                error = str(e)
+        if self.live is not None:
+            self.live.close()
+            self.live = None
+        return error
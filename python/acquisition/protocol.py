@@ -0,0 +1,112 @@
+"""
+Protocole binaire du firmware kemono_realtime.ino (BINARY_MODE 1).
+
+Une trame de 19 octets par lecture des 5 capteurs :
+sync (0xA5 0x5A) | séquence u16 | temps u32 (ms) | 5 x ADC u16 | checksum u8
+
+Les trames sont décodées par blocs avec np.frombuffer ; la conversion
+ADC -> résistance est faite sur tout le bloc par calibration.py.
+"""
+import numpy as np
+
+SYNC = b"\xa5\x5a"
+NUM_SENSORS = 5
+
+FRAME_DTYPE = np.dtype([
+    ("sync", "u1", (2,)),
+    ("sequence", "<u2"),
+    ("millis", "<u4"),
+    ("adc", "<u2", (NUM_SENSORS,)),
+    ("checksum", "u1"),
+])
+FRAME_SIZE = FRAME_DTYPE.itemsize
+
+# Pont diviseur du firmware
+R_FIXED = 9100.0
+V_IN = 3.3
+ADC_MAX = 1023
+
+
+def adc_to_resistance(adc, r_fixed=R_FIXED, v_in=V_IN, adc_max=ADC_MAX):
+    """
+    Même calcul que le firmware (R = R_fixed * (V_in - V_out) / V_out), sur un
+    tableau entier. Un ADC à 0 donne inf, comme sur la carte.
+    """
+    v_out = np.asarray(adc, dtype=np.float64) * (v_in / adc_max)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return r_fixed * (v_in - v_out) / v_out
+
+
+def _checksums_ok(raw):
+    """raw : (n, FRAME_SIZE) octets. Vérifie la somme modulo 256 de chaque trame."""
+    payload = raw[:, len(SYNC):FRAME_SIZE - 1]
+    return (payload.sum(axis=1, dtype=np.uint32) & 0xFF) == raw[:, FRAME_SIZE - 1]
+
+
+class FrameDecoder:
+    """
+    Décode un flux d'octets en trames. Les octets d'une trame incomplète sont
+    gardés pour l'appel suivant ; en cas de perte de synchronisation, le
+    décodeur se recale sur le prochain motif 0xA5 0x5A.
+    """
+
+    def __init__(self):
+        self._pending = b""
+        self._last_sequence = None
+        self.frames = 0
+        self.bad_checksums = 0
+        self.lost_frames = 0
+        self.skipped_bytes = 0
+
+    def feed(self, data):
+        """Ajoute des octets reçus et retourne les trames complètes (tableau FRAME_DTYPE)."""
+        buffer = self._pending + bytes(data)
+        chunks = []
+        start = 0
+
+        while len(buffer) - start >= FRAME_SIZE:
+            sync = buffer.find(SYNC, start)
+            if sync < 0:
+                # Garder le dernier octet : il peut être le début d'une synchronisation
+                self.skipped_bytes += len(buffer) - 1 - start
+                start = len(buffer) - 1
+                break
+            self.skipped_bytes += sync - start
+            start = sync
+
+            # Chemin rapide : toutes les trames alignées à partir d'ici
+            count = (len(buffer) - start) // FRAME_SIZE
+            raw = np.frombuffer(buffer, dtype=np.uint8, count=count * FRAME_SIZE, offset=start)
+            raw = raw.reshape(count, FRAME_SIZE)
+            aligned = (raw[:, 0] == SYNC[0]) & (raw[:, 1] == SYNC[1]) & _checksums_ok(raw)
+            if aligned.all():
+                chunks.append(raw)
+                start += count * FRAME_SIZE
+                continue
+
+            # Garder les trames valides jusqu'à la première anomalie, puis se recaler
+            good = int(np.argmin(aligned))
+            if good:
+                chunks.append(raw[:good])
+                start += good * FRAME_SIZE
+            else:
+                if raw[0, 0] == SYNC[0] and raw[0, 1] == SYNC[1]:
+                    self.bad_checksums += 1
+                start += 1
+
+        self._pending = buffer[start:]
+        if not chunks:
+            return np.empty(0, dtype=FRAME_DTYPE)
+
+        frames = np.concatenate(chunks).view(FRAME_DTYPE).reshape(-1)
+        self._count_lost(frames["sequence"])
+        self.frames += len(frames)
+        return frames
+
+    def _count_lost(self, sequences):
+        if self._last_sequence is not None:
+            sequences = np.concatenate([[self._last_sequence], sequences])
+        gaps = (np.diff(sequences.astype(np.int64)) - 1) % 65536
+        self.lost_frames += int(gaps.sum())
+        self._last_sequence = int(sequences[-1])
+
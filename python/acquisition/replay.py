@@ -0,0 +1,131 @@
+"""
+Rejeu sans matériel.
+
+    # Pseudo-terminal (Linux/macOS) : data_reception.py s'y connecte comme à l'Arduino
+    python python/acquisition/replay.py pty --replay data/processed --speed 1
+    python python/acquisition/data_reception.py --port /dev/pts/N
+
+    # Débit maximal et latence de bout en bout de la chaîne de réception + inférence
+    python python/acquisition/replay.py bench --synthetic 600 --speed 0
+    python python/acquisition/replay.py bench --replay data/processed --speed 10 --json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Rendre les modules de python/ importables quand le script est lancé directement
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from acquisition import data_reception
+from acquisition.protocol import FRAME_SIZE
+from acquisition.sources import ReplaySource, SourceExhausted
+from inference.streaming import MODELS_DIR
+
+
+def make_source(args):
+    speed = args.speed or None
+    if args.replay is not None:
+        return ReplaySource.from_path(args.replay, speed=speed, binary=args.binary)
+    return ReplaySource.synthetic(args.synthetic, seed=args.seed, speed=speed, binary=args.binary)
+
+
+# ========== PSEUDO-TERMINAL ==========
+
+def serve_pty(source):
+    import tty
+
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    print(f"Flux disponible sur {os.ttyname(slave)} (Ctrl+C pour arrêter)")
+    try:
+        while True:
+            data = source.read(FRAME_SIZE) if source.binary else source.readline()
+            os.write(master, data)
+    except SourceExhausted:
+        print("Fin de l'enregistrement rejoué.")
+        time.sleep(1)  # Laisser le lecteur vider le terminal
+    except KeyboardInterrupt:
+        pass
+    finally:
+        os.close(master)
+        os.close(slave)
+
+
+# ========== BENCHMARK ==========
+
+def bench(source, models_dir=MODELS_DIR, binary=False):
+    """
+    Fait passer toute la source dans data_reception.run (lecture, décodage,
+    filtre, écriture, features, prédiction) et mesure le débit et la latence
+    entre la mise à disposition d'un échantillon et sa prédiction.
+    """
+    latencies = []
+
+    def on_prediction(sensor_id, timestamp, prediction):
+        latencies.append(time.perf_counter() - source.release_time(timestamp))
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        started = time.perf_counter()
+        # Les messages de la boucle (une ligne par échantillon en mode texte) sont écartés
+        with contextlib.redirect_stdout(io.StringIO()):
+            data_reception.run(binary=binary, source=source, output_dir=output_dir,
+                               session_path=os.path.join(output_dir, "bench.kms"),
+                               models_dir=models_dir, on_prediction=on_prediction)
+        elapsed = time.perf_counter() - started
+
+    result = {
+        "speed": source.speed,
+        "binary": binary,
+        "samples": len(latencies),
+        "elapsed_s": elapsed,
+        "samples_per_s": len(latencies) / elapsed if elapsed else 0.0,
+    }
+    if source.speed is not None and latencies:
+        latencies_ms = np.asarray(latencies) * 1000.0
+        result.update({
+            "latency_p50_ms": float(np.percentile(latencies_ms, 50)),
+            "latency_p99_ms": float(np.percentile(latencies_ms, 99)),
+            "latency_max_ms": float(latencies_ms.max()),
+        })
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rejeu de sessions sans Arduino.")
+    parser.add_argument("mode", choices=["pty", "bench"])
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--replay", help="Dossier de CSV data_capteurN_filtered.csv ou session .kms")
+    group.add_argument("--synthetic", type=float, metavar="SECONDES", help="Durée de signal synthétique")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="1 = temps réel, N = N fois plus vite, 0 = aussi vite que possible")
+    parser.add_argument("--binary", action="store_true", help="Émuler les trames binaires (BINARY_MODE 1)")
+    parser.add_argument("--models", default=MODELS_DIR, help="Dossier des modèles (bench)")
+    parser.add_argument("--json", action="store_true", help="Résultat du bench en JSON")
+    args = parser.parse_args()
+
+    source = make_source(args)
+    if args.mode == "pty":
+        serve_pty(source)
+        return
+
+    result = bench(source, args.models, args.binary)
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"{result['samples']} échantillons en {result['elapsed_s']:.2f} s "
+          f"({result['samples_per_s']:.0f} échantillons/s)")
+    if "latency_p50_ms" in result:
+        print(f"Latence : p50 {result['latency_p50_ms']:.2f} ms, p99 {result['latency_p99_ms']:.2f} ms, "
+              f"max {result['latency_max_ms']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
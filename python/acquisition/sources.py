@@ -0,0 +1,218 @@
+"""
+Sources de données sans matériel pour data_reception.py.
+
+`ReplaySource` rejoue des enregistrements (CSV data_capteurN_filtered.csv ou
+session .kms) et `SyntheticSource` génère des signaux de saisie artificiels.
+Les deux émulent le flux de kemono_realtime.ino (lignes texte ou trames
+binaires) et exposent la même interface que serial.Serial (readline, read,
+in_waiting, close) : elles se branchent directement sur la boucle de
+réception, ou sur un pseudo-terminal (voir replay.py).
+
+La cadence est réglable : speed=1 pour le temps réel, N pour N fois plus vite,
+None pour envoyer les données aussi vite que possible.
+"""
+import glob
+import os
+import time
+
+import numpy as np
+import serial
+
+from acquisition.protocol import ADC_MAX, FRAME_DTYPE, NUM_SENSORS, R_FIXED, SYNC
+from utils.session import SESSION_EXTENSION, open_session
+
+
+class SourceExhausted(EOFError):
+    """Levée quand une source rejouée n'a plus de données."""
+
+
+# ========== CHARGEMENT DES ENREGISTREMENTS ==========
+
+def load_recording(path):
+    """
+    Retourne (sensor_ids, timestamps, resistances) triés par temps, à partir
+    d'une session .kms ou d'un dossier de fichiers data_capteurN_filtered.csv.
+    """
+    if path.endswith(SESSION_EXTENSION):
+        records = open_session(path).records
+        sensors, timestamps, resistances = records["sensor"], records["timestamp"], records["resistance"]
+    else:
+        import pandas as pd
+
+        parts = []
+        for file in sorted(glob.glob(os.path.join(path, "data_capteur*_filtered.csv"))):
+            sensor_id = int(os.path.basename(file)[len("data_capteur")])
+            df = pd.read_csv(file)
+            parts.append((np.full(len(df), sensor_id), df["Timestamp"].to_numpy(), df["Resistance"].to_numpy()))
+        if not parts:
+            raise FileNotFoundError(f"Aucun fichier data_capteurN_filtered.csv dans {path}")
+        sensors, timestamps, resistances = (np.concatenate(columns) for columns in zip(*parts))
+
+    order = np.argsort(timestamps, kind="stable")
+    return (np.asarray(sensors, dtype=np.int64)[order],
+            np.asarray(timestamps, dtype=np.int64)[order],
+            np.asarray(resistances, dtype=np.float64)[order])
+
+
+def synthetic_recording(duration_s=60.0, period_ms=100, seed=0):
+    """
+    Signaux artificiels pour les 5 capteurs : une résistance de repos bruitée
+    et des saisies (chute de résistance) de 1 à 3 s à des instants aléatoires.
+    """
+    rng = np.random.default_rng(seed)
+    n_ticks = int(duration_s * 1000 / period_ms)
+    ticks = np.arange(n_ticks) * period_ms
+
+    resistances = rng.normal(200.0, 8.0, (n_ticks, NUM_SENSORS))
+    for sensor in range(NUM_SENSORS):
+        start = 0
+        while True:
+            start += int(rng.integers(20, 80))
+            length = int(rng.integers(10, 30))
+            if start >= n_ticks:
+                break
+            resistances[start:start + length, sensor] -= rng.uniform(60.0, 120.0)
+            start += length
+    resistances = np.clip(resistances, 1.0, None)
+
+    # Lecture séquentielle des capteurs : 1 ms d'écart dans chaque tick
+    timestamps = ticks[:, None] + np.arange(NUM_SENSORS)[None, :]
+    sensors = np.broadcast_to(np.arange(1, NUM_SENSORS + 1), (n_ticks, NUM_SENSORS))
+    return sensors.ravel(), timestamps.ravel(), resistances.ravel()
+
+
+def resistance_to_adc(resistances, r_fixed=R_FIXED, adc_max=ADC_MAX):
+    """Inverse du pont diviseur : valeur ADC qui donne cette résistance."""
+    return np.clip(np.rint(adc_max * r_fixed / (np.asarray(resistances) + r_fixed)), 0, adc_max).astype(np.uint16)
+
+
+# ========== SOURCE REJOUÉE ==========
+
+class ReplaySource:
+    """Émule le port série de l'Arduino à partir d'échantillons (capteur, temps, résistance)."""
+
+    def __init__(self, sensor_ids, timestamps, resistances, speed=1.0, binary=False):
+        self.speed = speed
+        self.binary = binary
+        self.is_open = True
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+
+        if binary:
+            messages, message_times = self._frames(np.asarray(sensor_ids), timestamps, np.asarray(resistances))
+        else:
+            # Même format que Serial.println(float) : 2 décimales
+            messages = [
+                f"{s},{t},{r:.2f}\r\n".encode()
+                for s, t, r in zip(np.asarray(sensor_ids).tolist(), timestamps.tolist(), np.asarray(resistances).tolist())
+            ]
+            message_times = timestamps
+
+        self._messages = messages
+        self._offsets = np.cumsum([0] + [len(m) for m in messages])
+        self._stream = b"".join(messages)
+        self._message_times = np.asarray(message_times, dtype=np.int64)
+        self._first_time = int(self._message_times[0]) if len(messages) else 0
+        self._index = 0       # prochain message (mode texte)
+        self._position = 0    # prochain octet (mode binaire)
+        self._started_at = None
+
+    @classmethod
+    def from_path(cls, path, **kwargs):
+        return cls(*load_recording(path), **kwargs)
+
+    @classmethod
+    def synthetic(cls, duration_s=60.0, seed=0, **kwargs):
+        return cls(*synthetic_recording(duration_s, seed=seed), **kwargs)
+
+    @staticmethod
+    def _frames(sensor_ids, timestamps, resistances):
+        """Regroupe le k-ième échantillon de chaque capteur dans la k-ième trame."""
+        per_sensor = [np.flatnonzero(sensor_ids == s) for s in range(1, NUM_SENSORS + 1)]
+        count = min(len(index) for index in per_sensor)
+        frames = np.zeros(count, dtype=FRAME_DTYPE)
+        frames["sync"] = list(SYNC)
+        frames["sequence"] = np.arange(count) % 65536
+        frames["millis"] = timestamps[per_sensor[0][:count]]
+        for s, index in enumerate(per_sensor):
+            frames["adc"][:, s] = resistance_to_adc(resistances[index[:count]])
+        raw = frames.view(np.uint8).reshape(count, -1)
+        raw[:, -1] = raw[:, len(SYNC):-1].sum(axis=1, dtype=np.uint32) & 0xFF
+        return [row.tobytes() for row in raw], frames["millis"]
+
+    # ---------- Cadence ----------
+
+    def release_time(self, timestamp):
+        """Instant (time.perf_counter) où le message de temps firmware `timestamp` devient disponible."""
+        if self.speed is None or self._started_at is None:
+            return self._started_at or 0.0
+        return self._started_at + (timestamp - self._first_time) / 1000.0 / self.speed
+
+    def _start(self):
+        if self._started_at is None:
+            self._started_at = time.perf_counter()
+
+    def _wait_for(self, index):
+        if self.speed is not None:
+            delay = self.release_time(self._message_times[index]) - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+
+    def _released(self):
+        """Nombre de messages disponibles à l'instant présent."""
+        if self.speed is None:
+            return len(self._messages)
+        elapsed_ms = (time.perf_counter() - self._started_at) * 1000.0 * self.speed
+        return int(np.searchsorted(self._message_times, self._first_time + elapsed_ms, side="right"))
+
+    # ---------- Interface serial.Serial ----------
+
+    def readline(self):
+        self._start()
+        if self._index >= len(self._messages):
+            raise SourceExhausted("Fin de l'enregistrement rejoué")
+        self._wait_for(self._index)
+        message = self._messages[self._index]
+        self._index += 1
+        return message
+
+    @property
+    def in_waiting(self):
+        self._start()
+        return max(0, int(self._offsets[self._released()]) - self._position)
+
+    def read(self, size=1):
+        self._start()
+        if self._position >= len(self._stream):
+            raise SourceExhausted("Fin de l'enregistrement rejoué")
+        end = min(self._position + size, len(self._stream))
+        # Attendre que le message contenant le dernier octet demandé soit émis
+        last_message = int(np.searchsorted(self._offsets, end, side="left")) - 1
+        self._wait_for(max(last_message, 0))
+        data = self._stream[self._position:end]
+        self._position = end
+        return data
+
+    @property
+    def exhausted(self):
+        """Toutes les données ont été lues avec `read`."""
+        return self._position >= len(self._stream)
+
+    def write(self, data):
+        return len(data)
+
+    def close(self):
+        self.is_open = False
+
+
+# ========== OUVERTURE ==========
+
+def open_source(port, baudrate=9600, timeout=1, replay=None, synthetic=None, speed=1.0, binary=False):
+    """
+    Port série réel par défaut ; `replay` (dossier de CSV ou session .kms) ou
+    `synthetic` (durée en secondes) pour travailler sans carte.
+    """
+    if replay is not None:
+        return ReplaySource.from_path(replay, speed=speed, binary=binary)
+    if synthetic is not None:
+        return ReplaySource.synthetic(synthetic, speed=speed, binary=binary)
+    return serial.Serial(port, baudrate, timeout=timeout)
@@ -0,0 +1,377 @@
+"""
+Benchmarks of the pipeline hot paths on synthetic data.
+
+Each case runs in its own process (so peak RSS is per case) for every
+requested size and reports throughput, p50/p99 per-sample latency and peak
+RSS. Results are written as JSON so two commits can be compared:
+
+    python python/benchmarks/bench_pipeline.py --sizes 1e3 1e5 1e7 -o before.json
+    python python/benchmarks/bench_pipeline.py --sizes 1e3 1e5 1e7 -o after.json
+    python python/benchmarks/bench_pipeline.py --compare before.json after.json
+
+Streaming cases (one call per sample) time every call, up to `max_calls` of
+them; batch cases time whole runs and report the per-sample cost of each run.
+"""
+import argparse
+import csv
+import io
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import queue as queues
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+
+# Make the python/ modules importable when the script is launched directly
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+MODELS_DIR = os.path.join(REPO_ROOT, "data", "models")
+BATCH_REPEATS = 5
+# How often a running case is checked for a child process that died without a result (s)
+POLL_INTERVAL = 1.0
+
+
+# ========== SYNTHETIC DATA ==========
+
+def synthetic_sensor(n, seed=0):
+    """Timestamps (ms, 10 Hz), resistances and labels of one sensor."""
+    rng = np.random.default_rng(seed)
+    timestamps = np.arange(n, dtype=np.int64) * 100
+    labels = (np.sin(np.arange(n) / 40.0) > 0.3).astype(np.int64)
+    resistances = rng.normal(200.0, 10.0, n) - 80.0 * labels
+    resistances[rng.random(n) < 0.001] = 5000.0  # outliers
+    return timestamps, resistances, labels
+
+
+def synthetic_lines(n, seed=0):
+    timestamps, resistances, _ = synthetic_sensor(n, seed)
+    sensors = np.arange(n) % 5 + 1
+    return [f"{s},{t},{r:.2f}\r\n".encode() for s, t, r in zip(sensors.tolist(), timestamps.tolist(),
+                                                              resistances.tolist())]
+
+
+def load_shipped_model(sensor_id=1):
+    import joblib
+    return joblib.load(os.path.join(os.environ.get("KEMONO_BENCH_MODELS", MODELS_DIR),
+                                    f"sensor_model_s{sensor_id}.pkl"))
+
+
+# ========== CASES ==========
+# A case returns either ("stream", per-call durations in ns) or ("batch", run durations in ns).
+
+def case_format_data(n):
+    from training.format_data import format_data
+    timestamps, resistances, labels = synthetic_sensor(n)
+    seconds = timestamps / 1000.0
+    return "batch", [_timed(lambda: format_data(seconds, resistances, labels)) for _ in range(BATCH_REPEATS)]
+
+
+def case_features_batch(n):
+    from utils.features import FeatureExtractor
+    timestamps, resistances, _ = synthetic_sensor(n)
+    return "batch", [_timed(lambda: FeatureExtractor.transform(timestamps, resistances))
+                     for _ in range(BATCH_REPEATS)]
+
+
+def case_features_incremental(n):
+    from utils.features import FeatureExtractor
+    timestamps, resistances, _ = synthetic_sensor(n)
+    extractor = FeatureExtractor()
+    out = np.empty(5)
+    return "stream", _timed_calls(extractor.update, zip(timestamps.tolist(), resistances.tolist(),
+                                                       [out] * n))
+
+
+def case_predict_sklearn_batch(n):
+    from utils.features import FeatureExtractor
+    model = load_shipped_model()
+    X = FeatureExtractor.transform(*synthetic_sensor(n)[:2])
+    return "batch", [_timed(lambda: model.predict(X)) for _ in range(BATCH_REPEATS)]
+
+
+def case_predict_sklearn_sample(n):
+    from utils.features import FeatureExtractor
+    model = load_shipped_model()
+    X = FeatureExtractor.transform(*synthetic_sensor(n)[:2])
+    return "stream", _timed_calls(model.predict, ((X[i:i + 1],) for i in range(n)))
+
+
+def case_predict_compiled_sample(n):
+    from utils.features import FeatureExtractor
+    from utils.forest import CompiledForest, flatten_forest
+    forest = CompiledForest(flatten_forest(load_shipped_model()))
+    X = FeatureExtractor.transform(*synthetic_sensor(n)[:2])
+    return "stream", _timed_calls(forest.predict, ((X[i:i + 1],) for i in range(n)))
+
+
+def case_parse_text(n):
+    from acquisition.data_reception import read_text_samples
+    from utils.metrics import Metrics
+    lines = iter(synthetic_lines(n))
+    metrics = Metrics()
+
+    class Lines:
+        def readline(self):
+            return next(lines)
+
+    source = Lines()
+    with _quiet():
+        return "stream", _timed_calls(read_text_samples, ((source, metrics) for _ in range(n)))
+
+
+def case_decode_binary(n):
+    from acquisition.calibration import Calibration
+    from acquisition.protocol import FrameDecoder
+    from acquisition.sources import ReplaySource
+    timestamps, resistances, _ = synthetic_sensor(n)
+    sensors = np.arange(n) % 5 + 1
+    stream = ReplaySource(sensors, timestamps, resistances, speed=None, binary=True)._stream
+    calibration = Calibration()
+
+    def decode():
+        decoder = FrameDecoder()
+        for start in range(0, len(stream), 4096):
+            calibration.resistance(decoder.feed(stream[start:start + 4096])["adc"])
+
+    return "batch", [_timed(decode) for _ in range(BATCH_REPEATS)]
+
+
+def case_online_filter(n):
+    from acquisition.filters import OnlineOutlierFilter
+    _, resistances, _ = synthetic_sensor(n)
+    outlier_filter = OnlineOutlierFilter()
+    return "stream", _timed_calls(outlier_filter.accept, ((r,) for r in resistances.tolist()))
+
+
+def case_write_csv(n):
+    timestamps, resistances, _ = synthetic_sensor(n)
+    rows = list(zip(timestamps.tolist(), resistances.astype(np.int64).tolist()))
+
+    def write():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow(row)
+
+    return "batch", [_timed(write) for _ in range(BATCH_REPEATS)]
+
+
+def case_write_session(n):
+    from utils.session import SessionWriter
+    timestamps, resistances, _ = synthetic_sensor(n)
+    rows = list(zip(timestamps.tolist(), resistances.astype(np.int64).tolist()))
+
+    def write():
+        with tempfile.TemporaryDirectory() as directory:
+            with SessionWriter(os.path.join(directory, "bench.kms")) as writer:
+                for timestamp, resistance in rows:
+                    writer.append(1, timestamp, resistance)
+
+    return "batch", [_timed(write) for _ in range(BATCH_REPEATS)]
+
+
+# name -> (function, largest size worth running)
+CASES = {
+    "format_data": (case_format_data, 10 ** 7),
+    "features_batch": (case_features_batch, 10 ** 7),
+    "features_incremental": (case_features_incremental, 10 ** 6),
+    "predict_sklearn_batch": (case_predict_sklearn_batch, 10 ** 6),
+    "predict_sklearn_sample": (case_predict_sklearn_sample, 10 ** 3),
+    "predict_compiled_sample": (case_predict_compiled_sample, 10 ** 4),
+    "parse_text": (case_parse_text, 10 ** 6),
+    "decode_binary": (case_decode_binary, 10 ** 7),
+    "online_filter": (case_online_filter, 10 ** 6),
+    "write_csv": (case_write_csv, 10 ** 6),
+    "write_session": (case_write_session, 10 ** 6),
+}
+
+
+# ========== TIMING ==========
+
+class _quiet:
+    """Silences the acquisition messages (logged per line at DEBUG, or printed)."""
+
+    def __enter__(self):
+        self._stdout = sys.stdout
+        sys.stdout = io.StringIO()
+        logging.disable(logging.CRITICAL)
+
+    def __exit__(self, *exc):
+        logging.disable(logging.NOTSET)
+        sys.stdout = self._stdout
+
+
+def _timed(function):
+    start = time.perf_counter_ns()
+    function()
+    return time.perf_counter_ns() - start
+
+
+def _timed_calls(function, arguments):
+    durations = []
+    clock = time.perf_counter_ns
+    for args in arguments:
+        start = clock()
+        function(*args)
+        durations.append(clock() - start)
+    return durations
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _run_case(name, n, queue):
+    warnings.simplefilter("ignore")
+    try:
+        kind, durations = CASES[name][0](n)
+        durations = np.asarray(durations, dtype=np.float64)
+        if kind == "stream":
+            per_sample_us = durations / 1000.0
+            total_s = durations.sum() / 1e9
+            samples = len(durations)
+        else:
+            per_sample_us = durations / 1000.0 / n
+            total_s = float(np.median(durations)) / 1e9
+            samples = n
+        queue.put({
+            "case": name,
+            "n": n,
+            "kind": kind,
+            "throughput_per_s": samples / total_s if total_s else None,
+            "p50_us": float(np.percentile(per_sample_us, 50)),
+            "p99_us": float(np.percentile(per_sample_us, 99)),
+            "peak_rss_mb": _peak_rss_mb(),
+        })
+    except Exception as e:
+        message = str(e).splitlines()[0] if str(e) else ""
+        queue.put({"case": name, "n": n, "error": f"{type(e).__name__}: {message}"})
+
+
+def run_case(name, n):
+    """
+    Runs one case in a fresh process and returns its result dict. A process
+    that dies without a result (killed for lack of memory, crashed) is
+    reported as a failed case instead of blocking the suite.
+    """
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_run_case, args=(name, n, queue))
+    process.start()
+    while True:
+        try:
+            result = queue.get(timeout=POLL_INTERVAL)
+            break
+        except queues.Empty:
+            if process.is_alive():
+                continue
+        # The process may have put its result just before exiting
+        try:
+            result = queue.get(timeout=POLL_INTERVAL)
+        except queues.Empty:
+            result = {"case": name, "n": n, "failed": True,
+                      "error": f"process exited with code {process.exitcode} without a result"}
+        break
+    process.join()
+    return result
+
+
+# ========== REPORTING ==========
+
+def metadata():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "commit": commit or None,
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def print_result(result):
+    if "error" in result:
+        status = "failed" if result.get("failed") else "skipped"
+        print(f"{result['case']:<26} n={result['n']:<9} {status}: {result['error']}")
+        return
+    rss = f"{result['peak_rss_mb']:.0f} MB" if result["peak_rss_mb"] is not None else "n/a"
+    print(f"{result['case']:<26} n={result['n']:<9} {result['throughput_per_s']:>14,.0f} samples/s  "
+          f"p50 {result['p50_us']:>9.3f} us  p99 {result['p99_us']:>9.3f} us  peak RSS {rss}")
+
+
+def compare(before_path, after_path):
+    with open(before_path) as f:
+        before = {(r["case"], r["n"]): r for r in json.load(f)["results"] if "error" not in r}
+    with open(after_path) as f:
+        after = json.load(f)["results"]
+
+    print(f"{'case':<26} {'n':>9} {'throughput':>12} {'p50':>8} {'p99':>8} {'RSS':>8}")
+    for result in after:
+        key = (result["case"], result["n"])
+        if "error" in result or key not in before:
+            continue
+        base = before[key]
+
+        def ratio(field, higher_is_better=False):
+            if not base.get(field) or not result.get(field):
+                return "n/a"
+            value = result[field] / base[field]
+            return f"{value if higher_is_better else 1 / value:.2f}x"
+
+        print(f"{result['case']:<26} {result['n']:>9} {ratio('throughput_per_s', True):>12} "
+              f"{ratio('p50_us'):>8} {ratio('p99_us'):>8} {ratio('peak_rss_mb'):>8}")
+    print("(ratios > 1 are improvements)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks of the K'e-mono pipeline.")
+    parser.add_argument("--sizes", nargs="+", type=float, default=[1e3, 1e4, 1e5],
+                        help="Synthetic dataset sizes (samples), e.g. 1e3 1e5 1e7")
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES), help="Subset of cases to run")
+    parser.add_argument("--models", default=MODELS_DIR, help="Folder of the sensor_model_sX.pkl files")
+    parser.add_argument("-o", "--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="Compare two JSON result files")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    # Read by the prediction cases, in the child processes
+    os.environ["KEMONO_BENCH_MODELS"] = args.models
+
+    results = []
+    for name in args.cases or CASES:
+        for n in sorted(int(size) for size in args.sizes):
+            if n > CASES[name][1]:
+                continue
+            result = run_case(name, n)
+            print_result(result)
+            results.append(result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"meta": metadata(), "results": results}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
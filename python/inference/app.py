@@ -1,19 +1,58 @@
+"""
+K'e-mono desktop app.
+
+Only tkinter is imported at startup, so the window shows up at once. The
+models and the processing code are loaded on a background thread once the
+window is drawn, the acquisition code when a recording starts, and
+matplotlib, pandas and PIL the first time results are displayed.
+
+    python python/inference/app.py
+    python python/inference/app.py --profile-startup
+"""
+import time
+
+STARTED = time.perf_counter()
+
+import importlib
+import os
+import sys
+import threading
 import tkinter as tk
 from tkinter import messagebox, Toplevel, Canvas
-from tkinter import PhotoImage
-import subprocess
-import threading
-import random
-from PIL import Image, ImageTk, ImageDraw
-import matplotlib.pyplot as plt
-import pandas as pd
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-import os
+
+TKINTER_IMPORTED = time.perf_counter()
+
+# Make the python/ modules importable when the app is launched directly
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# Modules kept out of startup, in the order they are timed by --profile-startup
+# (each cost leaves out what the modules above it already imported)
+DEFERRED_IMPORTS = [
+    "numpy",
+    "inference.processing",
+    "acquisition.data_reception",
+    "acquisition.control",
+    "pandas",
+    "PIL.Image",
+    "PIL.ImageTk",
+    "matplotlib.pyplot",
+    "matplotlib.backends.backend_tkagg",
+    "inference.dashboard",
+]
+# Startup budget checked by --profile-startup
+STARTUP_TARGET_MS = 300
 
 
 # ========== GLOBAL STATE ==========
-data_reception_process = None
-STOP_SIGNAL_PATH = "stop_signal.txt"
+acquisition = None
+# Models stay loaded between two clicks on "View results"
+processor = None
+processor_lock = threading.Lock()
+# Live view of the current recording (shared-memory ring written by the acquisition process)
+dashboard = None
+# A "stats" request to the acquisition process is in flight
+status_pending = False
+STATUS_INTERVAL_MS = 2000
 
 
 # ========== HELPERS ==========
@@ -24,36 +63,67 @@ def run_in_thread(target):
     thread.start()
 
 
+def get_processor():
+    """
+    The shared Processor, created (and its modules imported) on first call.
+    Its results are cached on disk: re-opening an unchanged session is instant.
+    """
+    global processor
+    with processor_lock:
+        if processor is None:
+            from inference.cache import ResultCache
+            from inference.processing import Processor
+            processor = Processor(cache=ResultCache())
+        return processor
+
+
+def warm_up():
+    """Imports the processing code and loads the models ahead of "View results"."""
+    get_processor().warm_up()
+
+
 # ========== START / STOP DATA COLLECTION ==========
 
 def start_data_reception():
-    global data_reception_process
+    global acquisition
 
-    # Remove previous stop signal if exists
-    if os.path.exists(STOP_SIGNAL_PATH):
-        os.remove(STOP_SIGNAL_PATH)
+    if acquisition and acquisition.is_alive():
+        messagebox.showwarning("Warning", "A recording is already running.")
+        return
 
+    ring = None
     try:
-        data_reception_process = subprocess.Popen(
-            ["python", "python/acquisition/data_reception.py"]
-        )
+        from acquisition import data_reception
+        from acquisition.control import AcquisitionClient
+        from utils.ringbuffer import SampleRing
+
+        ring = SampleRing.create()
+        acquisition = AcquisitionClient(data_reception.run, live_buffer=ring.name, log_level="INFO")
+        acquisition.start()
+        # Opening the serial port and loading the models take a few seconds
+        acquisition.request("start", timeout=30)
+        # Tk widgets must be created on the main thread
+        root.after(0, lambda: show_live_dashboard(ring))
         messagebox.showinfo("Recording", "Data recording started.")
     except Exception as e:
+        acquisition = None
+        if ring is not None:
+            release_ring(ring)
         messagebox.showerror("Error", f"Could not start recording:\n{e}")
 
 
 def stop_data_reception():
-    global data_reception_process
+    global acquisition
 
-    if data_reception_process:
+    if acquisition:
         try:
-            # Write stop signal
-            with open(STOP_SIGNAL_PATH, "w") as f:
-                f.write("stop")
-
-            data_reception_process.wait(timeout=5)
-            data_reception_process = None
-            messagebox.showinfo("Recording", "Recording stopped.")
+            # Returns as soon as the acquisition process has flushed its files
+            reply = acquisition.stop()
+            acquisition = None
+            if not reply.get("ok"):
+                raise RuntimeError(reply.get("error"))
+            saved = sum(reply.get("written", {}).values())
+            messagebox.showinfo("Recording", f"Recording stopped ({saved} samples saved).")
 
         except Exception as e:
             messagebox.showerror("Error", f"Error stopping recording:\n{e}")
@@ -61,9 +131,41 @@ def stop_data_reception():
         messagebox.showwarning("Warning", "No active recording.")
 
 
+# ========== LIVE DASHBOARD ==========
+
+def release_ring(ring):
+    ring.close()
+    ring.unlink()
+
+
+def show_live_dashboard(ring):
+    """Opens the live view of `ring`, replacing the one of a previous recording."""
+    global dashboard
+    close_live_dashboard()
+    try:
+        from inference.dashboard import LiveDashboard
+
+        dashboard = LiveDashboard(root, ring, on_close=lambda: release_ring(ring))
+    except Exception as e:
+        release_ring(ring)
+        messagebox.showerror("Error", f"Could not open the live view:\n{e}")
+
+
+def close_live_dashboard():
+    global dashboard
+    if dashboard is not None:
+        # Closing the window stops its refresh and frees the ring
+        if dashboard.window.winfo_exists():
+            dashboard.close()
+        dashboard = None
+
+
 # ========== DISPLAY GRAPH WINDOW ==========
 
-def show_results_graphs():
+def show_results_graphs(results):
+    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
     graph_window = Toplevel(root)
     graph_window.title("Sensor plots")
     graph_window.geometry("900x700")
@@ -71,23 +173,14 @@ def show_results_graphs():
     fig, axes = plt.subplots(5, 1, figsize=(8, 10), sharex=True)
     plt.subplots_adjust(hspace=0.5)
 
-    sensor_files = {
-        1: "data/processed/data_capteur1_filtered.csv",
-        2: "data/processed/data_capteur2_filtered.csv",
-        3: "data/processed/data_capteur3_filtered.csv",
-        4: "data/processed/data_capteur4_filtered.csv",
-        5: "data/processed/data_capteur5_filtered.csv"
-    }
-
     titles = ["Right arm", "Right lapel", "Neck", "Left lapel", "Left arm"]
     colors = ["blue", "red", "green", "purple", "orange"]
 
+    # Traces decimated (and cached) with the results, not the raw session
     for i, ax in enumerate(axes):
-        file = sensor_files[i + 1]
-        if os.path.exists(file):
-            df = pd.read_csv(file)
-            if not df.empty:
-                ax.plot(df["Timestamp"], df["Resistance"], color=colors[i], lw=2)
+        result = results.sensors.get(i + 1)
+        if result is not None and result.plot is not None:
+            ax.plot(*result.plot, color=colors[i], lw=2)
         ax.set_title(titles[i], fontsize=12)
         ax.grid(True)
 
@@ -98,6 +191,8 @@ def show_results_graphs():
 # ========== DISPLAY JUDOKA IMAGE WITH STATS ==========
 
 def show_results_with_image(percentages, total_saisies):
+    from PIL import Image, ImageTk, ImageDraw
+
     result_window = Toplevel(root)
     result_window.title("Training results")
     result_window.geometry("800x600")
@@ -148,84 +243,161 @@ def show_results_with_image(percentages, total_saisies):
     close_button.pack(pady=10)
 
 
+# ========== ACQUISITION STATUS ==========
+
+def format_status(stats):
+    """One line from the reply to "stats": samples, lag, model time and dropped samples."""
+    metrics = stats.get("metrics", {})
+    counters = metrics.get("counters", {})
+    latency = metrics.get("latency", {})
+    dropped = (sum(stats.get("rejected", {}).values()) + counters.get("malformed", 0)
+               + counters.get("duplicates", 0) + stats.get("lost_frames", 0))
+    return (f"{sum(stats.get('written', {}).values())} samples | "
+            f"lag p99 {latency.get('lag', {}).get('p99_ms', 0):.0f} ms | "
+            f"predict p99 {latency.get('predict', {}).get('p99_ms', 0):.2f} ms | "
+            f"dropped {dropped}")
+
+
+def fetch_status(client):
+    global status_pending
+    try:
+        reply = client.request("stats", timeout=5)
+        text = format_status(reply) if reply.get("ok") else reply.get("error", "")
+    except Exception:
+        text = ""
+    finally:
+        status_pending = False
+    root.after(0, lambda: status_label.config(text=text))
+
+
+def refresh_status():
+    """Polls the acquisition counters while a recording runs (the request is made off the Tk thread)."""
+    global status_pending
+    client = acquisition
+    if client is not None and client.is_alive() and not status_pending:
+        status_pending = True
+        run_in_thread(lambda: fetch_status(client))
+    elif client is None:
+        status_label.config(text="")
+    root.after(STATUS_INTERVAL_MS, refresh_status)
+
+
 # ========== PROCESSING PIPELINE ==========
 
 def process_results():
     """
-    Runs traitement_all_sensors.py to compute the number of grips per sensor
-    and displays numerical + graphical results.
+    Computes the grips of every sensor of the last session (on the calling
+    worker thread, with the models already loaded) and displays numerical +
+    graphical results.
     """
     try:
-        result = subprocess.run(
-            ["python", "python/inference/traitement_all_sensors.py"],
-            capture_output=True,
-            text=True
-        )
+        from inference.processing import default_source
 
-        output_lines = result.stdout.split("\n")
-        results = [line for line in output_lines if "Capteur" in line]
+        results = get_processor().process(default_source())
+    except Exception as e:
+        # `e` is deleted at the end of the except block: build the message now
+        message = f"Processing failed:\n{e}"
+        root.after(0, lambda: messagebox.showerror("Error", message))
+        return
+    # Tk widgets must be created on the main thread
+    root.after(0, lambda: display_results(results))
 
-        if not results:
-            messagebox.showwarning("No data", "No sensor data detected.")
-            return
 
-        total_saisies = sum(int(line.split(":")[1].split()[0]) for line in results)
-        if total_saisies == 0:
-            messagebox.showwarning("No grips", "No grips detected.")
-            return
+def display_results(results):
+    if not results.sensors:
+        errors = "\n".join(f"Sensor {sensor_id}: {error}" for sensor_id, error in results.errors.items())
+        messagebox.showwarning("No data", "No sensor data detected." + (f"\n{errors}" if errors else ""))
+        return
 
-        percentages = {
-            i + 1: int(line.split(":")[1].split()[0]) / total_saisies * 100
-            for i, line in enumerate(results)
-        }
+    if results.total_grips == 0:
+        messagebox.showwarning("No grips", "No grips detected.")
+        return
 
-        show_results_with_image(percentages, total_saisies)
-        show_results_graphs()
+    show_results_with_image(results.percentages(), results.total_grips)
+    show_results_graphs(results)
 
-    except Exception as e:
-        messagebox.showerror("Error", f"Processing failed:\n{e}")
+
+# ========== STARTUP PROFILING ==========
+
+def profile_startup():
+    """
+    Reports the time from the start of the script to the first drawn window,
+    then the cost of each deferred import, and closes the app.
+    """
+    root.update_idletasks()
+    root.update()
+    first_window_ms = (time.perf_counter() - STARTED) * 1000
+    print(f"First window: {first_window_ms:.0f} ms after start (target {STARTUP_TARGET_MS} ms)")
+    print(f"  {'tkinter':<36}{(TKINTER_IMPORTED - STARTED) * 1000:>8.1f} ms")
+
+    print("Deferred imports:")
+    for module in DEFERRED_IMPORTS:
+        started = time.perf_counter()
+        try:
+            importlib.import_module(module)
+        except Exception as e:
+            print(f"  {module:<36}{'failed':>8}  ({type(e).__name__}: {str(e).splitlines()[0] if str(e) else ''})")
+            continue
+        print(f"  {module:<36}{(time.perf_counter() - started) * 1000:>8.1f} ms")
+
+    root.destroy()
+    return 0 if first_window_ms <= STARTUP_TARGET_MS else 1
 
 
 # ========== GUI ==========
 
-root = tk.Tk()
-root.title("K'e-mono app")
-root.geometry("500x400")
-root.resizable(False, False)
-root.configure(bg="#f4f4f4")
-
-title_label = tk.Label(root, text="K'e-mono", font=("Helvetica", 20, "bold"),
-                       fg="#333333", bg="#f4f4f4")
-title_label.pack(pady=10)
-
-button_style = {
-    "font": ("Helvetica", 14),
-    "bg": "#007BFF",
-    "fg": "white",
-    "activebackground": "#0056b3",
-    "activeforeground": "white",
-    "bd": 3,
-    "width": 25
-}
-
-tk.Button(root, text="Start training",
-          command=lambda: run_in_thread(start_data_reception),
-          **button_style).pack(pady=10)
-
-tk.Button(root, text="End training",
-          command=stop_data_reception,
-          **button_style).pack(pady=10)
-
-tk.Button(root, text="View results",
-          command=lambda: run_in_thread(process_results),
-          **button_style).pack(pady=10)
-
-tk.Button(root, text="Exit",
-          command=root.quit,
-          **button_style).pack(pady=40)
-
-footer_label = tk.Label(root, text="© 2025 Smart kimono project",
-                        font=("Helvetica", 10), fg="#888888", bg="#f4f4f4")
-footer_label.pack(side="bottom", pady=5)
-
-root.mainloop()
+if __name__ == "__main__":
+    root = tk.Tk()
+    root.title("K'e-mono app")
+    root.geometry("500x400")
+    root.resizable(False, False)
+    root.configure(bg="#f4f4f4")
+
+    title_label = tk.Label(root, text="K'e-mono", font=("Helvetica", 20, "bold"),
+                           fg="#333333", bg="#f4f4f4")
+    title_label.pack(pady=10)
+
+    button_style = {
+        "font": ("Helvetica", 14),
+        "bg": "#007BFF",
+        "fg": "white",
+        "activebackground": "#0056b3",
+        "activeforeground": "white",
+        "bd": 3,
+        "width": 25
+    }
+
+    tk.Button(root, text="Start training",
+              command=lambda: run_in_thread(start_data_reception),
+              **button_style).pack(pady=10)
+
+    tk.Button(root, text="End training",
+              command=stop_data_reception,
+              **button_style).pack(pady=10)
+
+    tk.Button(root, text="View results",
+              command=lambda: run_in_thread(process_results),
+              **button_style).pack(pady=10)
+
+    tk.Button(root, text="Exit",
+              command=root.quit,
+              **button_style).pack(pady=40)
+
+    footer_label = tk.Label(root, text="© 2025 Smart kimono project",
+                            font=("Helvetica", 10), fg="#888888", bg="#f4f4f4")
+    footer_label.pack(side="bottom", pady=5)
+
+    # Counters and latencies of the running recording
+    status_label = tk.Label(root, text="", font=("Helvetica", 9), fg="#555555", bg="#f4f4f4")
+    status_label.pack(side="bottom")
+
+    if "--profile-startup" in sys.argv[1:]:
+        sys.exit(profile_startup())
+
+    # Load the models while the user records, not on the first "View results",
+    # once the window is drawn so the imports do not hold up the first frame
+    root.after(200, lambda: run_in_thread(warm_up))
+    root.after(STATUS_INTERVAL_MS, refresh_status)
+
+    root.mainloop()
+    close_live_dashboard()
@@ -0,0 +1,173 @@
+"""
+Batch scoring of many recorded sessions.
+
+Scores every (session, sensor) pair of a list of sessions on a process pool:
+each worker loads the five models once when it starts, then only reads
+session data, computes features and predicts. A session is either a .kms file
+written by data_reception.py or a folder of data_capteurN_filtered.csv files;
+a folder holding .kms files is expanded to those sessions.
+
+    python python/inference/batch_scoring.py sessions/week_12 --workers 8
+    python python/inference/batch_scoring.py a.kms b.kms --output-dir predictions --json
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Make the python/ modules importable when the script is launched directly
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from inference.processing import SensorResult, load_batch_model, read_sensor, score_sensor_data, write_predictions
+from inference.streaming import MODELS_DIR, SENSOR_IDS
+from utils.session import CSV_PATTERN, SESSION_EXTENSION
+
+
+# ========== SESSIONS ==========
+
+def find_sessions(paths):
+    """Expands the command line paths into a sorted list of sessions."""
+    sessions = []
+    for path in paths:
+        if os.path.isdir(path):
+            recordings = sorted(glob.glob(os.path.join(path, "*" + SESSION_EXTENSION)))
+            if recordings:
+                sessions.extend(recordings)
+            elif glob.glob(os.path.join(path, CSV_PATTERN.format("*"))):
+                sessions.append(path)
+            else:
+                # Folder of session folders
+                sessions.extend(find_sessions(sorted(
+                    os.path.join(path, entry) for entry in os.listdir(path)
+                    if os.path.isdir(os.path.join(path, entry))
+                )))
+        elif os.path.exists(path):
+            sessions.append(path)
+        else:
+            raise FileNotFoundError(path)
+    return sessions
+
+
+# ========== WORKERS ==========
+
+_models = {}
+
+
+def _init_worker(models_dir, sensor_ids):
+    """Runs once per worker process: loads the models it will reuse for every job."""
+    for sensor_id in sensor_ids:
+        try:
+            _models[sensor_id] = load_batch_model(sensor_id, models_dir)
+        except Exception as e:
+            # An exception here would break the whole pool: report it on the jobs of this sensor instead
+            _models[sensor_id] = e
+
+
+def score_sensor(session, sensor_id, output_dir=None):
+    """Scores one sensor of one session and returns its summary."""
+    started = time.perf_counter()
+    model = _models[sensor_id]
+    if isinstance(model, Exception):
+        raise model
+
+    data = read_sensor(session, sensor_id)
+    if data is not None and len(data[0]):
+        timestamps, resistances = data
+        sensor_result, predictions = score_sensor_data(model, sensor_id, timestamps, resistances)
+        result = sensor_result.to_dict()
+        result["duration_s"] = float(timestamps[-1] - timestamps[0]) / 1000.0
+        if output_dir is not None:
+            name = os.path.splitext(os.path.basename(os.path.normpath(session)))[0]
+            result["output"] = os.path.join(output_dir, f"{name}_capteur{sensor_id}_predictions.csv")
+            write_predictions(result["output"], timestamps, resistances, predictions)
+    else:
+        result = SensorResult(sensor_id).to_dict()
+
+    result["session"] = session
+    result["elapsed_s"] = time.perf_counter() - started
+    return result
+
+
+# ========== BATCH ==========
+
+def score_sessions(sessions, models_dir=MODELS_DIR, sensor_ids=SENSOR_IDS, workers=None, output_dir=None):
+    """
+    Scores every sensor of every session on `workers` processes (all cores by
+    default) and returns the aggregated summary.
+    """
+    if output_dir is not None:
+        os.makedirs(output_dir, exist_ok=True)
+
+    jobs = [(session, sensor_id) for session in sessions for sensor_id in sensor_ids]
+    results, errors = [], []
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(models_dir, tuple(sensor_ids))) as executor:
+        futures = {executor.submit(score_sensor, session, sensor_id, output_dir): (session, sensor_id)
+                   for session, sensor_id in jobs}
+        for future in as_completed(futures):
+            session, sensor_id = futures[future]
+            try:
+                results.append(future.result())
+            except Exception as e:
+                message = str(e).splitlines()[0] if str(e) else ""
+                errors.append({"session": session, "sensor": sensor_id, "error": f"{type(e).__name__}: {message}"})
+    elapsed = time.perf_counter() - started
+
+    return summarize(results, errors, elapsed, workers or os.cpu_count())
+
+
+def summarize(results, errors, elapsed, workers):
+    results = sorted(results, key=lambda result: (result["session"], result["sensor"]))
+    sessions = {}
+    for result in results:
+        summary = sessions.setdefault(result["session"], {"samples": 0, "grips": 0, "grip_time_s": 0.0,
+                                                          "sensors": {}})
+        summary["samples"] += result["samples"]
+        summary["grips"] += result["grips"]["count"]
+        summary["grip_time_s"] += result["grips"]["total_duration_s"]
+        summary["sensors"][result["sensor"]] = result["grips"]["count"]
+
+    samples = sum(result["samples"] for result in results)
+    return {
+        "workers": workers,
+        "jobs": len(results) + len(errors),
+        "samples": samples,
+        "grips": sum(result["grips"]["count"] for result in results),
+        "elapsed_s": elapsed,
+        "samples_per_s": samples / elapsed if elapsed else 0.0,
+        "sessions": sessions,
+        "results": results,
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score many recorded sessions on all cores.")
+    parser.add_argument("sessions", nargs="+", help=".kms files, CSV session folders, or folders of them")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--models", default=MODELS_DIR, help="Folder of the sensor models")
+    parser.add_argument("--output-dir", default=None, help="Also write one predictions CSV per session and sensor")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    args = parser.parse_args()
+
+    summary = score_sessions(find_sessions(args.sessions), args.models, workers=args.workers,
+                             output_dir=args.output_dir)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+
+    for session, totals in summary["sessions"].items():
+        per_sensor = ", ".join(f"s{sensor_id}: {count}" for sensor_id, count in totals["sensors"].items())
+        print(f"{session}: {totals['grips']} grips, {totals['grip_time_s']:.1f} s gripping ({per_sensor})")
+    for error in summary["errors"]:
+        print(f"Failed: {error['session']} sensor {error['sensor']}: {error['error']}")
+    print(f"{summary['jobs']} jobs, {summary['samples']} samples in {summary['elapsed_s']:.2f} s "
+          f"({summary['samples_per_s']:.0f} samples/s, {summary['workers']} workers)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Persistent cache of the results derived from a session.
+
+"View results" scores every sensor of a session: features, predictions,
+grip events and the decimated plot of each trace. `ResultCache` keeps those
+arrays on disk, one `.npz` entry per key, so re-opening a session that has
+not changed loads them instead of scoring it again.
+
+Keys are hashes of what the result depends on: the sensor's samples (SHA-256
+of the timestamp and resistance arrays) for the features, plus the model
+version and file signature (see registry.py) for the predictions, events and
+plot. A retrained model therefore gets new keys, reuses the cached features
+and never serves stale predictions. Entries are evicted least recently used
+first once the cache exceeds `max_bytes`; a read refreshes the entry's mtime.
+"""
+import hashlib
+import json
+import os
+import threading
+import zipfile
+
+import numpy as np
+
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "data", "cache")
+MAX_BYTES = 256 * 1024 * 1024
+
+
+def data_key(*arrays):
+    """SHA-256 of the contents (and dtypes, shapes) of `arrays`."""
+    digest = hashlib.sha256()
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(f"{array.dtype.str}{array.shape}".encode())
+        digest.update(memoryview(array).cast("B"))
+    return digest.hexdigest()
+
+
+def model_key(entry):
+    """Identifies a loaded model version (registry.ModelEntry): changes whenever it is republished."""
+    description = json.dumps([entry.name, entry.metadata.get("version", 0), entry.format, entry.signature])
+    return hashlib.sha256(description.encode()).hexdigest()[:16]
+
+
+class ResultCache:
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.npz")
+
+    def get(self, key):
+        """The arrays stored under `key` (dict), or None."""
+        path = self.path(key)
+        try:
+            with np.load(path, allow_pickle=False) as entry:
+                arrays = {name: entry[name] for name in entry.files}
+            os.utime(path)  # most recently used
+        except (OSError, ValueError, zipfile.BadZipFile):
+            # Missing or unreadable: the result is computed again
+            self.misses += 1
+            return None
+        self.hits += 1
+        return arrays
+
+    def put(self, key, **arrays):
+        """Stores `arrays` under `key` atomically, then evicts old entries above the size cap."""
+        temporary = os.path.join(self.cache_dir, f"{key}.tmp{os.getpid()}-{threading.get_ident()}.npz")
+        np.savez(temporary, **arrays)
+        os.replace(temporary, self.path(key))
+        self.evict()
+
+    def entries(self):
+        """(mtime, size, path) of every entry, least recently used first."""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".npz") or ".tmp" in name:
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+        return sorted(entries)
+
+    def size(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def evict(self):
+        """Removes least recently used entries until the cache fits in `max_bytes`."""
+        with self._lock:
+            entries = self.entries()
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+    def clear(self):
+        for _, _, path in self.entries():
+            os.remove(path)
@@ -0,0 +1,332 @@
+"""
+Live sensor dashboard.
+
+Five scrolling traces (one per sensor) and the current grip state of each
+sensor, drawn while the recording runs. Samples come from the shared-memory
+ring the acquisition process writes to (utils/ringbuffer.py): each frame only
+copies the samples added since the previous frame.
+
+Drawing is done with blitting: the axes, ticks and grid are rendered once
+into a cached background, and each frame restores it and redraws only the
+five lines and state labels. Time is plotted relative to the newest sample
+(x from -span to 0), so the axes stay fixed while the traces scroll; a full
+redraw only happens when a trace leaves its y range or the span changes.
+Long spans are decimated to a min/max pair per pixel column, so an hour of
+data costs about the same to draw as a few seconds.
+
+    python python/inference/dashboard.py --synthetic 600 --speed 10
+
+`--smoke-test` draws frames of synthetic samples with every span on an Agg
+canvas, without a window or a display, and exits non-zero on failure.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import tkinter as tk
+
+import numpy as np
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+from matplotlib.figure import Figure
+
+# Make the python/ modules importable when the script is launched directly
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from utils.decimation import minmax_decimate
+from utils.ringbuffer import SampleRing
+
+
+TITLES = ["Right arm", "Right lapel", "Neck", "Left lapel", "Left arm"]
+COLORS = ["blue", "red", "green", "purple", "orange"]
+# Selectable time spans in seconds (None = whole session)
+SPANS = {"30 s": 30.0, "5 min": 300.0, "Session": None}
+FPS = 30
+
+
+# ========== TRACES ==========
+
+class _Trace:
+    """Samples of one sensor read so far, in arrays grown by doubling."""
+
+    def __init__(self, capacity=4096):
+        self.times = np.empty(capacity, dtype=np.int64)
+        self.values = np.empty(capacity, dtype=np.float32)
+        self.length = 0
+        self.state = 0
+        self.next_start = 0
+
+    def extend(self, times, values, states):
+        if len(times) == 0:
+            return
+        needed = self.length + len(times)
+        if needed > len(self.times):
+            size = max(needed, 2 * len(self.times))
+            self.times = np.resize(self.times, size)
+            self.values = np.resize(self.values, size)
+        self.times[self.length:needed] = times
+        self.values[self.length:needed] = values
+        self.length = needed
+        self.state = int(states[-1])
+
+    def window(self, since):
+        """Samples at or after timestamp `since`."""
+        times, values = self.times[:self.length], self.values[:self.length]
+        first = np.searchsorted(times, since, side="left")
+        return times[first:], values[first:]
+
+
+# ========== DASHBOARD ==========
+
+class DashboardFigure:
+    """
+    Figure of the dashboard and its frame drawing, without a window: call
+    `attach` with a canvas on `figure` (FigureCanvasTkAgg in the window,
+    FigureCanvasAgg in the smoke test), then `update` once per frame.
+    """
+
+    def __init__(self, ring, span="30 s"):
+        self.ring = ring
+        self.span = SPANS[span]
+        self.traces = [_Trace() for _ in range(ring.n_sensors)]
+        self.canvas = None
+        self._background = None
+        self._ylims = [None] * ring.n_sensors
+
+        self.figure = Figure(figsize=(8, 10))
+        self.figure.subplots_adjust(hspace=0.5)
+        self.axes = self.figure.subplots(ring.n_sensors, 1, sharex=True)
+        self.lines, self.labels = [], []
+        for i, ax in enumerate(self.axes):
+            ax.set_title(TITLES[i], fontsize=12)
+            ax.grid(True)
+            # Animated artists are left out of the cached background
+            line, = ax.plot([], [], color=COLORS[i], lw=2, animated=True)
+            label = ax.text(0.99, 0.85, "", transform=ax.transAxes, ha="right", va="top",
+                            fontsize=11, fontweight="bold", color="red", animated=True)
+            self.lines.append(line)
+            self.labels.append(label)
+        self.axes[-1].set_xlabel("Time (s)")
+        self._set_xlim(self.span or 30.0)
+
+    def attach(self, canvas):
+        self.canvas = canvas
+        # Every full draw (first display, resize, new limits) refreshes the background
+        canvas.mpl_connect("draw_event", self._on_draw)
+        canvas.draw()
+
+    # ---------- Drawing ----------
+
+    def _on_draw(self, event):
+        self._background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self._draw_artists()
+
+    def _draw_artists(self):
+        for ax, line, label in zip(self.axes, self.lines, self.labels):
+            ax.draw_artist(line)
+            ax.draw_artist(label)
+
+    def _set_xlim(self, span):
+        self._xlim = span
+        self.axes[0].set_xlim(-span, 0)
+
+    def set_span(self, label):
+        self.span = SPANS[label]
+        self._ylims = [None] * len(self.axes)
+        self._set_xlim(self.span or 30.0)
+        self.canvas.draw_idle()
+
+    def update(self):
+        """Reads the new samples and draws one frame."""
+        for sensor_id, trace in enumerate(self.traces, start=1):
+            times, values, states, trace.next_start = self.ring.read(sensor_id, trace.next_start)
+            trace.extend(times, values, states)
+
+        newest = max((trace.times[trace.length - 1] for trace in self.traces if trace.length), default=None)
+        if newest is None or self._background is None:
+            return
+
+        full_redraw = False
+        span = self.span
+        if span is None:
+            # Whole session: the x range grows by doubling, not on every frame
+            oldest = min(trace.times[0] for trace in self.traces if trace.length)
+            span = self._xlim
+            while span * 1000 < newest - oldest:
+                span *= 2
+            if span != self._xlim:
+                self._set_xlim(span)
+                full_redraw = True
+
+        n_bins = max(1, int(self.axes[0].bbox.width))
+        for column, (ax, trace, line, label) in enumerate(zip(self.axes, self.traces, self.lines, self.labels)):
+            times, values = trace.window(newest - span * 1000)
+            x, y = minmax_decimate((times - newest) / 1000.0, values, -span, 0.0, n_bins)
+            line.set_data(x, y)
+            label.set_text("GRIP" if trace.state else "")
+
+            if len(y):
+                # The y range only grows, with a margin, so it rarely changes
+                low, high = float(y.min()), float(y.max())
+                limits = self._ylims[column]
+                if limits is None or low < limits[0] or high > limits[1]:
+                    if limits is not None:
+                        low, high = min(low, limits[0]), max(high, limits[1])
+                    margin = 0.1 * ((high - low) or abs(high) or 1.0)
+                    self._ylims[column] = (low - margin, high + margin)
+                    ax.set_ylim(*self._ylims[column])
+                    full_redraw = True
+
+        if full_redraw:
+            self.canvas.draw()  # the draw event recaptures the background and draws the artists
+            return
+        self.canvas.restore_region(self._background)
+        self._draw_artists()
+        self.canvas.blit(self.figure.bbox)
+
+
+class LiveDashboard(DashboardFigure):
+    """
+    Toplevel window drawing the ring `ring` at up to `fps` frames per
+    second. Reading stops when the window is closed; `on_close` is then
+    called (for instance to release the ring).
+    """
+
+    def __init__(self, master, ring, span="30 s", fps=FPS, on_close=None):
+        self.interval_ms = max(1, int(1000 / fps))
+        self.on_close = on_close
+        self.fps = 0.0
+        self._frames = 0
+        self._fps_since = time.perf_counter()
+        self._job = None
+
+        self.window = tk.Toplevel(master)
+        self.window.title("Live sensors")
+        self.window.geometry("900x700")
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+        buttons = tk.Frame(self.window)
+        buttons.pack(side="top", fill="x")
+        for label in SPANS:
+            tk.Button(buttons, text=label, command=lambda label=label: self.set_span(label)).pack(side="left")
+
+        super().__init__(ring, span)
+        canvas = FigureCanvasTkAgg(self.figure, master=self.window)
+        canvas.get_tk_widget().pack(fill="both", expand=True)
+        self.attach(canvas)
+        self._job = self.window.after(self.interval_ms, self._tick)
+
+    def _tick(self):
+        started = time.perf_counter()
+        self.update()
+        self._frames += 1
+        if started - self._fps_since >= 1.0:
+            self.fps = self._frames / (started - self._fps_since)
+            self._frames, self._fps_since = 0, started
+            self.window.title(f"Live sensors - {self.fps:.0f} fps")
+        # Keep the frame rate whatever the time spent drawing
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self._job = self.window.after(max(1, int(self.interval_ms - elapsed_ms)), self._tick)
+
+    # ---------- Lifetime ----------
+
+    def close(self):
+        if self._job is not None:
+            self.window.after_cancel(self._job)
+            self._job = None
+        self.window.destroy()
+        if self.on_close is not None:
+            self.on_close()
+
+
+# ========== STANDALONE MODE ==========
+
+def _acquire(live_buffer, replay, synthetic, speed, output_dir):
+    from acquisition import data_reception
+    from acquisition.sources import open_source
+
+    source = open_source(None, replay=replay, synthetic=synthetic, speed=speed or None)
+    data_reception.run(source=source, live_buffer=live_buffer, output_dir=output_dir,
+                       session_path=os.path.join(output_dir, data_reception.session_file))
+
+
+def smoke_test(minutes=20, frames=5):
+    """
+    Draws `frames` frames with each span on an Agg canvas (no window) while
+    a ring fills with `minutes` of synthetic 10 Hz samples, and checks what
+    every trace shows. Raises AssertionError on failure.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    rng = np.random.default_rng(0)
+    n = int(minutes * 60 * 10)
+    timestamps = np.arange(n) * 100
+    states = (np.sin(np.arange(n) / 40.0) > 0.3).astype(np.uint8)
+    with SampleRing.create(capacity=2 * n) as ring:
+        view = DashboardFigure(ring)
+        view.attach(FigureCanvasAgg(view.figure))
+        view.update()  # empty ring: nothing to draw yet
+        chunks = np.array_split(np.arange(n), frames * len(SPANS))
+        for span_index, label in enumerate(SPANS):
+            view.set_span(label)
+            view.canvas.draw()  # what draw_idle schedules in the window
+            for chunk in chunks[span_index * frames:(span_index + 1) * frames]:
+                for sensor_id in range(1, ring.n_sensors + 1):
+                    values = rng.normal(200.0, 10.0, len(chunk)) - 80.0 * states[chunk]
+                    for i, value in zip(chunk.tolist(), values.tolist()):
+                        ring.append(sensor_id, timestamps[i], value, states[i])
+                view.update()
+
+            newest = timestamps[chunk[-1]]
+            span = view.span or (newest - timestamps[0]) / 1000.0
+            low, high = view.axes[0].get_xlim()
+            assert high == 0 and -low >= span, (label, low, high)
+            n_bins = int(view.axes[0].bbox.width)
+            for trace, line, text in zip(view.traces, view.lines, view.labels):
+                assert trace.length == chunk[-1] + 1
+                x, y = line.get_data()
+                assert 0 < len(x) <= max(2 * n_bins, span * 10 + 1), (label, len(x))
+                # Decimated points sit at the start of their pixel column
+                assert x.min() >= -span - 0.1 and x.max() >= low / n_bins, (label, x.min(), x.max())
+                assert np.isfinite(y).all()
+                assert text.get_text() == ("GRIP" if states[chunk[-1]] else "")
+            print(f"{label}: {len(view.lines[0].get_data()[0])} points per trace, x from {low:g} s")
+    print("Dashboard smoke test passed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Live dashboard over a replayed recording.")
+    parser.add_argument("--replay", help="Folder of CSV files or .kms session to replay")
+    parser.add_argument("--synthetic", type=float, metavar="SECONDS", help="Synthetic signals of this duration")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed (1 = real time)")
+    parser.add_argument("--span", choices=list(SPANS), default="30 s")
+    parser.add_argument("--output-dir", help="Where the replayed recording is written (default: a temporary folder)")
+    parser.add_argument("--smoke-test", action="store_true",
+                        help="Draw synthetic frames with every span on an Agg canvas (no window) and exit")
+    args = parser.parse_args()
+    if args.smoke_test:
+        smoke_test()
+        return
+    if args.replay is None and args.synthetic is None:
+        parser.error("--replay or --synthetic is required")
+
+    output_dir = args.output_dir or tempfile.mkdtemp(prefix="kemono_live_")
+    ring = SampleRing.create()
+    acquisition = multiprocessing.Process(target=_acquire, daemon=True,
+                                          args=(ring.name, args.replay, args.synthetic, args.speed, output_dir))
+    acquisition.start()
+
+    root = tk.Tk()
+    root.withdraw()
+    LiveDashboard(root, ring, span=args.span, on_close=root.quit)
+    try:
+        root.mainloop()
+    finally:
+        acquisition.terminate()
+        ring.close()
+        ring.unlink()
+
+
+if __name__ == "__main__":
+    main()
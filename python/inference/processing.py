@@ -0,0 +1,243 @@
+"""
+Offline processing of a recorded session.
+
+`Processor` keeps the sensor models loaded and turns a session (a .kms file
+or a folder of data_capteurN_filtered.csv files) into a `SessionResults`
+object: samples, grip events, grip counts and a decimated plot per sensor.
+The app calls it in-process, with a `ResultCache` (see cache.py) so that
+re-opening an unchanged session skips the scoring; traitement_all_sensors.py
+and batch_scoring.py are command line front-ends to the same functions.
+"""
+import hashlib
+import json
+import os
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from inference.cache import data_key, model_key
+from inference.registry import BATCH_FORMATS, ModelRegistry, get_registry
+from inference.streaming import MODELS_DIR, SENSOR_IDS, model_name
+from utils.decimation import minmax_decimate
+from utils.events import EVENT_DTYPE, segment_events, summarize_events
+from utils.features import FEATURES, FeatureExtractor
+from utils.session import CSV_PATTERN, SESSION_EXTENSION, open_session
+
+
+# Session written by data_reception.py, preferred over the CSV files when present
+SESSION_FILE = "data_session.kms"
+# Points per plotted trace (min/max pairs, see utils/decimation.py)
+PLOT_BINS = 2000
+# Cached features are only reused with the same feature list
+FEATURES_KEY = hashlib.sha256(json.dumps(FEATURES).encode()).hexdigest()[:16]
+
+
+# ========== RESULTS ==========
+
+@dataclass
+class SensorResult:
+    sensor_id: int
+    samples: int = 0
+    grip_samples: int = 0
+    events: np.ndarray = field(default_factory=lambda: np.empty(0, dtype=EVENT_DTYPE))
+    plot: tuple = None  # decimated (timestamps, resistances) for the results graphs
+
+    @property
+    def grips(self):
+        return len(self.events)
+
+    @property
+    def summary(self):
+        return summarize_events(self.events)
+
+    def to_dict(self):
+        return {"sensor": self.sensor_id, "samples": self.samples, "grip_samples": self.grip_samples,
+                "grips": self.summary}
+
+
+@dataclass
+class SessionResults:
+    source: str
+    sensors: dict = field(default_factory=dict)   # sensor id -> SensorResult
+    errors: dict = field(default_factory=dict)    # sensor id -> error message
+    elapsed_s: float = 0.0
+
+    @property
+    def total_grips(self):
+        return sum(result.grips for result in self.sensors.values())
+
+    def percentages(self):
+        """Share of the grips of each sensor, in %."""
+        total = self.total_grips
+        return {sensor_id: (result.grips / total * 100 if total else 0.0)
+                for sensor_id, result in self.sensors.items()}
+
+    def to_dict(self):
+        return {"source": self.source, "elapsed_s": self.elapsed_s, "total_grips": self.total_grips,
+                "sensors": {sensor_id: result.to_dict() for sensor_id, result in self.sensors.items()},
+                "errors": dict(self.errors)}
+
+
+# ========== DATA AND MODELS ==========
+
+def default_source():
+    return SESSION_FILE if os.path.exists(SESSION_FILE) else "."
+
+
+def read_sensor(source, sensor_id):
+    """
+    Timestamps and resistances of one sensor, None if the session has no data
+    for it. Saturated samples (clipped ADC values) are not model input.
+    """
+    if source.endswith(SESSION_EXTENSION):
+        records = open_session(source).measured(sensor_id)
+        return records["timestamp"].astype(np.int64), records["resistance"].astype(np.float64)
+
+    path = os.path.join(source, CSV_PATTERN.format(sensor_id))
+    if not os.path.exists(path):
+        return None
+    import pandas as pd
+
+    df = pd.read_csv(path, usecols=["Timestamp", "Resistance"])
+    df = df.apply(pd.to_numeric, errors="coerce").dropna()
+    return df["Timestamp"].to_numpy(np.int64), df["Resistance"].to_numpy(np.float64)
+
+
+def load_batch_model(sensor_id, models_dir=MODELS_DIR):
+    """
+    Whole sessions are scored in one call, where sklearn's compiled trees beat
+    the array walk of CompiledForest, so the pickle comes first here (the
+    reverse of the live detector); the .npy export is the fallback.
+    """
+    model = ModelRegistry(models_dir, BATCH_FORMATS).get(model_name(sensor_id))
+    if hasattr(model, "n_jobs"):
+        # Batch scoring runs one process per core; a threaded sklearn model would oversubscribe
+        model.n_jobs = 1
+    return model
+
+
+# ========== SCORING ==========
+
+def plot_data(timestamps, resistances, n_bins=PLOT_BINS):
+    if len(timestamps) == 0:
+        return timestamps, resistances
+    return minmax_decimate(timestamps, resistances, timestamps[0], timestamps[-1], n_bins)
+
+
+def score_sensor_data(model, sensor_id, timestamps, resistances, features=None):
+    """Returns the SensorResult and the per-sample 0/1 predictions of one recording."""
+    if features is None:
+        features = FeatureExtractor.transform(timestamps, resistances)
+    proba = model.predict_proba(features)
+    predictions = (proba[:, 1] > proba[:, 0]).astype(np.int64)  # same decision as predict
+    result = SensorResult(
+        sensor_id=sensor_id,
+        samples=len(predictions),
+        grip_samples=int(predictions.sum()),
+        events=segment_events(timestamps, proba[:, 1], resistances),
+    )
+    return result, predictions
+
+
+def write_predictions(path, timestamps, resistances, predictions):
+    """Per-sample CSV, in the format of data_reception.py's prediction files."""
+    labels = np.where(np.asarray(predictions) == 1, "Saisie", "null")
+    with open(path, "w") as file:
+        file.write("Timestamp,Resistance,PredictionLabel\n")
+        file.writelines(f"{t},{r:g},{label}\n" for t, r, label
+                        in zip(np.asarray(timestamps).tolist(), np.asarray(resistances).tolist(), labels.tolist()))
+
+
+def write_events(path, events):
+    np.savetxt(path, np.column_stack([events["start"], events["end"], events["duration"],
+                                      events["peak_resistance"]]),
+               fmt=["%d", "%d", "%d", "%g"], delimiter=",", header=",".join(EVENT_DTYPE.names), comments="")
+
+
+class Processor:
+    """
+    Scores sessions with the models of the shared registry: loaded once, on
+    first use or ahead of time with `warm_up` (for instance on a background
+    thread when the app starts), and reloaded when a model is republished.
+    With `cache` (a cache.ResultCache), the results of a sensor whose samples
+    and model are unchanged are loaded instead of computed. Safe to call from
+    several threads.
+    """
+
+    def __init__(self, models_dir=MODELS_DIR, sensor_ids=SENSOR_IDS, cache=None):
+        self.models_dir = models_dir
+        self.sensor_ids = tuple(sensor_ids)
+        self.registry = get_registry(models_dir, BATCH_FORMATS)
+        self.cache = cache
+
+    def model(self, sensor_id):
+        return self.registry.get(model_name(sensor_id))
+
+    def warm_up(self):
+        for sensor_id in self.sensor_ids:
+            try:
+                self.model(sensor_id)
+            except Exception:
+                pass  # reported by process() for this sensor
+
+    def score(self, sensor_id, timestamps, resistances):
+        """SensorResult (with its plot) and predictions of one sensor, from the cache when possible."""
+        model = self.model(sensor_id)
+        if self.cache is None:
+            result, predictions = score_sensor_data(model, sensor_id, timestamps, resistances)
+            result.plot = plot_data(timestamps, resistances)
+            return result, predictions
+
+        samples_key = data_key(timestamps, resistances)
+        key = f"{samples_key}-{model_key(self.registry.entry(model_name(sensor_id)))}"
+        cached = self.cache.get(key)
+        if cached is not None:
+            predictions = cached["predictions"]
+            result = SensorResult(sensor_id=sensor_id, samples=len(predictions),
+                                  grip_samples=int(predictions.sum()), events=cached["events"],
+                                  plot=(cached["plot_timestamps"], cached["plot_resistances"]))
+            return result, predictions
+
+        # A retrained model only needs the predictions: the features depend on the samples alone
+        features_key = f"{samples_key}-features-{FEATURES_KEY}"
+        cached = self.cache.get(features_key)
+        if cached is not None:
+            features = cached["features"]
+        else:
+            features = FeatureExtractor.transform(timestamps, resistances)
+            self.cache.put(features_key, features=features)
+        result, predictions = score_sensor_data(model, sensor_id, timestamps, resistances, features)
+        result.plot = plot_data(timestamps, resistances)
+        self.cache.put(key, predictions=predictions.astype(np.int8), events=result.events,
+                       plot_timestamps=result.plot[0], plot_resistances=result.plot[1])
+        return result, predictions
+
+    def process(self, source=None, output_dir=None):
+        """
+        Scores every sensor of `source` (default: data_session.kms if it
+        exists, else the CSV files of the current folder). With `output_dir`,
+        also writes the per-sample predictions and the events of each sensor.
+        """
+        source = default_source() if source is None else source
+        results = SessionResults(source)
+        started = time.perf_counter()
+        self.registry.check()  # pick up models retrained since the last call
+        for sensor_id in self.sensor_ids:
+            try:
+                data = read_sensor(source, sensor_id)
+                if data is None or len(data[0]) == 0:
+                    continue
+                timestamps, resistances = data
+                result, predictions = self.score(sensor_id, timestamps, resistances)
+                results.sensors[sensor_id] = result
+
+                if output_dir is not None:
+                    write_predictions(os.path.join(output_dir, f"data_capteur{sensor_id}_predictions.csv"),
+                                      timestamps, resistances, predictions)
+                    write_events(os.path.join(output_dir, f"data_capteur{sensor_id}_events.csv"), result.events)
+            except Exception as e:
+                message = str(e).splitlines()[0] if str(e) else ""
+                results.errors[sensor_id] = f"{type(e).__name__}: {message}"
+        results.elapsed_s = time.perf_counter() - started
+        return results
@@ -0,0 +1,227 @@
+"""
+Model registry over data/models/.
+
+Each model `<name>` is stored as `<name>.pkl` (sklearn) and/or `<name>.npy`
+(compiled forest, see utils/forest.py), with a `<name>.json` metadata file:
+version, feature list, hash of the training data, accuracy, training
+parameters and available formats.
+
+`get_registry(models_dir)` returns the registry shared by the whole process.
+`registry.get(name)` loads a model on first use and then returns it from the
+cache. `registry.watch()` starts a thread that polls the model files and,
+when a model is republished, loads the new version in the background and
+swaps it in with a single dict assignment: a live detector calling `get` for
+every sample switches to the new model between two samples, without a
+restart and without waiting for the load.
+
+`publish` writes a model and its metadata atomically (temporary files then
+os.replace, metadata last), so the watcher never sees a half-written model.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+import joblib
+
+from utils.forest import export_forest, load_forest
+from utils.paths import MODELS_DIR
+
+
+# Live inference evaluates one sample at a time: compiled forest first
+LIVE_FORMATS = ("npy", "pkl")
+# Batch scoring evaluates whole sessions: sklearn first
+BATCH_FORMATS = ("pkl", "npy")
+
+
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ModelEntry:
+    __slots__ = ("name", "model", "metadata", "format", "signature", "loaded_at")
+
+    def __init__(self, name, model, metadata, format, signature):
+        self.name = name
+        self.model = model
+        self.metadata = metadata
+        self.format = format
+        self.signature = signature
+        self.loaded_at = time.time()
+
+
+class ModelRegistry:
+    def __init__(self, models_dir=MODELS_DIR, formats=LIVE_FORMATS):
+        self.models_dir = models_dir
+        self.formats = tuple(formats)
+        self._entries = {}
+        self._expected_features = {}
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._stop = threading.Event()
+        self.reloads = 0
+
+    # ---------- Files ----------
+
+    def path(self, name, extension):
+        return os.path.join(self.models_dir, f"{name}.{extension}")
+
+    def names(self):
+        """Models available on disk."""
+        names = set()
+        for file in os.listdir(self.models_dir):
+            name, extension = os.path.splitext(file)
+            if extension[1:] in ("pkl", "npy") and ".tmp" not in name:
+                names.add(name)
+        return sorted(names)
+
+    def read_metadata(self, name):
+        path = self.path(name, "json")
+        if not os.path.exists(path):
+            return {"name": name, "version": 0}
+        with open(path) as file:
+            return json.load(file)
+
+    def _signature(self, name):
+        """(mtime, size) of the model files: changes whenever a model is republished."""
+        signature = []
+        for extension in ("json",) + self.formats:
+            try:
+                stat = os.stat(self.path(name, extension))
+                signature.append((extension, stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                pass
+        return tuple(signature)
+
+    def expect(self, name, features):
+        """Refuse to load (or hot-swap to) a version of `name` trained on other features."""
+        self._expected_features[name] = list(features)
+
+    def _load(self, name):
+        signature = self._signature(name)
+        metadata = self.read_metadata(name)
+        expected = self._expected_features.get(name)
+        if expected is not None and "features" in metadata and metadata["features"] != expected:
+            raise ValueError(f"Model '{name}' v{metadata.get('version')} expects features {metadata['features']}")
+        for format in self.formats:
+            path = self.path(name, format)
+            if not os.path.exists(path):
+                continue
+            try:
+                model = load_forest(path) if format == "npy" else joblib.load(path)
+            except Exception:
+                # An old pickle unreadable by this sklearn version: try the next format
+                if format == self.formats[-1]:
+                    raise
+                continue
+            return ModelEntry(name, model, metadata, format, signature)
+        raise FileNotFoundError(f"No model file for '{name}' in {self.models_dir}")
+
+    # ---------- Access ----------
+
+    def get(self, name):
+        """The model `name`, loaded on first use."""
+        entry = self._entries.get(name)
+        if entry is None:
+            with self._lock:
+                entry = self._entries.get(name)
+                if entry is None:
+                    entry = self._load(name)
+                    self._entries[name] = entry
+        return entry.model
+
+    def entry(self, name):
+        self.get(name)
+        return self._entries[name]
+
+    def metadata(self, name):
+        return self.entry(name).metadata
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    # ---------- Hot reload ----------
+
+    def check(self):
+        """Reloads the cached models whose files changed; returns their names."""
+        reloaded = []
+        for name, entry in list(self._entries.items()):
+            if self._signature(name) == entry.signature:
+                continue
+            try:
+                new_entry = self._load(name)
+            except Exception:
+                continue  # still being written, or broken: keep serving the current model
+            self._entries[name] = new_entry  # atomic swap, readers never wait
+            self.reloads += 1
+            reloaded.append(name)
+        return reloaded
+
+    def watch(self, interval=2.0, on_reload=None):
+        """Polls the model files every `interval` seconds on a daemon thread."""
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+
+        def loop():
+            while not self._stop.wait(interval):
+                for name in self.check():
+                    if on_reload is not None:
+                        on_reload(name, self._entries[name].metadata)
+
+        self._stop.clear()
+        self._watcher = threading.Thread(target=loop, name="model-registry-watch", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    # ---------- Publication ----------
+
+    def publish(self, name, model, features, **metadata):
+        """
+        Saves a fitted sklearn forest as <name>.pkl and <name>.npy with its
+        metadata (version incremented), atomically. Extra keyword arguments
+        (accuracy, data_sha256, params, ...) are stored in the metadata.
+        """
+        os.makedirs(self.models_dir, exist_ok=True)
+        previous = self.read_metadata(name)
+        metadata = {
+            "name": name,
+            "version": previous.get("version", 0) + 1,
+            "features": list(features),
+            "formats": ["pkl", "npy"],
+            "trained_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            **metadata,
+        }
+
+        temporary = {extension: self.path(f"{name}.tmp{os.getpid()}", extension) for extension in ("pkl", "npy", "json")}
+        joblib.dump(model, temporary["pkl"])
+        export_forest(model, temporary["npy"])
+        with open(temporary["json"], "w") as file:
+            json.dump(metadata, file, indent=2)
+
+        for extension in ("pkl", "npy", "json"):
+            os.replace(temporary[extension], self.path(name, extension))
+        return metadata
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def get_registry(models_dir=MODELS_DIR, formats=LIVE_FORMATS):
+    """Process-level registry for this folder and format preference."""
+    key = (os.path.realpath(models_dir), tuple(formats))
+    with _registries_lock:
+        if key not in _registries:
+            _registries[key] = ModelRegistry(models_dir, formats)
+        return _registries[key]
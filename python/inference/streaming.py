@@ -0,0 +1,141 @@
+"""
+Streaming grip detection.
+
+Consumes the `sensor_id,timestamp,resistance` samples produced by
+python/acquisition/data_reception.py one at a time and returns a grip /
+no-grip prediction for every sample, instead of re-reading the session CSVs
+once the recording is over.
+"""
+import os
+import time
+
+import numpy as np
+
+from inference.registry import MODELS_DIR, ModelRegistry, get_registry
+from utils.features import FEATURES, FRAME_FEATURES, FeatureExtractor, FrameFeatureExtractor
+
+
+# ========== CONFIGURATION ==========
+
+SENSOR_IDS = (1, 2, 3, 4, 5)
+# Single model predicting the five sensors from aligned frames (python/training/train_multi_output.py)
+MULTI_MODEL_NAME = "grip_model_multi"
+
+
+def model_name(sensor_id):
+    return f"sensor_model_s{sensor_id}"
+
+
+def model_path(sensor_id, models_dir=MODELS_DIR, extension=".pkl"):
+    return os.path.join(models_dir, model_name(sensor_id) + extension)
+
+
+def has_multi_model(models_dir=MODELS_DIR):
+    """True when the multi-output model has been trained into `models_dir`."""
+    return MULTI_MODEL_NAME in get_registry(models_dir).names()
+
+
+def load_model(sensor_id, models_dir=MODELS_DIR):
+    """
+    Loads a fresh copy of the compiled forest (.npy, see
+    python/training/export_models.py) when it exists, the pickled sklearn model
+    otherwise. Both expose `predict`. Live code goes through the shared
+    registry instead (cached, hot-reloaded).
+    """
+    return ModelRegistry(models_dir).get(model_name(sensor_id))
+
+
+# ========== DETECTOR ==========
+
+class StreamingGripDetector:
+    """
+    Holds one model and one feature state per sensor and scores samples as
+    they arrive. `update` returns 1 (grip) or 0 (no grip); the grip
+    probability of the last sample is kept in `probabilities` (for the event
+    hysteresis, see utils/events.py). With `metrics` (utils/metrics.Metrics),
+    the feature and model times of every sample are recorded in its
+    "feature" and "predict" histograms.
+    """
+
+    def __init__(self, models_dir=MODELS_DIR, sensor_ids=SENSOR_IDS, metrics=None):
+        # Models are looked up in the registry for every sample, so a model
+        # republished during the recording is picked up on the next sample
+        self.registry = get_registry(models_dir)
+        self._names = {sensor_id: model_name(sensor_id) for sensor_id in sensor_ids}
+        for name in self._names.values():
+            self.registry.expect(name, FEATURES)
+            self.registry.get(name)  # load now, not on the first sample
+        self.extractors = {sensor_id: FeatureExtractor() for sensor_id in sensor_ids}
+        self.predictions = {sensor_id: 0 for sensor_id in sensor_ids}
+        self.probabilities = {sensor_id: 0.0 for sensor_id in sensor_ids}
+        # Single-row input buffer reused for every call to the model
+        self._row = np.zeros((1, len(FEATURES)))
+        self._feature_time = metrics.histogram("feature") if metrics is not None else None
+        self._predict_time = metrics.histogram("predict") if metrics is not None else None
+
+    def update(self, sensor_id, timestamp, resistance):
+        extractor = self.extractors.get(sensor_id)
+        if extractor is None:
+            raise KeyError(f"Unknown sensor: {sensor_id}")
+
+        started = time.perf_counter()
+        extractor.update(timestamp, resistance, out=self._row[0])
+        extracted = time.perf_counter()
+        # Same decision as predict (argmax), from a single model call
+        proba = self.registry.get(self._names[sensor_id]).predict_proba(self._row)[0]
+        prediction = int(proba[1] > proba[0])
+        if self._predict_time is not None:
+            self._feature_time.record(extracted - started)
+            self._predict_time.record(time.perf_counter() - extracted)
+        self.predictions[sensor_id] = prediction
+        self.probabilities[sensor_id] = float(proba[1])
+        return prediction
+
+    def reset(self):
+        for sensor_id, extractor in self.extractors.items():
+            extractor.reset()
+            self.predictions[sensor_id] = 0
+            self.probabilities[sensor_id] = 0.0
+
+
+class FrameGripDetector:
+    """
+    Scores aligned 5-sensor frames (see utils/alignment.FrameAligner) with
+    the multi-output model: one model call per tick for the five sensors.
+    `update` returns the 0/1 predictions ({sensor: prediction}); as in
+    `StreamingGripDetector`, the grip probabilities are kept in
+    `probabilities` and `metrics` gets the "feature" and "predict" times.
+    """
+
+    def __init__(self, models_dir=MODELS_DIR, metrics=None):
+        self.registry = get_registry(models_dir)
+        self.registry.expect(MULTI_MODEL_NAME, FRAME_FEATURES)
+        self.registry.get(MULTI_MODEL_NAME)
+        self.extractor = FrameFeatureExtractor()
+        self.predictions = {sensor_id: 0 for sensor_id in SENSOR_IDS}
+        self.probabilities = {sensor_id: 0.0 for sensor_id in SENSOR_IDS}
+        self._row = np.zeros((1, len(FRAME_FEATURES)))
+        self._feature_time = metrics.histogram("feature") if metrics is not None else None
+        self._predict_time = metrics.histogram("predict") if metrics is not None else None
+
+    def update(self, timestamp, values):
+        started = time.perf_counter()
+        self.extractor.update(timestamp, values, out=self._row[0])
+        extracted = time.perf_counter()
+        proba = self.registry.get(MULTI_MODEL_NAME).predict_proba(self._row)
+        if isinstance(proba, list):
+            # sklearn: one (1, 2) array per sensor; compiled forest: (1, sensors, 2)
+            proba = np.stack(proba, axis=1)
+        if self._predict_time is not None:
+            self._feature_time.record(extracted - started)
+            self._predict_time.record(time.perf_counter() - extracted)
+        for sensor_id, (no_grip, grip) in zip(SENSOR_IDS, proba[0].tolist()):
+            self.predictions[sensor_id] = int(grip > no_grip)
+            self.probabilities[sensor_id] = grip
+        return self.predictions
+
+    def reset(self):
+        self.extractor.reset()
+        for sensor_id in SENSOR_IDS:
+            self.predictions[sensor_id] = 0
+            self.probabilities[sensor_id] = 0.0
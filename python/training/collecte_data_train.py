@@ -1,7 +1,7 @@
 import serial
 import csv
-import threading
 import time
+from bisect import bisect_right
 import keyboard  # pip install keyboard
 
 # Paramètres de connexion série
@@ -12,25 +12,73 @@ timeout = 1
 # Fichier CSV de sortie
 output_file = "data_sensor.csv"
 
-# Variable pour l'état du bouton
-button_state = 0
+# Touche qui indique que le bouton est pressé
+label_key = "1"
 
-def listen_for_keyboard():
+# Les lignes sont écrites par blocs, au plus toutes les flush_interval secondes
+flush_interval = 1.0
+
+
+class KeyTimeline:
     """
-    Fonction exécutée dans un thread séparé pour écouter les pressions de touche.
-    La touche '1' est utilisée pour indiquer que le bouton est pressé.
+    Changements d'état de la touche, horodatés par le hook clavier : les
+    callbacks d'appui et de relâchement remplacent la boucle qui interrogeait
+    keyboard.is_pressed en permanence (un cœur occupé à 100 %).
     """
-    global button_state
-    while True:
-        if keyboard.is_pressed("1"):
-            button_state = 1
-        else:
-            button_state = 0
+
+    def __init__(self, key):
+        # (heure, état) : une seule liste pour que le thread du hook l'étende sans verrou
+        self.transitions = []
+        self._hook = keyboard.hook_key(key, self._on_event)
+
+    def _on_event(self, event):
+        state = 1 if event.event_type == keyboard.KEY_DOWN else 0
+        # La répétition automatique renvoie des "down" : ne garder que les changements
+        if not self.transitions or self.transitions[-1][1] != state:
+            self.transitions.append((event.time, state))
+
+    def state_at(self, t):
+        """État de la touche à l'heure t (time.time())."""
+        index = bisect_right(self.transitions, (t, 2)) - 1
+        return self.transitions[index][1] if index >= 0 else 0
+
+    def close(self):
+        keyboard.unhook(self._hook)
+
+
+class ClockOffset:
+    """
+    Décalage entre le temps de l'Arduino (secondes écoulées depuis son
+    démarrage, voir kemono_training.ino) et l'heure du PC. L'échantillon
+    reçu le plus vite donne le plus petit décalage : les autres sont placés
+    à l'heure où ils ont été mesurés, même si la lecture du port a pris du
+    retard, et non à l'heure où ils ont été lus.
+    """
+
+    def __init__(self):
+        self.offset = None
+
+    def update(self, timestamp, received):
+        offset = received - timestamp
+        if self.offset is None or offset < self.offset:
+            self.offset = offset
+
+    def host_time(self, timestamp):
+        return self.offset + timestamp
+
+
+def write_batch(writer, pending, keys, clock):
+    """Écrit les échantillons en attente avec l'état de la touche au moment de leur mesure."""
+    writer.writerows([timestamp, resistance, keys.state_at(clock.host_time(timestamp))]
+                     for timestamp, resistance in pending)
+    pending.clear()
 
 
-# Démarrer un thread pour écouter les pressions de touches
-keyboard_thread = threading.Thread(target=listen_for_keyboard, daemon=True)
-keyboard_thread.start()
+ser = None
+keys = KeyTimeline(label_key)
+clock = ClockOffset()
+pending = []
+received_count = 0
 
 try:
     # Ouvrir la connexion série
@@ -38,34 +86,47 @@ try:
     time.sleep(2)  # Attendre que la connexion série soit établie
 
     print("Début de la réception des données...")
-    print("Appuie sur 'b' pour indiquer que le bouton est pressé.")
+    print(f"Maintiens la touche '{label_key}' pendant que le bouton est pressé.")
 
     # Ouvrir le fichier CSV pour écrire les données
     with open(output_file, mode="w", newline="") as file:
         writer = csv.writer(file)
         # Écrire l'en-tête
         writer.writerow(["Timestamp", "Resistance", "ButtonState"])
+        next_flush = time.monotonic() + flush_interval
 
-        while True:
-            line = ser.readline().decode("utf-8").strip()
-            if line:
-                print(line)  # Afficher les données reçues pour le débogage
-                try:
-                    # Extraire les données du capteur (timestamp et résistance)
-                    timestamp, resistance = line.split(",")
-                    timestamp = float(timestamp)
-                    resistance = float(resistance)
+        try:
+            while True:
+                line = ser.readline().decode("utf-8").strip()
+                received = time.time()
+                if line:
+                    try:
+                        # Extraire les données du capteur (temps en secondes, résistance) ;
+                        # l'état du bouton envoyé par le firmware est remplacé par la touche
+                        timestamp, resistance, _ = line.split(",")
+                        timestamp = float(timestamp)
+                        resistance = float(resistance)
+                        clock.update(timestamp, received)
+                        pending.append((timestamp, resistance))
+                        received_count += 1
 
-                    # Écrire les données dans le fichier CSV avec l'état du bouton
-                    writer.writerow([timestamp, resistance, button_state])
+                    except ValueError:
+                        print("Erreur de format dans les données reçues :", line)
 
-                except ValueError:
-                    print("Erreur de format dans les données reçues :", line)
+                # Étiqueter et écrire le bloc (les appuis jusqu'à maintenant sont connus)
+                if time.monotonic() >= next_flush:
+                    write_batch(writer, pending, keys, clock)
+                    next_flush = time.monotonic() + flush_interval
+                    print(f"\r{received_count} échantillons, bouton : {keys.state_at(time.time())}", end="")
+        finally:
+            write_batch(writer, pending, keys, clock)
+            print()
 
 except KeyboardInterrupt:
     print("Arrêt par l'utilisateur.")
 
 finally:
-    if ser.is_open:
+    keys.close()
+    if ser is not None and ser.is_open:
         ser.close()
     print(f"Les données ont été enregistrées dans : {output_file}")
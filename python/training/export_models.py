@@ -0,0 +1,102 @@
+import argparse
+import glob
+import os
+import sys
+
+import joblib
+import numpy as np
+
+# Rendre les modules de python/ importables quand le script est lancé directement
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from inference.registry import MODELS_DIR
+from utils.forest import export_forest, load_forest
+
+# Points comparés par appel (le prédicteur compilé garde des tableaux points x arbres)
+PROBE_BATCH = 4096
+
+
+def _float32_at_most(value):
+    """Plus grand float32 <= value : sklearn compare les entrées en float32."""
+    result = np.float32(value)
+    return np.nextafter(result, np.float32(-np.inf)) if result > value else result
+
+
+def threshold_probes(model):
+    """
+    Deux points par nœud de décision de chaque arbre : sa propre feature juste
+    en dessous et juste au-dessus de son seuil (les float32 voisins, là où une
+    erreur de <= / < ou d'arrondi float32 changerait de branche), les autres
+    features choisies dans les intervalles des nœuds parents pour que le point
+    atteigne bien ce nœud.
+    """
+    n_features = model.n_features_in_
+    rows = []
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        # (nœud, bornes exclues en bas, incluses en haut de chaque feature sur le chemin)
+        stack = [(0, np.full(n_features, -np.inf), np.full(n_features, np.inf))]
+        while stack:
+            node, low, high = stack.pop()
+            left, right = tree.children_left[node], tree.children_right[node]
+            if left == right:  # feuille
+                continue
+            row = np.where(np.isfinite(high), high, np.where(np.isfinite(low), low + 1.0, 0.0))
+            row = np.array([_float32_at_most(value) for value in row], dtype=np.float32)
+            feature, threshold = tree.feature[node], tree.threshold[node]
+            below = _float32_at_most(threshold)
+            for value in (below, np.nextafter(below, np.float32(np.inf))):
+                probe = row.copy()
+                probe[feature] = value
+                rows.append(probe)
+            left_high = high.copy()
+            left_high[feature] = min(high[feature], threshold)
+            right_low = low.copy()
+            right_low[feature] = max(low[feature], threshold)
+            stack.append((left, low, left_high))
+            stack.append((right, right_low, high))
+    return np.array(rows, dtype=np.float32).reshape(-1, n_features)
+
+
+def export_model(pkl_path):
+    """
+    Convertit un modèle sklearn (.pkl) en tableau de nœuds NumPy (.npy) à côté
+    du fichier d'origine, et vérifie que les prédictions sont identiques.
+    """
+    model = joblib.load(pkl_path)
+    npy_path = os.path.splitext(pkl_path)[0] + ".npy"
+    nodes = export_forest(model, npy_path)
+
+    # Vérification aux seuils du modèle lui-même : un point de chaque côté de chaque nœud
+    forest = load_forest(npy_path)
+    probes = threshold_probes(model)
+    for start in range(0, len(probes), PROBE_BATCH):
+        batch = probes[start:start + PROBE_BATCH]
+        expected = model.predict_proba(batch)
+        if isinstance(expected, list):  # multi-sorties : une matrice par sortie dans sklearn
+            expected = np.stack(expected, axis=1)
+        if (forest.predict(batch) != model.predict(batch)).any() or \
+                not np.allclose(forest.predict_proba(batch), expected):
+            raise ValueError(f"Les prédictions exportées diffèrent de sklearn pour {pkl_path}")
+
+    print(f"{os.path.basename(pkl_path)} -> {os.path.basename(npy_path)} "
+          f"({forest.n_estimators} arbres, {len(nodes)} nœuds, profondeur {forest.depth})")
+    return npy_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Exporte les Random Forest en tableaux NumPy.")
+    parser.add_argument("models", nargs="*",
+                        help="Fichiers .pkl à convertir (par défaut : data/models/sensor_model_s*.pkl)")
+    args = parser.parse_args()
+
+    paths = args.models or sorted(glob.glob(os.path.join(MODELS_DIR, "sensor_model_s*.pkl")))
+    if not paths:
+        print("Aucun modèle à exporter.")
+        return
+    for path in paths:
+        export_model(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,90 +1,145 @@
-import csv
+import argparse
+import os
+import sys
+
 import numpy as np
+import pandas as pd
+
+# Rendre les modules de python/ importables quand le script est lancé directement
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from utils.session import SESSION_EXTENSION, open_session
+
+HEADERS = ["Timestamp", "Resistance", "ButtonState"]
 
-input_file_path = 'data_porte.csv'
-output_file_path = 'data_porte_filtered_1dec2.csv'
 
-def remove_duplicates_by_time(rows):
+# ========== ÉTAPES DU NETTOYAGE ==========
+# Chaque étape prend des tableaux NumPy et retourne un masque des lignes à garder,
+# pour que tout le pipeline reste linéaire en nombre de lignes.
+
+def remove_duplicates_by_time(timestamps):
     """
     Supprime les doublons basés uniquement sur le timestamp (Time).
     Si plusieurs lignes ont le même timestamp, la première est conservée.
     """
-    unique_rows = []
-    seen_timestamps = set()  # Pour enregistrer les timestamps déjà rencontrés
-    for row in rows:
-        timestamp = float(row[0])  # Récupérer uniquement le timestamp
-        if timestamp not in seen_timestamps:
-            unique_rows.append(row)
-            seen_timestamps.add(timestamp)  # Marquer ce timestamp comme traité
-    return unique_rows
-
-try:
-    with open(input_file_path, mode='r', encoding='utf-8') as infile:
-        reader = csv.reader(infile)
-        headers = next(reader)  # Lire les en-têtes
-        rows = []
-
-        # Collecter les données pour le traitement
-        for row in reader:
-            if row:
-                # Formater les timestamps et résistances
-                timestamp = float(row[0]) - 1734023691
-                resistance = float(row[1])
-                state = int(float(row[2]))
-
-                # Supprimer les doublons exacts
-                rows = remove_duplicates_by_time(rows)
-
-                # Arrondir à un chiffre après la virgule
-                timestamp = round(timestamp, 1)
-                resistance = round(resistance, 1)
-
-                rows.append([timestamp, resistance, state])
-
-
-        # Supprimer les valeurs incohérentes par écart-type
-        resistances = [row[1] for row in rows]
-        mean_resistance = np.mean(resistances)
-        std_resistance = np.std(resistances)
-        filtered_rows = [
-            row for row in rows
-            if abs(row[1] - mean_resistance) <= 3 * std_resistance
-        ]
-
-        # Gérer les transitions incohérentes entre séries
-        cleaned_rows = []
-        for i in range(len(filtered_rows) - 1):
-            current_row = filtered_rows[i]
-            next_row = filtered_rows[i + 1]
-
-            # Si une transition d'état est détectée
-            if current_row[2] != next_row[2]:
-                # Vérifier si la transition est incohérente
-                if abs(current_row[1] - next_row[1]) <= 3:
-                    # Identifier la ligne incohérente
-                    if abs(next_row[1] - mean_resistance) > abs(current_row[1] - mean_resistance):
-                        continue  # Supprimer la ligne suivante
-                    elif abs(current_row[1] - mean_resistance) > abs(next_row[1] - mean_resistance):
-                        continue  # Supprimer la ligne actuelle
-
-            # Ajouter la ligne si elle est valide
-            cleaned_rows.append(current_row)
-
-        # Ajouter la dernière ligne si elle n'est pas supprimée
-        if len(filtered_rows) > 0:
-            cleaned_rows.append(filtered_rows[-1])
-
-    # Sauvegarder les données nettoyées
-    with open(output_file_path, mode='w', encoding='utf-8', newline='') as outfile:
-        writer = csv.writer(outfile)
-        writer.writerow(headers)  # Réécrire les en-têtes
-        writer.writerows(cleaned_rows)  # Écrire les lignes nettoyées
-
-    print(f"Le fichier filtré et nettoyé a été enregistré sous : {output_file_path}")
-
-except FileNotFoundError:
-    print(f"Le fichier '{input_file_path}' est introuvable.")
-except ValueError:
-    print("Erreur de conversion : vérifiez que les colonnes contiennent des nombres.")
-except Exception as e:
-    print(f"Une erreur est survenue : {e}")
+    keep = np.zeros(len(timestamps), dtype=bool)
+    _, first_index = np.unique(timestamps, return_index=True)
+    keep[first_index] = True
+    return keep
+
+
+def filter_by_std_dev(resistances, n_std=3):
+    """Supprime les valeurs à plus de `n_std` écarts-types de la moyenne."""
+    mean_resistance = np.mean(resistances)
+    std_resistance = np.std(resistances)
+    return np.abs(resistances - mean_resistance) <= n_std * std_resistance
+
+
+def clean_transitions(resistances, states, mean_resistance, max_step=3):
+    """
+    Gère les transitions incohérentes entre séries : quand l'état change entre
+    deux lignes dont la résistance ne varie presque pas (<= max_step), la ligne
+    courante est supprimée si les deux lignes ne sont pas à la même distance de
+    la moyenne. La dernière ligne est toujours conservée.
+    """
+    keep = np.ones(len(resistances), dtype=bool)
+    if len(resistances) < 2:
+        return keep
+    deviation = np.abs(resistances - mean_resistance)
+    transition = states[:-1] != states[1:]
+    close = np.abs(resistances[:-1] - resistances[1:]) <= max_step
+    keep[:-1] = ~(transition & close & (deviation[1:] != deviation[:-1]))
+    return keep
+
+
+def format_data(timestamps, resistances, states, offset=0.0, decimals=1):
+    """
+    Pipeline complet : décalage du temps, arrondi, suppression des doublons de
+    temps, filtre à 3 écarts-types puis nettoyage des transitions.
+    Retourne les trois colonnes nettoyées.
+    """
+    timestamps = np.round(np.asarray(timestamps, dtype=np.float64) - offset, decimals)
+    resistances = np.round(np.asarray(resistances, dtype=np.float64), decimals)
+    states = np.asarray(states).astype(np.float64).astype(np.int64)
+
+    # Supprimer les doublons de temps
+    keep = remove_duplicates_by_time(timestamps)
+    timestamps, resistances, states = timestamps[keep], resistances[keep], states[keep]
+    if len(resistances) == 0:
+        return timestamps, resistances, states
+
+    # La moyenne avant filtrage sert de référence pour les transitions
+    mean_resistance = np.mean(resistances)
+
+    # Supprimer les valeurs incohérentes par écart-type
+    keep = filter_by_std_dev(resistances)
+    timestamps, resistances, states = timestamps[keep], resistances[keep], states[keep]
+
+    # Gérer les transitions incohérentes entre séries
+    keep = clean_transitions(resistances, states, mean_resistance)
+    return timestamps[keep], resistances[keep], states[keep]
+
+
+# ========== LECTURE / ÉCRITURE ==========
+
+def read_input(path):
+    """Lit un CSV (Timestamp, Resistance, ButtonState) ou une session .kms étiquetée."""
+    if path.endswith(SESSION_EXTENSION):
+        session = open_session(path)
+        if not session.has_labels:
+            raise ValueError(f"La session {path} ne contient pas d'étiquettes.")
+        records = session.records
+        # Les sessions sont en millisecondes, les CSV d'entraînement en secondes
+        return records["timestamp"] / 1000.0, records["resistance"], records["label"]
+
+    df = pd.read_csv(path, usecols=[0, 1, 2])
+    return df.iloc[:, 0].to_numpy(), df.iloc[:, 1].to_numpy(), df.iloc[:, 2].to_numpy()
+
+
+def write_output(path, timestamps, resistances, states, decimals=1, chunk_size=100_000):
+    # Formatage par blocs : plus rapide que DataFrame.to_csv avec float_format
+    row_format = f"%.{decimals}f,%.{decimals}f,%d".__mod__
+    with open(path, mode='w', encoding='utf-8', newline='') as outfile:
+        outfile.write(",".join(HEADERS) + "\n")
+        for start in range(0, len(timestamps), chunk_size):
+            end = start + chunk_size
+            rows = zip(timestamps[start:end].tolist(), resistances[start:end].tolist(), states[start:end].tolist())
+            outfile.write("\n".join(map(row_format, rows)) + "\n")
+
+
+def format_file(input_path, output_path, offset="0", decimals=1):
+    timestamps, resistances, states = read_input(input_path)
+    if offset == "auto":
+        offset = timestamps[0] if len(timestamps) else 0.0
+    cleaned = format_data(timestamps, resistances, states, float(offset), decimals)
+    write_output(output_path, *cleaned, decimals=decimals)
+    return len(timestamps), len(cleaned[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Nettoie les enregistrements étiquetés avant l'entraînement.")
+    parser.add_argument("inputs", nargs="+", help="Fichiers CSV ou sessions .kms étiquetées")
+    parser.add_argument("-o", "--output",
+                        help="Fichier de sortie (un seul fichier d'entrée) ; par défaut <entrée>_filtered.csv")
+    parser.add_argument("--offset", default="0",
+                        help="Valeur soustraite aux timestamps (ex. 1734023691), ou 'auto' pour partir de 0")
+    parser.add_argument("--decimals", type=int, default=1, help="Nombre de décimales conservées")
+    args = parser.parse_args()
+
+    if args.output and len(args.inputs) > 1:
+        parser.error("--output n'est possible qu'avec un seul fichier d'entrée")
+
+    for input_file_path in args.inputs:
+        output_file_path = args.output or os.path.splitext(input_file_path)[0] + "_filtered.csv"
+        try:
+            total, kept = format_file(input_file_path, output_file_path, args.offset, args.decimals)
+            print(f"Le fichier filtré et nettoyé a été enregistré sous : {output_file_path} "
+                  f"({kept}/{total} lignes conservées)")
+        except FileNotFoundError:
+            print(f"Le fichier '{input_file_path}' est introuvable.")
+        except ValueError as e:
+            print(f"Erreur de conversion : vérifiez que les colonnes contiennent des nombres. ({e})")
+
+
+if __name__ == "__main__":
+    main()
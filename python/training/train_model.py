@@ -1,69 +1,187 @@
-import pandas as pd
+"""
+Entraînement des modèles de tous les capteurs.
+
+Pour chaque capteur, une recherche bornée sur la profondeur et le nombre
+d'arbres de la Random Forest est évaluée en validation croisée temporelle
+(TimeSeriesSplit : on entraîne sur le passé et on teste sur la suite, sans
+mélanger des échantillons voisins à 10 Hz entre entraînement et test). Chaque
+candidat est rapporté avec sa précision, sa latence d'inférence sur un
+échantillon et sa taille ; le modèle retenu est le plus rapide dont la
+précision reste à moins de `--budget` de la meilleure. Tous les (capteur,
+candidat) sont entraînés en parallèle, avec des graines fixes.
+
+    python python/training/train_model.py --pattern "data_sensor{}.csv"
+    python python/training/train_model.py --sensors 3 --depths 6 10 --trees 25 50 --budget 0.005
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
-from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestClassifier
-import joblib
-from sklearn.model_selection import train_test_split
-
-
-# Charger les données
-df = pd.read_csv("data_sensor3.csv")
-print(df.head())
-print(df.info())
-print(df.describe())
-
-# Vérifier que les colonnes nécessaires sont présentes
-if 'Resistance' not in df.columns or 'Timestamp' not in df.columns:
-    raise ValueError("Le fichier doit contenir les colonnes 'Resistance' et 'Timestamp'.")
-
-# Calcul des dérivées temporelles (dR/dt)
-dR_dt = []
-timestamps = df['Timestamp'].values
-resistances = df['Resistance'].values
-
-for i in range(1, len(resistances)):
-    delta_t = timestamps[i] - timestamps[i - 1]
-    if delta_t != 0:  # Vérifier que le delta temps n'est pas zéro
-        dR_dt.append((resistances[i] - resistances[i - 1]) / delta_t)
-    else:
-        dR_dt.append(0)  # Ajouter une valeur nulle si delta_t est zéro
-
-# Ajouter la dérivée au DataFrame, avec un décalage pour correspondre aux indices
-df['ResistanceDiff'] = [0] + dR_dt  # Ajouter un zéro au début pour conserver la taille
-
-# Calcul de l'énergie (somme cumulée des carrés des variations)
-df['Energy'] = df['ResistanceDiff'].pow(2).cumsum()
-
-# Calcul de la fonction de Lagrange : L = 1/2 mv^2 - U (ici, mv^2 = ResistanceDiff^2 et U = Resistance)
-df['Lagrange'] = (0.5 * df['ResistanceDiff'].pow(2)) - df['Resistance']
-
-# # Moyenne et écart-type sur une fenêtre de 5 points
-df['ResistanceRollingMean'] = df['Resistance'].rolling(window=5).mean().fillna(0)
-df['ResistanceRollingStd'] = df['Resistance'].rolling(window=5).std().fillna(0)
-
-saisie_data = df[df['ButtonState'] == 1]
-mouvement_data = df[df['ButtonState'] == 0]
-
-df['Label'] = df['ButtonState']
-
-features = [ 'Resistance', 'ResistanceRollingMean', 'ResistanceRollingStd', 'ResistanceDiff', 'Energy']
-            #  'ResistanceDiff', 'ResistanceRollingMean', 'ResistanceRollingStd', 'Lagrange']
-X = df[features]
-y = df['Label']
-
-# Diviser les données en ensembles d'entraînement et de test
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
-
-# Initialiser le modèle
-model = RandomForestClassifier(n_estimators=100, random_state=42)
-
-# Entraîner le modèle
-model.fit(X_train.values, y_train)
-
-# Évaluer le modèle
-accuracy = model.score(X_test, y_test)
-print(f"Précision du modèle : {accuracy*100:.2f}%")
+from sklearn.model_selection import TimeSeriesSplit
 
-# Sauvegarder le modèle entraîné
-joblib.dump(model, 'sensor3_model.pkl')
-print("Modèle sauvegardé dans 'sensor3_model.pkl'")
+# Rendre les modules de python/ importables quand le script est lancé directement
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from inference.registry import MODELS_DIR, ModelRegistry, file_sha256
+from utils.features import FEATURES, ROLLING_WINDOW, FeatureExtractor
+from utils.forest import CompiledForest, flatten_forest
+from utils.session import read_sensor_dataframe
+
+# Grille de recherche par défaut (None = arbres complets)
+DEPTHS = (4, 6, 8, 12, None)
+TREES = (10, 25, 50, 100)
+SEED = 42
+
+
+# ========== DONNÉES ==========
+
+def load_dataset(path):
+    """Features et labels d'un fichier annoté (CSV de format_data.py ou session .kms)."""
+    df = read_sensor_dataframe(path)
+
+    # Vérifier que les colonnes nécessaires sont présentes
+    for column in ("Timestamp", "Resistance", "ButtonState"):
+        if column not in df.columns:
+            raise ValueError(f"{path} doit contenir les colonnes 'Timestamp', 'Resistance' et 'ButtonState'.")
+
+    # Calcul des features (dR/dt, énergie, moyenne et écart-type glissants sur 5 points)
+    X = FeatureExtractor.transform(df["Timestamp"].values, df["Resistance"].values)
+    y = df["ButtonState"].to_numpy().astype(np.int64)
+    return X, y
+
+
+# ========== TÂCHES PARALLÈLES ==========
+
+def make_model(n_estimators, max_depth, n_jobs=1):
+    return RandomForestClassifier(n_estimators=n_estimators, max_depth=max_depth, random_state=SEED, n_jobs=n_jobs)
+
+
+def evaluate_candidate(sensor_id, X, y, n_estimators, max_depth, n_splits):
+    """Précision de chaque pli de la validation croisée temporelle et nœuds du dernier modèle."""
+    accuracies = []
+    model = None
+    # Écart d'une fenêtre glissante : les premières caractéristiques du test ne voient pas l'entraînement
+    for train, test in TimeSeriesSplit(n_splits=n_splits, gap=ROLLING_WINDOW).split(X):
+        model = make_model(n_estimators, max_depth).fit(X[train], y[train])
+        accuracies.append(float(model.score(X[test], y[test])))
+    return sensor_id, n_estimators, max_depth, accuracies, flatten_forest(model)
+
+
+def fit_final(sensor_id, X, y, n_estimators, max_depth):
+    return sensor_id, make_model(n_estimators, max_depth).fit(X, y)
+
+
+def single_sample_latency(nodes, X, repeats=300):
+    """Temps médian (µs) d'une prédiction sur un échantillon avec la forêt compilée (chemin temps réel)."""
+    forest = CompiledForest(nodes)
+    rows = X[np.linspace(0, len(X) - 1, repeats).astype(int)]
+    durations = []
+    for row in rows:
+        started = time.perf_counter()
+        forest.predict(row[None, :])
+        durations.append(time.perf_counter() - started)
+    return float(np.median(durations)) * 1e6
+
+
+def select(candidates, budget):
+    """Le plus rapide (puis le plus petit) des candidats à moins de `budget` de la meilleure précision."""
+    best = max(candidate["accuracy"] for candidate in candidates)
+    eligible = [candidate for candidate in candidates if candidate["accuracy"] >= best - budget]
+    return min(eligible, key=lambda candidate: (candidate["latency_us"], candidate["size_bytes"]))
+
+
+# ========== PROGRAMME PRINCIPAL ==========
+
+def main():
+    parser = argparse.ArgumentParser(description="Entraîne les modèles de grip de tous les capteurs.")
+    parser.add_argument("--sensors", type=int, nargs="+", default=[1, 2, 3, 4, 5])
+    parser.add_argument("--pattern", default="data_sensor{}.csv",
+                        help="Fichier annoté de chaque capteur ({} = numéro du capteur), CSV ou .kms")
+    parser.add_argument("--depths", nargs="+", default=[str(depth) for depth in DEPTHS],
+                        help="Profondeurs maximales à essayer (None = sans limite)")
+    parser.add_argument("--trees", type=int, nargs="+", default=list(TREES), help="Nombres d'arbres à essayer")
+    parser.add_argument("--splits", type=int, default=5, help="Nombre de plis de la validation temporelle")
+    parser.add_argument("--budget", type=float, default=0.01,
+                        help="Perte de précision acceptée pour un modèle plus rapide (0.01 = 1 point)")
+    parser.add_argument("--workers", type=int, default=None, help="Processus (défaut : tous les cœurs)")
+    parser.add_argument("--output-dir", default=MODELS_DIR)
+    args = parser.parse_args()
+
+    depths = [None if depth.lower() == "none" else int(depth) for depth in args.depths]
+    datasets = {sensor_id: load_dataset(args.pattern.format(sensor_id)) for sensor_id in args.sensors}
+    for sensor_id, (X, y) in datasets.items():
+        print(f"Capteur {sensor_id} : {len(X)} échantillons, {y.mean() * 100:.1f}% de saisies")
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = [executor.submit(evaluate_candidate, sensor_id, X, y, n_estimators, max_depth, args.splits)
+                   for sensor_id, (X, y) in datasets.items()
+                   for max_depth in depths for n_estimators in args.trees]
+        evaluations = [future.result() for future in futures]
+
+        # Latences mesurées ici, une par une, pour ne pas être faussées par les autres processus
+        candidates = {sensor_id: [] for sensor_id in datasets}
+        for sensor_id, n_estimators, max_depth, accuracies, nodes in evaluations:
+            candidates[sensor_id].append({
+                "n_estimators": n_estimators,
+                "max_depth": max_depth,
+                "accuracy": float(np.mean(accuracies)),
+                "accuracy_folds": accuracies,
+                "latency_us": single_sample_latency(nodes, datasets[sensor_id][0]),
+                "size_bytes": int(nodes.nbytes),
+            })
+        selected = {sensor_id: select(sensor_candidates, args.budget)
+                    for sensor_id, sensor_candidates in candidates.items()}
+
+        # Modèles retenus réentraînés sur toutes les données
+        futures = [executor.submit(fit_final, sensor_id, *datasets[sensor_id],
+                                   selected[sensor_id]["n_estimators"], selected[sensor_id]["max_depth"])
+                   for sensor_id in datasets]
+        models = dict(future.result() for future in futures)
+
+    for sensor_id, sensor_candidates in candidates.items():
+        print(f"\nCapteur {sensor_id}")
+        print(f"{'Profondeur':>10}{'Arbres':>8}{'Précision':>11}{'Latence':>12}{'Taille':>10}")
+        for candidate in sorted(sensor_candidates, key=lambda c: -c["accuracy"]):
+            marker = "  <-" if candidate is selected[sensor_id] else ""
+            print(f"{str(candidate['max_depth']):>10}{candidate['n_estimators']:>8}"
+                  f"{candidate['accuracy'] * 100:>10.2f}%{candidate['latency_us']:>10.0f}µs"
+                  f"{candidate['size_bytes'] / 1024:>8.0f}kB{marker}")
+
+    # Publier les modèles (pickle sklearn + export NumPy + métadonnées) : une
+    # acquisition en cours les recharge sans redémarrer, voir inference/registry.py
+    registry = ModelRegistry(args.output_dir)
+    for sensor_id, model in models.items():
+        data_path = args.pattern.format(sensor_id)
+        metadata = registry.publish(
+            f"sensor_model_s{sensor_id}", model, FEATURES,
+            accuracy=selected[sensor_id]["accuracy"],
+            latency_us=selected[sensor_id]["latency_us"],
+            params={"n_estimators": selected[sensor_id]["n_estimators"],
+                    "max_depth": selected[sensor_id]["max_depth"], "random_state": SEED},
+            data=os.path.basename(data_path),
+            data_sha256=file_sha256(data_path),
+        )
+        print(f"Modèle du capteur {sensor_id} sauvegardé dans '{args.output_dir}' (version {metadata['version']})")
+
+    report_path = os.path.join(args.output_dir, "training_report.json")
+    with open(report_path, "w") as file:
+        json.dump({
+            "splits": args.splits,
+            "budget": args.budget,
+            "seed": SEED,
+            "elapsed_s": time.perf_counter() - started,
+            "sensors": {sensor_id: {"data": args.pattern.format(sensor_id), "selected": selected[sensor_id],
+                                    "candidates": candidates[sensor_id]}
+                        for sensor_id in datasets},
+        }, file, indent=2)
+    print(f"Rapport : {report_path}")
+
+
+if __name__ == "__main__":
+    main()
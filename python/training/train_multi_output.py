@@ -0,0 +1,149 @@
+"""
+Entraînement d'un modèle unique pour les 5 capteurs.
+
+Au lieu de cinq forêts (une par capteur), un RandomForestClassifier
+multi-sorties prédit les cinq états de saisie d'une trame alignée (voir
+python/utils/alignment.py) en un seul appel, à partir des features de chaque
+capteur et de features croisées (co-activation manche/revers, ...).
+
+Les données sont une session .kms annotée (ButtonState par échantillon) ou un
+dossier de fichiers data_capteurN_filtered.csv avec une colonne ButtonState,
+enregistrés en même temps. La précision de chaque capteur est comparée à
+celle d'un modèle par capteur entraîné sur le même découpage.
+
+    python python/training/train_multi_output.py data_session.kms
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+# Rendre les modules de python/ importables quand le script est lancé directement
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from inference.registry import ModelRegistry, file_sha256
+from inference.streaming import MODELS_DIR, MULTI_MODEL_NAME
+from utils.alignment import align
+from utils.features import FEATURES, FRAME_FEATURES, NUM_SENSORS, frame_features
+from utils.forest import CompiledForest, flatten_forest
+from utils.session import SESSION_EXTENSION, open_session
+
+
+# ========== DONNÉES ==========
+
+def load_labelled(path):
+    """Retourne (capteurs, temps, résistances, labels) d'une session annotée."""
+    if path.endswith(SESSION_EXTENSION):
+        session = open_session(path)
+        if not session.has_labels:
+            raise ValueError(f"{path} ne contient pas d'annotations (ButtonState)")
+        records = session.records
+        return records["sensor"], records["timestamp"], records["resistance"], records["label"]
+
+    import pandas as pd
+
+    parts = []
+    for file in sorted(glob.glob(os.path.join(path, "data_capteur*_filtered.csv"))):
+        sensor_id = int(os.path.basename(file)[len("data_capteur")])
+        df = pd.read_csv(file)
+        if "ButtonState" not in df.columns:
+            raise ValueError(f"{file} ne contient pas de colonne ButtonState")
+        parts.append((np.full(len(df), sensor_id), df["Timestamp"].to_numpy(),
+                      df["Resistance"].to_numpy(), df["ButtonState"].to_numpy()))
+    if not parts:
+        raise FileNotFoundError(f"Aucun fichier data_capteurN_filtered.csv dans {path}")
+    return tuple(np.concatenate(column) for column in zip(*parts))
+
+
+def build_dataset(sensors, timestamps, resistances, labels, period_ms=100):
+    """Trames alignées -> (X, y) avec y de forme (N, 5)."""
+    frames = align(sensors, timestamps, resistances, period_ms=period_ms)
+    label_frames = align(sensors, timestamps, labels, period_ms=period_ms,
+                         origin=int(frames["timestamp"][0]), n_frames=len(frames))
+
+    X = frame_features(frames["timestamp"], frames["values"])
+    # Garder les trames où chaque capteur a déjà été lu et annoté
+    seen = np.maximum.accumulate(~np.isnan(frames["values"]), axis=0).all(axis=1)
+    keep = seen & ~np.isnan(label_frames["values"]).any(axis=1)
+    y = (label_frames["values"][keep] >= 0.5).astype(np.int64)
+    return X[keep], y
+
+
+# ========== ÉVALUATION ==========
+
+def single_sample_latency(model, X, repeats=200):
+    """Temps médian (µs) d'un appel au modèle compilé sur une seule ligne."""
+    forest = CompiledForest(flatten_forest(model))
+    rows = X[np.linspace(0, len(X) - 1, repeats).astype(int)]
+    durations = []
+    for row in rows:
+        started = time.perf_counter()
+        forest.predict(row[None, :])
+        durations.append(time.perf_counter() - started)
+    return float(np.median(durations)) * 1e6
+
+
+def node_count(model):
+    return sum(estimator.tree_.node_count for estimator in model.estimators_)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Modèle multi-sorties pour les 5 capteurs.")
+    parser.add_argument("data", help="Session .kms annotée ou dossier de CSV avec ButtonState")
+    parser.add_argument("--n-estimators", type=int, default=100)
+    parser.add_argument("--max-depth", type=int, default=None)
+    parser.add_argument("--test-size", type=float, default=0.2,
+                        help="Part finale de l'enregistrement gardée pour le test (découpage chronologique)")
+    parser.add_argument("--output-dir", default=MODELS_DIR)
+    args = parser.parse_args()
+
+    X, y = build_dataset(*load_labelled(args.data))
+    print(f"{len(X)} trames, {X.shape[1]} features, saisies par capteur : {y.mean(axis=0).round(3).tolist()}")
+
+    # Découpage chronologique : un découpage aléatoire mettrait des trames voisines
+    # (quasi identiques à 10 Hz) des deux côtés
+    split = int(len(X) * (1 - args.test_size))
+    X_train, X_test, y_train, y_test = X[:split], X[split:], y[:split], y[split:]
+
+    params = dict(n_estimators=args.n_estimators, max_depth=args.max_depth, random_state=42, n_jobs=-1)
+    multi = RandomForestClassifier(**params).fit(X_train, y_train)
+    multi_accuracy = (multi.predict(X_test) == y_test).mean(axis=0)
+
+    # Référence : un modèle par capteur sur ses 5 features, même découpage
+    width = len(FEATURES)
+    baselines = []
+    for column in range(NUM_SENSORS):
+        columns = slice(column * width, (column + 1) * width)
+        model = RandomForestClassifier(**params).fit(X_train[:, columns], y_train[:, column])
+        accuracy = (model.predict(X_test[:, columns]) == y_test[:, column]).mean()
+        baselines.append((model, accuracy))
+
+    print(f"\n{'Capteur':<10}{'Par capteur':>14}{'Multi-sorties':>16}")
+    for column in range(NUM_SENSORS):
+        print(f"{column + 1:<10}{baselines[column][1] * 100:>13.2f}%{multi_accuracy[column] * 100:>15.2f}%")
+
+    multi_latency = single_sample_latency(multi, X_test)
+    baseline_latency = sum(single_sample_latency(model, X_test[:, column * width:(column + 1) * width])
+                           for column, (model, _) in enumerate(baselines))
+    baseline_nodes = sum(node_count(model) for model, _ in baselines)
+    print(f"\nPar tick : 5 modèles {baseline_latency:.0f} µs / {baseline_nodes} nœuds, "
+          f"multi-sorties {multi_latency:.0f} µs / {node_count(multi)} nœuds")
+
+    multi.set_params(n_jobs=None)
+    data_hash = file_sha256(args.data) if os.path.isfile(args.data) else None
+    metadata = ModelRegistry(args.output_dir).publish(
+        MULTI_MODEL_NAME, multi, FRAME_FEATURES,
+        accuracy=[float(accuracy) for accuracy in multi_accuracy],
+        params={"n_estimators": args.n_estimators, "max_depth": args.max_depth, "random_state": 42},
+        data=os.path.basename(os.path.normpath(args.data)),
+        data_sha256=data_hash,
+    )
+    print(f"Modèle sauvegardé dans {args.output_dir} ({MULTI_MODEL_NAME}, version {metadata['version']})")
+
+
+if __name__ == "__main__":
+    main()
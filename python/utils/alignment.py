@@ -0,0 +1,209 @@
+"""
+Cross-sensor time alignment.
+
+The firmware reads the five sensors one after another inside each tick, so
+every reading has its own millis() timestamp and sensors are stored apart.
+This module puts them back together as frames on a uniform time grid: one
+timestamp (start of the grid cell, ms) and a contiguous float32[5] vector of
+resistances. A recording becomes a single (N, 5) array (`frames["values"]`)
+that can be processed across sensors in one vectorized call.
+
+Two resampling methods:
+- "hold": each sensor keeps its last reading before the end of the cell
+  (what the incremental `FrameAligner` does live);
+- "linear": readings are interpolated at the cell start.
+A sensor whose last reading is older than `max_gap_ms` (dropped samples, or
+before its first reading) is NaN in the frame.
+
+Usage: python python/utils/alignment.py data_session.kms frames.npy [--period 100]
+"""
+import argparse
+import bisect
+import os
+import sys
+
+import numpy as np
+
+# Make the python/ modules importable when the script is launched directly
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from utils.session import open_session
+
+
+NUM_SENSORS = 5
+PERIOD_MS = 100
+# A reading stands for the sensor up to this age, then the sensor is NaN
+MAX_GAP_MS = 3 * PERIOD_MS
+
+
+def frame_dtype(n_sensors=NUM_SENSORS):
+    return np.dtype([("timestamp", "<u4"), ("values", "<f4", (n_sensors,))])
+
+
+# ========== BATCH MODE ==========
+
+def align(sensor_ids, timestamps, values, period_ms=PERIOD_MS, max_gap_ms=MAX_GAP_MS, method="hold",
+          n_sensors=NUM_SENSORS, origin=None, n_frames=None):
+    """
+    Returns the frames (frame_dtype array) of interleaved (sensor, timestamp,
+    value) readings, sensors numbered from 1. The grid starts at `origin`
+    (default: first reading) and covers the last reading unless `n_frames`
+    is given; pass the same `origin` and `n_frames` to align other
+    per-reading values (labels, ...) on the same grid.
+    """
+    if method not in ("hold", "linear"):
+        raise ValueError(f"Unknown method: {method}")
+    sensor_ids = np.asarray(sensor_ids)
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    values = np.asarray(values, dtype=np.float64)
+
+    if origin is None:
+        origin = int(timestamps.min()) if len(timestamps) else 0
+    if n_frames is None:
+        n_frames = (int(timestamps.max()) - origin) // period_ms + 1 if len(timestamps) else 0
+    starts = origin + np.arange(n_frames, dtype=np.int64) * period_ms
+
+    frames = np.empty(n_frames, dtype=frame_dtype(n_sensors))
+    frames["timestamp"] = starts
+    for column in range(n_sensors):
+        mask = sensor_ids == column + 1
+        # Stable sort: among equal timestamps, the last received reading wins
+        order = np.argsort(timestamps[mask], kind="stable")
+        sensor_times, sensor_values = timestamps[mask][order], values[mask][order]
+        frames["values"][:, column] = _resample(sensor_times, sensor_values, starts, period_ms, max_gap_ms, method)
+    return frames
+
+
+def _resample(times, values, starts, period_ms, max_gap_ms, method):
+    result = np.full(len(starts), np.nan)
+    if len(times) == 0:
+        return result
+
+    if method == "hold":
+        ends = starts + period_ms
+        last = np.searchsorted(times, ends, side="left") - 1  # last reading before the end of the cell
+        valid = (last >= 0) & (ends - times[np.maximum(last, 0)] <= max_gap_ms)
+        result[valid] = values[last[valid]]
+        return result
+
+    # Linear: interpolate between the readings around each cell start, if both are close enough
+    after = np.searchsorted(times, starts, side="left")
+    before = np.searchsorted(times, starts, side="right") - 1
+    inside = (before >= 0) & (after < len(times))
+    before_time = times[np.clip(before, 0, len(times) - 1)]
+    after_time = times[np.clip(after, 0, len(times) - 1)]
+    valid = inside & (after_time - before_time <= max_gap_ms)
+    unique_times, last_index = np.unique(times[::-1], return_index=True)
+    unique_values = values[::-1][last_index]  # last reading of duplicated timestamps
+    result[valid] = np.interp(starts[valid], unique_times, unique_values)
+    return result
+
+
+def frames_from_session(session, **kwargs):
+    """Frames of a Session (see utils/session.py)."""
+    records = session.records
+    return align(records["sensor"], records["timestamp"], records["resistance"], **kwargs)
+
+
+def save_frames(path, frames):
+    np.save(path, frames)
+
+
+def load_frames(path, mmap=True):
+    return np.load(path, mmap_mode="r" if mmap else None)
+
+
+# ========== INCREMENTAL MODE ==========
+
+class FrameAligner:
+    """
+    Live version of `align(method="hold")`. Readings are fed as they arrive
+    with `update`, which returns the frames completed so far (possibly none).
+    A cell is completed once a reading `lateness_ms` past its end arrives, so
+    readings up to `lateness_ms` out of order still land in the right frame;
+    older ones are counted in `late` and dropped. `flush` completes the
+    remaining cells at the end of the recording.
+    """
+
+    def __init__(self, period_ms=PERIOD_MS, max_gap_ms=MAX_GAP_MS, lateness_ms=0, n_sensors=NUM_SENSORS):
+        self.period_ms = period_ms
+        self.max_gap_ms = max_gap_ms
+        self.lateness_ms = lateness_ms
+        self.n_sensors = n_sensors
+        self.dtype = frame_dtype(n_sensors)
+        self.reset()
+
+    def reset(self):
+        self.origin = None
+        self.next_frame = 0           # index of the next frame to complete
+        self._newest = None           # newest timestamp received
+        self._pending = [[] for _ in range(self.n_sensors)]  # readings not yet used, sorted by time
+        self._last_time = [None] * self.n_sensors
+        self._last_value = [np.nan] * self.n_sensors
+        self.frames = 0
+        self.late = 0
+
+    def _frame_end(self, index):
+        return self.origin + (index + 1) * self.period_ms
+
+    def update(self, sensor_id, timestamp, value):
+        if self.origin is None:
+            self.origin = int(timestamp)
+        if not 1 <= sensor_id <= self.n_sensors:
+            raise KeyError(f"Unknown sensor: {sensor_id}")
+        if timestamp < self.origin + self.next_frame * self.period_ms:
+            self.late += 1
+            return np.empty(0, dtype=self.dtype)
+
+        bisect.insort_right(self._pending[sensor_id - 1], (timestamp, value), key=lambda reading: reading[0])
+        self._newest = timestamp if self._newest is None else max(self._newest, timestamp)
+
+        # Cells whose end is at least `lateness_ms` behind the newest reading
+        ready = (self._newest - self.lateness_ms - self.origin) // self.period_ms
+        return self._complete(ready)
+
+    def flush(self):
+        """Completes every cell up to the one holding the newest reading."""
+        if self._newest is None:
+            return np.empty(0, dtype=self.dtype)
+        return self._complete((self._newest - self.origin) // self.period_ms + 1)
+
+    def _complete(self, until):
+        count = max(0, int(until) - self.next_frame)
+        frames = np.empty(count, dtype=self.dtype)
+        for row in range(count):
+            index = self.next_frame + row
+            end = self._frame_end(index)
+            frames[row]["timestamp"] = end - self.period_ms
+            for column, pending in enumerate(self._pending):
+                used = bisect.bisect_left(pending, end, key=lambda reading: reading[0])
+                if used:
+                    self._last_time[column], self._last_value[column] = pending[used - 1]
+                    del pending[:used]
+                last_time = self._last_time[column]
+                held = last_time is not None and end - last_time <= self.max_gap_ms
+                frames[row]["values"][column] = self._last_value[column] if held else np.nan
+        self.next_frame += count
+        self.frames += count
+        return frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Align the sensors of a session on a uniform time grid.")
+    parser.add_argument("session", help="Session file (.kms)")
+    parser.add_argument("output", help="Output .npy file of (timestamp, values[5]) frames")
+    parser.add_argument("--period", type=int, default=PERIOD_MS, help="Grid period (ms)")
+    parser.add_argument("--max-gap", type=int, default=MAX_GAP_MS, help="Oldest reading used for a frame (ms)")
+    parser.add_argument("--method", choices=["hold", "linear"], default="hold")
+    args = parser.parse_args()
+
+    frames = frames_from_session(open_session(args.session), period_ms=args.period,
+                                 max_gap_ms=args.max_gap, method=args.method)
+    save_frames(args.output, frames)
+    missing = np.isnan(frames["values"]).mean(axis=0) * 100
+    print(f"{len(frames)} frames -> {args.output} "
+          f"(missing per sensor: {', '.join(f'{m:.1f}%' for m in missing)})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+"""
+Plot decimation shared by the live dashboard and the cached session plots.
+"""
+import numpy as np
+
+
+def minmax_decimate(x, y, x_min, x_max, n_bins):
+    """
+    Reduces sorted (x, y) points to the min and max of each of `n_bins` equal
+    x bins over [x_min, x_max]: at one bin per pixel column the trace looks
+    the same as with every point, peaks included. Returns the input when it
+    is already small enough.
+    """
+    if len(x) <= 2 * n_bins:
+        return x, y
+    edges = np.linspace(x_min, x_max, n_bins + 1)
+    starts = np.unique(np.searchsorted(x, edges[:-1], side="left"))
+    starts = starts[starts < len(x)]
+    lows = np.minimum.reduceat(y, starts)
+    highs = np.maximum.reduceat(y, starts)
+    # Vertical segment per column: (x, min) then (x, max)
+    return np.repeat(x[starts], 2), np.column_stack([lows, highs]).ravel()
@@ -0,0 +1,212 @@
+"""
+Background disk writes for long recordings.
+
+`DiskWriter` owns one thread that performs every write of a recording, in
+submission order per file, and calls fsync on the open files every
+`fsync_interval` seconds: the acquisition loop only hands over buffers and
+never waits on the disk, and a crash or power cut loses at most the last
+interval. `BackgroundTextFile` is a file-like object for csv.writer that
+collects rows in memory and hands them to the writer in blocks.
+
+Binary sessions use it through `SessionWriter(path, writer=...)` (see
+utils/session.py), which fills preallocated record chunks and returns them
+to a fixed pool once written, so memory stays constant whatever the length
+of the session.
+"""
+import logging
+import os
+import queue
+import threading
+import time
+
+
+FSYNC_INTERVAL = 5.0
+# Text buffered before a block is handed to the writer (characters), or older than this (s)
+TEXT_BLOCK_SIZE = 1 << 16
+FLUSH_INTERVAL = 1.0
+
+logger = logging.getLogger(__name__)
+
+# Control jobs of the writer queue
+_SYNC = object()
+_STOP = object()
+_CLOSE = object()
+
+
+class DiskWriter:
+    def __init__(self, fsync_interval=FSYNC_INTERVAL, metrics=None):
+        self.fsync_interval = fsync_interval
+        self.error = None
+        self.bytes_written = 0
+        self._files = []
+        self._jobs = queue.SimpleQueue()
+        self._write_time = metrics.histogram("disk_write") if metrics is not None else None
+        self._fsync_time = metrics.histogram("fsync") if metrics is not None else None
+        self._thread = threading.Thread(target=self._loop, name="disk-writer", daemon=True)
+        self._thread.start()
+
+    @property
+    def pending(self):
+        """Jobs not yet written (approximate)."""
+        return self._jobs.qsize()
+
+    # ---------- Caller side ----------
+
+    def open(self, path, mode="wb", **kwargs):
+        """Opens a file whose writes and fsyncs are done by the writer thread."""
+        file = open(path, mode, **kwargs)
+        self._files.append(file)
+        return file
+
+    def submit(self, file, data, on_written=None):
+        """
+        Queues `data` (bytes, memoryview or str for a text file) to be written
+        to `file`; `on_written()` is then called on the writer thread.
+        """
+        self._jobs.put((file, data, on_written))
+
+    def close_file(self, file):
+        """Closes `file` once everything queued for it is written."""
+        self._jobs.put((file, _CLOSE, None))
+
+    def flush(self, timeout=None):
+        """Waits until every queued write is done and synced. Raises the first write error, if any."""
+        done = threading.Event()
+        self._jobs.put((None, _SYNC, done.set))
+        done.wait(timeout)
+        if self.error is not None:
+            raise self.error
+
+    def close(self, timeout=None):
+        """Writes what is queued, syncs and closes every file, then stops the thread."""
+        self._jobs.put((None, _STOP, None))
+        self._thread.join(timeout)
+        if self.error is not None:
+            raise self.error
+
+    # ---------- Writer thread ----------
+
+    def _sync(self):
+        started = time.perf_counter()
+        for file in self._files:
+            if not file.closed:
+                file.flush()
+                os.fsync(file.fileno())
+        if self._fsync_time is not None:
+            self._fsync_time.record(time.perf_counter() - started)
+
+    @staticmethod
+    def _write(file, data):
+        # Out of the process buffer right away: a killed process then loses nothing handed over
+        file.write(data)
+        file.flush()
+
+    def _run(self, operation):
+        try:
+            operation()
+        except Exception as e:
+            # Keep draining the queue (chunks go back to their pool); the error is raised on flush/close
+            if self.error is None:
+                self.error = e
+                logger.error(f"Disk write failed: {e}")
+
+    def _loop(self):
+        next_sync = time.monotonic() + self.fsync_interval
+        while True:
+            try:
+                file, data, on_written = self._jobs.get(timeout=max(0.0, next_sync - time.monotonic()))
+            except queue.Empty:
+                file = data = on_written = None
+
+            if data is _STOP:
+                self._run(self._sync)
+                for open_file in self._files:
+                    open_file.close()
+                return
+            if data is _SYNC:
+                self._run(self._sync)
+                next_sync = time.monotonic() + self.fsync_interval
+            elif data is _CLOSE:
+                self._run(file.close)
+            elif data is not None:
+                started = time.perf_counter()
+                self._run(lambda: self._write(file, data))
+                self.bytes_written += len(data)
+                if self._write_time is not None:
+                    self._write_time.record(time.perf_counter() - started)
+
+            if on_written is not None:
+                on_written()
+            if time.monotonic() >= next_sync:
+                self._run(self._sync)
+                next_sync = time.monotonic() + self.fsync_interval
+
+
+class BackgroundTextFile:
+    """
+    Text file written by a DiskWriter: `write` only appends to a list; the
+    text is handed to the writer when it reaches `block_size` characters or
+    is older than `flush_interval` seconds (checked on each write and by
+    `tick`, to be called periodically). With
+    `append=True` an existing file is continued, without the line a crash
+    may have cut.
+    """
+
+    def __init__(self, writer, path, block_size=TEXT_BLOCK_SIZE, flush_interval=FLUSH_INTERVAL, append=False):
+        self.writer = writer
+        self.block_size = block_size
+        self.flush_interval = flush_interval
+        # Continuing a file: `resumed` tells the caller not to write the header again
+        self.resumed = append and os.path.exists(path) and os.path.getsize(path) > 0
+        if self.resumed:
+            trim_partial_line(path)
+        # newline="" as for csv.writer files
+        self._file = writer.open(path, "a" if self.resumed else "w", newline="")
+        self._parts = []
+        self._size = 0
+        self._deadline = None
+
+    def write(self, text):
+        self._parts.append(text)
+        self._size += len(text)
+        now = time.monotonic()
+        if self._deadline is None:
+            self._deadline = now + self.flush_interval
+        if self._size >= self.block_size or now >= self._deadline:
+            self._hand_over()
+        return len(text)
+
+    def _hand_over(self):
+        if self._parts:
+            self.writer.submit(self._file, "".join(self._parts))
+            self._parts = []
+            self._size = 0
+        self._deadline = None
+
+    def tick(self, now=None):
+        """Hands the text over once it is older than `flush_interval`, even without new writes."""
+        if self._deadline is not None and (now if now is not None else time.monotonic()) >= self._deadline:
+            self._hand_over()
+
+    def flush(self):
+        """Hands the buffered text to the writer (see DiskWriter.flush to wait for it)."""
+        self._hand_over()
+
+    def close(self):
+        self._hand_over()
+        self.writer.close_file(self._file)
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+
+def trim_partial_line(path, max_line=1 << 16):
+    """Removes an unterminated last line (a row cut by a crash). Returns the number of bytes removed."""
+    with open(path, "rb+") as file:
+        size = file.seek(0, os.SEEK_END)
+        tail_start = max(0, size - max_line)
+        file.seek(tail_start)
+        keep = tail_start + file.read().rfind(b"\n") + 1
+        file.truncate(keep)
+    return size - keep
@@ -0,0 +1,159 @@
+"""
+Grip events from per-sample predictions.
+
+The models score every 100 ms sample; a grip is a run of positive samples.
+Samples are turned into events in three steps:
+- hysteresis: the grip state turns on when the score (grip probability, or
+  the 0/1 prediction) reaches `on_threshold` and only turns off when it falls
+  below `off_threshold`, so a score hovering around 0.5 does not flicker;
+- gap merging: two runs separated by at most `max_gap_ms` are one grip;
+- minimum duration: events shorter than `min_duration_ms` are dropped.
+
+Each event has its start and end time (first and last grip sample, ms), its
+duration and its peak pressure, i.e. the lowest resistance of the event.
+
+`segment_events` works on whole arrays (vectorized NumPy) and
+`EventSegmenter` takes one sample at a time; both return the same events.
+"""
+import numpy as np
+
+
+EVENT_DTYPE = np.dtype([
+    ("start", "<i8"),
+    ("end", "<i8"),
+    ("duration", "<i8"),
+    ("peak_resistance", "<f8"),
+])
+
+ON_THRESHOLD = 0.6
+OFF_THRESHOLD = 0.4
+MIN_DURATION_MS = 300
+MAX_GAP_MS = 200
+
+
+# ========== BATCH MODE ==========
+
+def hysteresis(scores, on_threshold=ON_THRESHOLD, off_threshold=OFF_THRESHOLD):
+    """Boolean grip state of every sample."""
+    scores = np.asarray(scores, dtype=np.float64)
+    # 1 = switch on, 0 = switch off, -1 = keep the previous state
+    decisions = np.where(scores >= on_threshold, 1, np.where(scores < off_threshold, 0, -1))
+    # Index of the last decisive sample, -1 before the first one (initial state: off)
+    last = np.where(decisions >= 0, np.arange(len(decisions)), -1)
+    last = np.maximum.accumulate(last) if len(last) else last
+    return np.where(last >= 0, decisions[np.maximum(last, 0)], 0).astype(bool)
+
+
+def segment_events(timestamps, scores, resistances, on_threshold=ON_THRESHOLD, off_threshold=OFF_THRESHOLD,
+                   min_duration_ms=MIN_DURATION_MS, max_gap_ms=MAX_GAP_MS):
+    """Returns the grip events of a whole recording as an EVENT_DTYPE array."""
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    resistances = np.asarray(resistances, dtype=np.float64)
+    state = hysteresis(scores, on_threshold, off_threshold)
+
+    # Runs of grip samples: [starts[k], ends[k]] inclusive
+    edges = np.diff(np.concatenate(([0], state.view(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1) - 1
+    if len(starts) == 0:
+        return np.empty(0, dtype=EVENT_DTYPE)
+
+    # Merge runs separated by short gaps
+    new_event = np.concatenate(([True], timestamps[starts[1:]] - timestamps[ends[:-1]] > max_gap_ms))
+    starts = starts[new_event]
+    ends = ends[np.concatenate((new_event[1:], [True]))]
+
+    # Lowest resistance inside each event (gaps included), +inf outside
+    inside = np.zeros(len(state) + 1, dtype=np.int64)
+    np.add.at(inside, starts, 1)
+    np.add.at(inside, ends + 1, -1)
+    masked = np.where(np.cumsum(inside[:-1]) > 0, resistances, np.inf)
+    peaks = np.minimum.reduceat(masked, starts)
+
+    events = np.empty(len(starts), dtype=EVENT_DTYPE)
+    events["start"] = timestamps[starts]
+    events["end"] = timestamps[ends]
+    events["duration"] = events["end"] - events["start"]
+    events["peak_resistance"] = peaks
+    return events[events["duration"] >= min_duration_ms]
+
+
+def summarize_events(events):
+    """Number of grips and their durations (s)."""
+    durations = np.asarray(events["duration"], dtype=np.float64) / 1000.0
+    return {
+        "count": len(events),
+        "total_duration_s": float(durations.sum()),
+        "mean_duration_s": float(durations.mean()) if len(durations) else 0.0,
+        "max_duration_s": float(durations.max()) if len(durations) else 0.0,
+    }
+
+
+# ========== INCREMENTAL MODE ==========
+
+class EventSegmenter:
+    """
+    Streaming version of `segment_events` for one sensor. `update` returns
+    the event that the sample completes (an EVENT_DTYPE record), or None;
+    `flush` closes the event still open at the end of the recording.
+    Timestamps must be increasing.
+    """
+
+    def __init__(self, on_threshold=ON_THRESHOLD, off_threshold=OFF_THRESHOLD,
+                 min_duration_ms=MIN_DURATION_MS, max_gap_ms=MAX_GAP_MS):
+        self.on_threshold = on_threshold
+        self.off_threshold = off_threshold
+        self.min_duration_ms = min_duration_ms
+        self.max_gap_ms = max_gap_ms
+        self.reset()
+
+    def reset(self):
+        self.state = False
+        self._start = None        # start of the open event, None if no event is open
+        self._last = None         # last grip sample of the open event
+        self._peak = np.inf
+        self._in_gap = False      # samples without grip since the last grip sample
+        self._gap_peak = np.inf   # lowest resistance of those samples
+        self.count = 0
+
+    def update(self, timestamp, score, resistance):
+        if score >= self.on_threshold:
+            self.state = True
+        elif score < self.off_threshold:
+            self.state = False
+
+        completed = None
+        if self.state:
+            if self._start is not None and self._in_gap and timestamp - self._last > self.max_gap_ms:
+                completed = self._close()
+            if self._start is None:
+                self._start = timestamp
+                self._peak = resistance
+            else:
+                self._peak = min(self._peak, self._gap_peak, resistance)
+            self._last = timestamp
+            self._in_gap = False
+            self._gap_peak = np.inf
+        elif self._start is not None:
+            self._in_gap = True
+            self._gap_peak = min(self._gap_peak, resistance)
+            # No later grip sample can be merged into the open event any more
+            if timestamp - self._last > self.max_gap_ms:
+                completed = self._close()
+        return completed
+
+    def flush(self):
+        return self._close() if self._start is not None else None
+
+    def _close(self):
+        event = None
+        duration = self._last - self._start
+        if duration >= self.min_duration_ms:
+            event = np.array((self._start, self._last, duration, self._peak), dtype=EVENT_DTYPE)[()]
+            self.count += 1
+        self._start = None
+        self._last = None
+        self._peak = np.inf
+        self._in_gap = False
+        self._gap_peak = np.inf
+        return event
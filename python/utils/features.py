@@ -0,0 +1,205 @@
+"""
+Grip features shared by training and inference.
+
+The same five features are computed in two ways:
+- `FeatureExtractor.transform` works on whole arrays (vectorized NumPy),
+  for training and offline scoring;
+- `FeatureExtractor.update` takes one sample at a time in constant time,
+  for live inference.
+
+Both modes perform the same floating-point operations in the same order, so
+they return bit-identical feature vectors.
+"""
+import math
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+FEATURES = ["Resistance", "ResistanceRollingMean", "ResistanceRollingStd", "ResistanceDiff", "Energy"]
+ROLLING_WINDOW = 5
+
+
+class FeatureExtractor:
+    """
+    Computes the features of one sensor:
+    - Resistance: raw value
+    - ResistanceRollingMean / ResistanceRollingStd: mean and sample std over
+      the last 5 points (0 until the window is full)
+    - ResistanceDiff: dR/dt with the previous sample (0 if dt == 0)
+    - Energy: cumulative sum of ResistanceDiff²
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self._window = [0.0] * ROLLING_WINDOW  # ring buffer
+        self._head = 0  # index of the oldest sample in the buffer
+        self._count = 0
+        self._last_timestamp = None
+        self._last_resistance = None
+        self._energy = 0.0
+
+    # ========== BATCH MODE ==========
+
+    @staticmethod
+    def transform(timestamps, resistances):
+        """Returns the (N, 5) feature matrix of a whole recording."""
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        resistances = np.asarray(resistances, dtype=np.float64)
+        n = len(resistances)
+        features = np.zeros((n, len(FEATURES)))
+        if n == 0:
+            return features
+
+        features[:, 0] = resistances
+
+        diff = np.zeros(n)
+        if n > 1:
+            delta_t = np.diff(timestamps)
+            delta_r = np.diff(resistances)
+            nonzero = delta_t != 0
+            diff[1:][nonzero] = delta_r[nonzero] / delta_t[nonzero]
+        features[:, 3] = diff
+        features[:, 4] = np.cumsum(diff * diff)
+
+        if n >= ROLLING_WINDOW:
+            w = sliding_window_view(resistances, ROLLING_WINDOW)
+            # Explicit left-to-right sums, identical to the incremental mode
+            mean = (w[:, 0] + w[:, 1] + w[:, 2] + w[:, 3] + w[:, 4]) / ROLLING_WINDOW
+            d = w - mean[:, None]
+            d2 = d * d
+            var = (d2[:, 0] + d2[:, 1] + d2[:, 2] + d2[:, 3] + d2[:, 4]) / (ROLLING_WINDOW - 1)
+            features[ROLLING_WINDOW - 1:, 1] = mean
+            features[ROLLING_WINDOW - 1:, 2] = np.sqrt(var)
+
+        return features
+
+    # ========== INCREMENTAL MODE ==========
+
+    def update(self, timestamp, resistance, out=None):
+        """
+        Adds one sample and returns its feature vector. `out` can be a
+        preallocated array of length 5 to avoid any allocation.
+        """
+        timestamp = float(timestamp)
+        resistance = float(resistance)
+        if out is None:
+            out = np.empty(len(FEATURES))
+
+        if self._last_timestamp is None:
+            diff = 0.0
+        else:
+            delta_t = timestamp - self._last_timestamp
+            diff = (resistance - self._last_resistance) / delta_t if delta_t != 0 else 0.0
+        self._energy += diff * diff
+        self._last_timestamp = timestamp
+        self._last_resistance = resistance
+
+        window = self._window
+        if self._count < ROLLING_WINDOW:
+            window[self._count] = resistance
+            self._count += 1
+        else:
+            window[self._head] = resistance
+            self._head = (self._head + 1) % ROLLING_WINDOW
+
+        if self._count == ROLLING_WINDOW:
+            h = self._head
+            w0, w1, w2, w3, w4 = (window[(h + k) % ROLLING_WINDOW] for k in range(ROLLING_WINDOW))
+            mean = (w0 + w1 + w2 + w3 + w4) / ROLLING_WINDOW
+            d0, d1, d2, d3, d4 = w0 - mean, w1 - mean, w2 - mean, w3 - mean, w4 - mean
+            var = (d0 * d0 + d1 * d1 + d2 * d2 + d3 * d3 + d4 * d4) / (ROLLING_WINDOW - 1)
+            std = math.sqrt(var)
+        else:
+            mean = 0.0
+            std = 0.0
+
+        out[0] = resistance
+        out[1] = mean
+        out[2] = std
+        out[3] = diff
+        out[4] = self._energy
+        return out
+
+
+# ========== CROSS-SENSOR FEATURES ==========
+# Sensor layout: 1 right arm, 2 right lapel, 3 neck, 4 left lapel, 5 left arm.
+# A frame (see utils/alignment.py) is described by the five features of each
+# sensor followed by features combining sensors, for the multi-output model.
+
+NUM_SENSORS = 5
+CROSS_FEATURES = [
+    "ArmsResistance",          # R1 + R5
+    "LapelsResistance",        # R2 + R4
+    "RightSideResistance",     # R1 + R2, right arm + right lapel
+    "LeftSideResistance",      # R4 + R5
+    "LapelsDiff",              # dR2/dt + dR4/dt
+    "MinResistance",           # strongest pressure over the kimono
+    "ArmLapelCoactivation",    # dR1/dt * dR2/dt + dR5/dt * dR4/dt, > 0 when arm and lapel move together
+]
+FRAME_FEATURES = [f"S{sensor}{name}" for sensor in range(1, NUM_SENSORS + 1) for name in FEATURES] + CROSS_FEATURES
+
+
+def fill_missing(values):
+    """Replaces the NaN of (N, 5) frame values by the last valid value of the sensor (0 before the first one)."""
+    values = np.array(values, dtype=np.float64)
+    n = len(values)
+    valid = ~np.isnan(values)
+    last = np.where(valid, np.arange(n)[:, None], -1)
+    last = np.maximum.accumulate(last, axis=0) if n else last
+    filled = np.take_along_axis(values, np.maximum(last, 0), axis=0)
+    filled[last < 0] = 0.0
+    return filled
+
+
+def frame_features(timestamps, values):
+    """Returns the (N, 32) FRAME_FEATURES matrix of aligned (N, 5) frame values."""
+    values = fill_missing(values)
+    per_sensor = [FeatureExtractor.transform(timestamps, values[:, column]) for column in range(NUM_SENSORS)]
+    features = np.empty((len(values), len(FRAME_FEATURES)))
+    features[:, :NUM_SENSORS * len(FEATURES)] = np.concatenate(per_sensor, axis=1)
+    r = [block[:, 0] for block in per_sensor]
+    d = [block[:, 3] for block in per_sensor]
+    _cross_features(r, d, features[:, NUM_SENSORS * len(FEATURES):].T, np.minimum)
+    return features
+
+
+def _cross_features(r, d, out, minimum):
+    # Shared by the batch and incremental modes so both do the same operations
+    out[0] = r[0] + r[4]
+    out[1] = r[1] + r[3]
+    out[2] = r[0] + r[1]
+    out[3] = r[3] + r[4]
+    out[4] = d[1] + d[3]
+    out[5] = minimum(minimum(minimum(minimum(r[0], r[1]), r[2]), r[3]), r[4])
+    out[6] = d[0] * d[1] + d[4] * d[3]
+
+
+class FrameFeatureExtractor:
+    """Incremental version of `frame_features`, one aligned frame at a time."""
+
+    def __init__(self):
+        self.extractors = [FeatureExtractor() for _ in range(NUM_SENSORS)]
+        self.reset()
+
+    def reset(self):
+        for extractor in self.extractors:
+            extractor.reset()
+        self._last_values = [0.0] * NUM_SENSORS
+
+    def update(self, timestamp, values, out=None):
+        if out is None:
+            out = np.empty(len(FRAME_FEATURES))
+        width = len(FEATURES)
+        for column, extractor in enumerate(self.extractors):
+            value = float(values[column])
+            if value != value:  # NaN: sensor missing from this frame
+                value = self._last_values[column]
+            self._last_values[column] = value
+            extractor.update(timestamp, value, out=out[column * width:(column + 1) * width])
+        r = [out[column * width] for column in range(NUM_SENSORS)]
+        d = [out[column * width + 3] for column in range(NUM_SENSORS)]
+        _cross_features(r, d, out[NUM_SENSORS * width:], min)
+        return out
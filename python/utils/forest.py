@@ -0,0 +1,156 @@
+"""
+Array-backed Random Forest predictor.
+
+`export_forest` flattens the trees of a fitted sklearn RandomForestClassifier
+into one structured NumPy array of nodes (feature index, threshold, children,
+leaf class probabilities) saved as a .npy file. `load_forest` maps that file
+with `np.load(mmap_mode="r")` and returns a `CompiledForest`, which evaluates
+one sample or a batch by walking all the trees at once and gives the same
+outputs as sklearn's `predict` / `predict_proba`.
+
+All trees share one node array. Leaves point to themselves, so every sample
+can take the same number of steps (the depth of the forest) without any
+per-node branching.
+"""
+import numpy as np
+
+
+N_CLASSES = 2
+
+
+def node_dtype(n_outputs=1):
+    return np.dtype([
+        ("feature", "<i4"),
+        ("threshold", "<f8"),
+        ("left", "<i4"),
+        ("right", "<i4"),
+        ("value", "<f8", (n_outputs, N_CLASSES)),
+    ])
+
+
+# ========== EXPORT ==========
+
+def flatten_forest(model):
+    """Returns the node array of a fitted binary RandomForestClassifier."""
+    classes = model.classes_ if model.n_outputs_ > 1 else [model.classes_]
+    for output_classes in classes:
+        if list(output_classes) != [0, 1]:
+            raise ValueError(f"Only 0/1 classifiers can be exported (classes: {list(output_classes)})")
+
+    n_outputs = model.n_outputs_
+    trees = [estimator.tree_ for estimator in model.estimators_]
+    nodes = np.zeros(sum(tree.node_count for tree in trees), dtype=node_dtype(n_outputs))
+
+    start = 0
+    for tree in trees:
+        end = start + tree.node_count
+        block = nodes[start:end]
+        own_index = np.arange(start, end, dtype=np.int32)
+        is_leaf = tree.children_left == -1
+
+        block["feature"] = np.where(is_leaf, 0, tree.feature)
+        block["threshold"] = np.where(is_leaf, 0.0, tree.threshold)
+        block["left"] = np.where(is_leaf, own_index, tree.children_left + start)
+        block["right"] = np.where(is_leaf, own_index, tree.children_right + start)
+
+        # Same normalisation as DecisionTreeClassifier.predict_proba: older
+        # sklearn versions store class counts, newer ones store fractions
+        value = tree.value[:, :n_outputs, :N_CLASSES].astype(np.float64)
+        normalizer = value.sum(axis=-1, keepdims=True)
+        if not np.allclose(normalizer, 1.0):
+            normalizer[normalizer == 0.0] = 1.0
+            value = value / normalizer
+        block["value"] = value
+
+        start = end
+
+    return nodes
+
+
+def export_forest(model, path):
+    """Writes the flattened forest of `model` to `path` (.npy)."""
+    nodes = flatten_forest(model)
+    np.save(path, nodes)
+    return nodes
+
+
+def load_forest(path, mmap=True):
+    return CompiledForest(np.load(path, mmap_mode="r" if mmap else None))
+
+
+# ========== PREDICTION ==========
+
+class CompiledForest:
+    """Predictor over a flattened node array (see `flatten_forest`)."""
+
+    def __init__(self, nodes):
+        self.nodes = nodes
+        self.n_outputs = nodes.dtype["value"].shape[0]
+
+        self._feature = np.asarray(nodes["feature"], dtype=np.intp)
+        self._threshold = np.asarray(nodes["threshold"])
+        self._left = np.asarray(nodes["left"], dtype=np.intp)
+        self._right = np.asarray(nodes["right"], dtype=np.intp)
+        self._value = np.asarray(nodes["value"])
+        # children[2 * i] is the left child of node i, children[2 * i + 1] the right one
+        self._children = np.stack([self._left, self._right], axis=1).ravel()
+
+        # Roots are the nodes that are nobody's child
+        node_index = np.arange(len(nodes))
+        is_child = np.zeros(len(nodes), dtype=bool)
+        is_child[self._left[self._left != node_index]] = True
+        is_child[self._right[self._right != node_index]] = True
+        self.roots = np.flatnonzero(~is_child)
+        self.n_estimators = len(self.roots)
+
+        # Number of steps needed to reach every leaf
+        depth = 0
+        index = self.roots
+        while True:
+            children = np.concatenate([self._left[index], self._right[index]])
+            children = children[children != np.concatenate([index, index])]
+            if len(children) == 0:
+                break
+            index = children
+            depth += 1
+        self.depth = depth
+
+    def apply(self, X):
+        """Returns the (n_samples, n_estimators) indices of the leaves reached."""
+        # sklearn evaluates the trees on float32 inputs
+        X = np.atleast_2d(np.asarray(X, dtype=np.float32))
+        if X.shape[0] == 1:
+            return self._apply_one(X[0])[None, :]
+
+        rows = np.arange(X.shape[0])[:, None]
+        index = np.broadcast_to(self.roots, (X.shape[0], self.n_estimators))
+        for _ in range(self.depth):
+            go_right = X[rows, self._feature[index]] > self._threshold[index]
+            index = self._children[2 * index + go_right]
+        return index
+
+    def _apply_one(self, x):
+        # Live path: one sample, stop as soon as every tree has reached a leaf
+        children, feature, threshold = self._children, self._feature, self._threshold
+        index = self.roots
+        for step in range(self.depth):
+            next_index = children[2 * index + (x[feature[index]] > threshold[index])]
+            if step % 4 == 3 and np.array_equal(next_index, index):
+                break
+            index = next_index
+        return index
+
+    def predict_proba(self, X):
+        """
+        Mean leaf probabilities, shape (n_samples, 2), or
+        (n_samples, n_outputs, 2) for a multi-output forest.
+        """
+        leaves = self._value[self.apply(X)]  # (n_samples, n_estimators, n_outputs, 2)
+        # Trees are accumulated one after the other, like sklearn does
+        proba = np.cumsum(leaves, axis=1)[:, -1] / self.n_estimators
+        return proba[:, 0] if self.n_outputs == 1 else proba
+
+    def predict(self, X):
+        """Predicted classes (0/1), shape (n_samples,) or (n_samples, n_outputs)."""
+        proba = self.predict_proba(X)
+        return np.argmax(proba, axis=-1)
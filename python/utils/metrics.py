@@ -0,0 +1,168 @@
+"""
+Lightweight instrumentation for the live path.
+
+`Metrics` holds named counters, gauges and latency histograms. Recording is
+a few integer operations (no lock, no allocation), cheap enough to call for
+every sample; `snapshot()` turns everything into a JSON-ready dict (latencies
+in ms: count, mean, p50, p90, p99, max) for the GUI status, the "stats"
+command and the periodic JSON dump of `MetricsDumper`.
+
+Histograms use log-spaced buckets, four per octave from 1 µs to about 16 s,
+so percentiles are exact to within 20% at any scale.
+"""
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+
+
+SUB_BUCKETS = 4
+OCTAVES = 24
+N_BUCKETS = 1 + SUB_BUCKETS * OCTAVES
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * N_BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        micros = seconds * 1e6
+        if micros < 1.0:
+            index = 0
+        else:
+            mantissa, exponent = math.frexp(micros)  # micros = mantissa * 2**exponent, mantissa in [0.5, 1)
+            index = min(1 + (exponent - 1) * SUB_BUCKETS + int((mantissa - 0.5) * 2 * SUB_BUCKETS), N_BUCKETS - 1)
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    @staticmethod
+    def _upper_bound(index):
+        """Upper bound of a bucket, in seconds."""
+        if index == 0:
+            return 1e-6
+        exponent, sub = divmod(index - 1, SUB_BUCKETS)
+        return (0.5 + (sub + 1) / (2 * SUB_BUCKETS)) * 2.0 ** (exponent + 1) * 1e-6
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th percentile (0-100), in seconds."""
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                # The last bucket also holds everything above its range
+                return self.max if index == N_BUCKETS - 1 else min(self._upper_bound(index), self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "mean_ms": self.total / self.count * 1000 if self.count else 0.0,
+            "p50_ms": self.percentile(50) * 1000,
+            "p90_ms": self.percentile(90) * 1000,
+            "p99_ms": self.percentile(99) * 1000,
+            "max_ms": self.max * 1000,
+        }
+
+
+class Metrics:
+    def __init__(self):
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.started = time.time()
+
+    def histogram(self, name):
+        """The histogram `name`, created on first use (keep it to record without a lookup)."""
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        return histogram
+
+    def incr(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def set(self, name, value):
+        self.gauges[name] = value
+
+    def snapshot(self):
+        return {
+            "uptime_s": time.time() - self.started,
+            "counters": dict(self.counters),
+            "gauges": dict(self.gauges),
+            "latency": {name: histogram.to_dict() for name, histogram in list(self.histograms.items())},
+        }
+
+
+class LagEstimator:
+    """
+    Lag between a sample's firmware timestamp (millis(), board clock) and
+    `now` (host clock, s). The two clocks have an unknown offset, so the lag
+    is measured from the smallest delay seen over the last `window_s`
+    seconds, taken as the fastest possible delivery: a sample delivered as
+    fast as the best one of the window has a lag of 0. The sliding window
+    follows the slow drift of the board's clock.
+    """
+
+    def __init__(self, window_s=60.0, blocks=6):
+        self.block_s = window_s / blocks
+        self._minima = deque(maxlen=blocks)  # (block index, smallest delay in the block)
+
+    def update(self, timestamp_ms, now):
+        delay = now * 1000.0 - timestamp_ms
+        block = int(now // self.block_s)
+        if self._minima and self._minima[-1][0] == block:
+            if delay < self._minima[-1][1]:
+                self._minima[-1] = (block, delay)
+        else:
+            self._minima.append((block, delay))
+        return (delay - min(minimum for _, minimum in self._minima)) / 1000.0
+
+
+def write_json(path, data):
+    """Writes `data` atomically: readers of `path` never see a partial file."""
+    temporary = f"{path}.tmp{os.getpid()}"
+    with open(temporary, "w") as file:
+        json.dump(data, file, indent=2)
+    os.replace(temporary, path)
+
+
+class MetricsDumper:
+    """Writes `snapshot()` to `path` as JSON every `interval` seconds, on a daemon thread."""
+
+    def __init__(self, snapshot, path, interval=5.0):
+        self.snapshot = snapshot
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="metrics-dump", daemon=True)
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.dump()
+
+    def dump(self):
+        write_json(self.path, {"time": time.time(), **self.snapshot()})
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stops the thread and writes a last snapshot."""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self.dump()
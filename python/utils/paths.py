@@ -0,0 +1,7 @@
+"""
+Data folders shared by the acquisition, training and inference code.
+"""
+import os
+
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "data", "models")
@@ -0,0 +1,127 @@
+"""
+Shared-memory ring buffer of live samples.
+
+The acquisition process appends every filtered sample (timestamp, resistance,
+grip state) to a fixed-size ring per sensor in a `multiprocessing`
+shared-memory block; the app reads them from there to draw the live
+dashboard, without files, pipes or locks on the acquisition side.
+
+One writer, any number of readers. The writer stores the sample and then
+increments the sensor's counter, so a reader never sees a slot before it is
+written. A reader that falls more than `capacity` samples behind, or whose
+copy is overwritten while it reads, loses the oldest samples and gets the
+rest; it is never blocked and never blocks the writer.
+
+Layout of the block: int64 header (capacity, n_sensors, one counter per
+sensor), then the timestamp (u4, ms), resistance (f4) and state (u1) columns,
+each `n_sensors * capacity` long.
+"""
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+NUM_SENSORS = 5
+# Samples kept per sensor: more than 3 hours at 10 Hz
+CAPACITY = 1 << 17
+
+
+class SampleRing:
+    def __init__(self, shm, owner=False):
+        self._shm = shm
+        self.owner = owner
+        capacity, n_sensors = np.ndarray(2, dtype=np.int64, buffer=shm.buf)
+        self.capacity, self.n_sensors = int(capacity), int(n_sensors)
+
+        offset = 8 * 2
+        self._counts = np.ndarray(n_sensors, dtype=np.int64, buffer=shm.buf, offset=offset)
+        offset += 8 * n_sensors
+        columns = []
+        for dtype in ("<u4", "<f4", "u1"):
+            column = np.ndarray((n_sensors, capacity), dtype=dtype, buffer=shm.buf, offset=offset)
+            offset += column.nbytes
+            columns.append(column)
+        self._timestamps, self._values, self._states = columns
+
+    @staticmethod
+    def size(capacity=CAPACITY, n_sensors=NUM_SENSORS):
+        return 8 * (2 + n_sensors) + n_sensors * capacity * (4 + 4 + 1)
+
+    @classmethod
+    def create(cls, capacity=CAPACITY, n_sensors=NUM_SENSORS, name=None):
+        shm = shared_memory.SharedMemory(name=name, create=True, size=cls.size(capacity, n_sensors))
+        header = np.ndarray(2 + n_sensors, dtype=np.int64, buffer=shm.buf)
+        header[:] = 0
+        header[:2] = capacity, n_sensors
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        return cls(shared_memory.SharedMemory(name=name))
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    # ---------- Writer ----------
+
+    def append(self, sensor_id, timestamp, value, state=0):
+        column = sensor_id - 1
+        count = self._counts[column]
+        slot = count % self.capacity
+        self._timestamps[column, slot] = timestamp
+        self._values[column, slot] = value
+        self._states[column, slot] = state
+        # Published last: readers only look at slots below the counter
+        self._counts[column] = count + 1
+
+    # ---------- Readers ----------
+
+    def count(self, sensor_id):
+        """Samples appended for this sensor since the ring was created."""
+        return int(self._counts[sensor_id - 1])
+
+    def read(self, sensor_id, start=0):
+        """
+        Copies of the samples of `sensor_id` from absolute index `start` on:
+        (timestamps, values, states, next_start). Samples already overwritten
+        are skipped; pass `next_start` to the next call to get only new ones.
+        """
+        column = sensor_id - 1
+        end = int(self._counts[column])
+        start = max(start, end - self.capacity, 0)
+        if start >= end:
+            return np.empty(0, "<u4"), np.empty(0, "<f4"), np.empty(0, "u1"), end
+
+        first, last = start % self.capacity, end % self.capacity
+        if first < last:
+            parts = [slice(first, last)]
+        else:
+            parts = [slice(first, self.capacity), slice(0, last)]
+        copies = [np.concatenate([column_data[column, part] for part in parts])
+                  for column_data in (self._timestamps, self._values, self._states)]
+
+        # Drop what the writer overwrote while we were copying (the slot of
+        # the sample being written, not yet counted, included)
+        overwritten = int(self._counts[column]) + 1 - self.capacity - start
+        if overwritten > 0:
+            copies = [copy[overwritten:] for copy in copies]
+        return (*copies, end)
+
+    # ---------- Lifetime ----------
+
+    def close(self):
+        # Views on the block must be released before it can be closed
+        self._counts = self._timestamps = self._values = self._states = None
+        self._shm.close()
+
+    def unlink(self):
+        self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        if self.owner:
+            self.unlink()
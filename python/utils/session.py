@@ -0,0 +1,554 @@
+"""
+Binary session files (.kms).
+
+One append-only file per recording session: a 32-byte header followed by
+segments. A segment holds consecutive samples of one sensor, stored by
+column:
+
+    sensor u8 | reserved (3 bytes) | count u32
+    timestamp u32[count] (ms) | resistance f32[count] | label u8[count] (optional) | status u8[count] (optional)
+
+padded to a multiple of 8 bytes. `status` flags each sample (bit 0: ADC
+saturated, the resistance is the clipped value from
+acquisition/calibration.py, not a measurement).
+
+The writer emits one segment per sensor each time it writes its buffers,
+and `compact` (run when a recording is closed) rewrites the file with a
+single segment per sensor. `open_session` maps the file with `np.memmap` and
+only reads the segment headers: the columns of a sensor
+(`session.sensor(2)["resistance"]`, ...) are then zero-copy slices of the
+file, and a sensor still spread over several segments costs a copy of its
+own samples only. A writer killed mid-segment leaves a partial segment at
+the end of the file, which the reader ignores and `recover` removes.
+
+Version 1 files (interleaved `sensor | timestamp | resistance | ...`
+records) are still read; `compact` converts them.
+
+Usage: python python/utils/session.py export data_session.kms output_dir
+       python python/utils/session.py recover data_session.kms
+       python python/utils/session.py compact data_session.kms
+"""
+import argparse
+import os
+import struct
+import time
+from collections import deque
+
+import numpy as np
+
+
+MAGIC = b"KEMONO\x00\x00"
+# 1: interleaved records, 2: per-sensor column segments
+VERSION = 2
+HEADER_DTYPE = np.dtype([
+    ("magic", "S8"),
+    ("version", "<u2"),
+    ("n_sensors", "<u2"),
+    ("flags", "<u4"),
+    ("reserved", "u1", (16,)),
+])
+HEADER_SIZE = HEADER_DTYPE.itemsize
+FLAG_LABELS = 0x1
+FLAG_STATUS = 0x2
+STATUS_SATURATED = 0x1
+
+SEGMENT_HEADER = struct.Struct("<B3xI")
+SEGMENT_ALIGNMENT = 8
+
+SESSION_EXTENSION = ".kms"
+CSV_PATTERN = "data_capteur{}_filtered.csv"
+
+
+def record_dtype(labels=False, status=False):
+    """One interleaved record: the layout of version 1 files and of `Session.records`."""
+    fields = [("sensor", "u1"), ("timestamp", "<u4"), ("resistance", "<f4")]
+    if labels:
+        fields.append(("label", "u1"))
+    if status:
+        fields.append(("status", "u1"))
+    return np.dtype(fields)
+
+
+def column_dtypes(labels=False, status=False):
+    """(name, dtype) of the columns of a segment, in file order."""
+    dtype = record_dtype(labels, status)
+    return [(name, dtype[name]) for name in dtype.names[1:]]
+
+
+def segment_size(count, columns):
+    size = SEGMENT_HEADER.size + count * sum(dtype.itemsize for _, dtype in columns)
+    return -(-size // SEGMENT_ALIGNMENT) * SEGMENT_ALIGNMENT
+
+
+def segment_columns(data, offset, count, columns):
+    """Views of the columns of a segment whose samples start at `offset` in the uint8 array `data`."""
+    views = {}
+    for name, dtype in columns:
+        views[name] = data[offset:offset + count * dtype.itemsize].view(dtype)
+        offset += count * dtype.itemsize
+    return views
+
+
+def pack_segment(sensor_id, values, columns):
+    """Bytes (uint8 array) of a segment holding `values` ({column: array})."""
+    count = len(values["timestamp"])
+    data = np.zeros(segment_size(count, columns), dtype=np.uint8)
+    SEGMENT_HEADER.pack_into(data, 0, sensor_id, count)
+    for name, view in segment_columns(data, SEGMENT_HEADER.size, count, columns).items():
+        view[:] = values.get(name, 0)
+    return data
+
+
+class Columns:
+    """
+    Samples of one sensor, by column: `columns["timestamp"]`, ... (views of
+    the session file when the sensor is in a single segment).
+    """
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    def __len__(self):
+        return len(self.arrays["timestamp"])
+
+    def select(self, mask):
+        return Columns({name: array[mask] for name, array in self.arrays.items()})
+
+
+# ========== WRITER ==========
+
+# Segment buffers kept for reuse per sensor by a background writer (see SessionWriter)
+CHUNK_POOL = 4
+
+
+class _SegmentBuffer:
+    """A sensor's segment being filled: full-size columns, packed behind the header when sealed."""
+
+    def __init__(self, capacity, columns):
+        self.data = np.zeros(segment_size(capacity, columns), dtype=np.uint8)
+        self.columns = segment_columns(self.data, SEGMENT_HEADER.size, capacity, columns)
+        self.length = 0
+
+    def pack(self, sensor_id):
+        """The segment bytes; the columns are moved down behind the filled part of the previous one."""
+        count = self.length
+        SEGMENT_HEADER.pack_into(self.data, 0, sensor_id, count)
+        offset = SEGMENT_HEADER.size
+        for column in self.columns.values():
+            size = count * column.itemsize
+            self.data[offset:offset + size] = column[:count].view(np.uint8)
+            offset += size
+        end = -(-offset // SEGMENT_ALIGNMENT) * SEGMENT_ALIGNMENT
+        self.data[offset:end] = 0
+        return self.data[:end]
+
+
+class SessionWriter:
+    """
+    Appends samples to a session file. Each sensor's samples are stored in a
+    preallocated segment buffer of `buffer_size` samples, which is written
+    when full; every buffer is written when the oldest pending sample is
+    older than `flush_interval` seconds, or on `flush`.
+
+    With `writer` (a utils.diskwriter.DiskWriter), sealed segments are
+    written on the writer thread, then returned to a pool of `CHUNK_POOL`
+    buffers per sensor: `append` never waits on the disk and memory does not
+    grow with the length of the session. A new buffer is only allocated when
+    the disk falls behind (counted in `overruns`).
+
+    With `append=True`, an existing session is continued after `recover`
+    has removed the partial segment a crash may have left at its end.
+    """
+
+    def __init__(self, path, n_sensors=5, labels=False, buffer_size=512, writer=None, flush_interval=None,
+                 append=False, status=False):
+        self.path = path
+        self.labels = labels
+        self.status = status
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.columns = column_dtypes(labels, status)
+        self.writer = writer
+        self.overruns = 0
+        self._closed = False
+        self._segments = {}  # sensor -> _SegmentBuffer being filled
+        self._deadline = None
+        # Buffers written by the writer thread come back here (deque appends are thread-safe)
+        self._free = deque(_SegmentBuffer(buffer_size, self.columns)
+                           for _ in range(CHUNK_POOL * n_sensors if writer else 0))
+
+        self.resumed = append and os.path.exists(path) and os.path.getsize(path) > 0
+        if self.resumed:
+            recover(path)
+            session = Session(path)
+            if session.version != VERSION:
+                raise ValueError(f"{path}: cannot append to a version {session.version} session, "
+                                 f"convert it with `session.py compact`")
+            if session.n_sensors != n_sensors or session.has_labels != labels or session.has_status != status:
+                raise ValueError(f"{path}: cannot append, the session has {session.n_sensors} sensors "
+                                 f"(labels: {session.has_labels}, status: {session.has_status})")
+        mode = "ab" if self.resumed else "wb"
+        self._file = writer.open(path, mode) if writer is not None else open(path, mode)
+        if not self.resumed:
+            self._file.write(session_header(n_sensors, labels, status))
+            self._file.flush()
+
+    def append(self, sensor_id, timestamp, resistance, label=0, status=0):
+        segment = self._segments.get(sensor_id)
+        if segment is None:
+            segment = self._segments[sensor_id] = self._take_buffer(first=True)
+        index = segment.length
+        columns = segment.columns
+        columns["timestamp"][index] = timestamp
+        columns["resistance"][index] = resistance
+        if self.labels:
+            columns["label"][index] = label
+        if self.status:
+            columns["status"][index] = status
+        segment.length = index + 1
+        if segment.length == self.buffer_size:
+            self._seal(sensor_id)
+        if self.flush_interval is not None:
+            now = time.monotonic()
+            if self._deadline is None:
+                self._deadline = now + self.flush_interval
+            elif now >= self._deadline:
+                self._seal_all()
+
+    def tick(self, now=None):
+        """
+        Writes the pending samples once the oldest is older than
+        `flush_interval`. `append` only checks on new samples: call this
+        periodically so that a quiet sensor does not keep samples in memory.
+        """
+        if self._deadline is not None and (now if now is not None else time.monotonic()) >= self._deadline:
+            self._seal_all()
+
+    def append_many(self, sensor_ids, timestamps, resistances, labels=None, status=None):
+        """Vectorized append; sensor_ids may be a single id for the whole block."""
+        values = {"timestamp": np.asarray(timestamps), "resistance": np.asarray(resistances)}
+        if self.labels:
+            values["label"] = np.broadcast_to(0 if labels is None else labels, values["timestamp"].shape)
+        if self.status:
+            values["status"] = np.broadcast_to(0 if status is None else status, values["timestamp"].shape)
+        self._seal_all()
+        if np.ndim(sensor_ids) == 0:
+            self._write(pack_segment(int(sensor_ids), values, self.columns))
+            return
+        sensor_ids = np.asarray(sensor_ids)
+        for sensor_id in dict.fromkeys(sensor_ids.tolist()):
+            mask = sensor_ids == sensor_id
+            self._write(pack_segment(sensor_id, {name: array[mask] for name, array in values.items()}, self.columns))
+
+    def _write(self, data, on_written=None):
+        if self.writer is None:
+            self._file.write(data)
+        else:
+            self.writer.submit(self._file, data, on_written)
+
+    def _take_buffer(self, first=False):
+        try:
+            return self._free.popleft()
+        except IndexError:
+            if not first:
+                self.overruns += 1
+            return _SegmentBuffer(self.buffer_size, self.columns)
+
+    def _seal(self, sensor_id):
+        """Writes a sensor's pending samples as one segment and starts a new buffer."""
+        segment = self._segments[sensor_id]
+        if segment.length == 0:
+            return
+        data = segment.pack(sensor_id)
+        if self.writer is None:
+            self._file.write(data)
+            segment.length = 0
+            return
+
+        def release():
+            segment.length = 0
+            self._free.append(segment)
+
+        self._write(data, release)
+        self._segments[sensor_id] = self._take_buffer()
+
+    def _seal_all(self):
+        self._deadline = None
+        for sensor_id in list(self._segments):
+            self._seal(sensor_id)
+
+    def flush(self):
+        """Writes the pending samples (with a writer, only queues them: see DiskWriter.flush)."""
+        self._seal_all()
+        if self.writer is None:
+            self._file.flush()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._seal_all()
+        if self.writer is not None:
+            self.writer.close_file(self._file)
+        else:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def session_header(n_sensors, labels=False, status=False, version=VERSION):
+    header = np.zeros((), dtype=HEADER_DTYPE)
+    header["magic"] = MAGIC
+    header["version"] = version
+    header["n_sensors"] = n_sensors
+    header["flags"] = (FLAG_LABELS if labels else 0) | (FLAG_STATUS if status else 0)
+    return header.tobytes()
+
+
+def recover(path):
+    """
+    Removes the partial record or segment an interrupted writer may have
+    left at the end of a session file, so that it can be appended to.
+    Returns the number of complete samples and of bytes removed.
+    """
+    session = Session(path)
+    count, size = len(session), session.size
+    del session  # release the memory map before truncating
+    removed = os.path.getsize(path) - size
+    if removed:
+        os.truncate(path, size)
+    return count, removed
+
+
+def compact(path):
+    """
+    Rewrites a session with one segment per sensor (atomically: temporary
+    file then os.replace), so that every sensor is read without a copy.
+    Version 1 files are converted. Returns the number of segments before.
+    """
+    session = Session(path)
+    before = session.segment_count
+    if session.version == VERSION and before == len(session.sensor_ids):
+        return before
+    temporary = f"{path}.tmp{os.getpid()}"
+    with open(temporary, "wb") as file:
+        file.write(session_header(session.n_sensors, session.has_labels, session.has_status))
+        for sensor_id in session.sensor_ids:
+            file.write(pack_segment(sensor_id, session.sensor(sensor_id).arrays, session.columns))
+    del session  # release the memory map before replacing the file
+    os.replace(temporary, path)
+    return before
+
+
+# ========== READER ==========
+
+class Session:
+    """Memory-mapped view of a session file."""
+
+    def __init__(self, path):
+        self.path = path
+        header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)
+        if len(header) == 0 or header[0]["magic"] != MAGIC.rstrip(b"\x00"):
+            raise ValueError(f"{path} is not a K'e-mono session file")
+        header = header[0]
+        self.version = int(header["version"])
+        if self.version > VERSION:
+            raise ValueError(f"{path}: unsupported session version {self.version}")
+
+        self.n_sensors = int(header["n_sensors"])
+        self.has_labels = bool(header["flags"] & FLAG_LABELS)
+        self.has_status = bool(header["flags"] & FLAG_STATUS)
+        self.dtype = record_dtype(self.has_labels, self.has_status)
+        self.columns = column_dtypes(self.has_labels, self.has_status)
+        self._records = None
+        self._segments = {}  # sensor -> [(offset of the samples, count)], in file order
+        if self.version == 1:
+            self._open_records()
+        else:
+            self._open_segments()
+
+    def _open_records(self):
+        # Ignore a partial record left by an interrupted writer
+        count = (os.path.getsize(self.path) - HEADER_SIZE) // self.dtype.itemsize
+        if count > 0:
+            self._records = np.memmap(self.path, dtype=self.dtype, mode="r", offset=HEADER_SIZE, shape=(count,))
+        else:
+            self._records = np.empty(0, dtype=self.dtype)
+        self.size = HEADER_SIZE + count * self.dtype.itemsize
+        self.segment_count = 0
+
+    def _open_segments(self):
+        file_size = os.path.getsize(self.path)
+        self._data = np.memmap(self.path, dtype=np.uint8, mode="r") if file_size > HEADER_SIZE else None
+        offset, self.segment_count = HEADER_SIZE, 0
+        # Only the segment headers are read; a partial segment at the end is ignored
+        while offset + SEGMENT_HEADER.size <= file_size:
+            sensor_id, count = SEGMENT_HEADER.unpack_from(self._data, offset)
+            end = offset + segment_size(count, self.columns)
+            if end > file_size:
+                break
+            self._segments.setdefault(sensor_id, []).append((offset + SEGMENT_HEADER.size, count))
+            self.segment_count += 1
+            offset = end
+        self.size = offset
+
+    def __len__(self):
+        if self._records is not None:
+            return len(self._records)
+        return sum(count for segments in self._segments.values() for _, count in segments)
+
+    @property
+    def sensor_ids(self):
+        if self._records is not None:
+            return np.unique(self._records["sensor"]).tolist()
+        return sorted(sensor_id for sensor_id, segments in self._segments.items()
+                      if any(count for _, count in segments))
+
+    @property
+    def records(self):
+        """
+        Every sample as interleaved `record_dtype` records: the file itself
+        for version 1, a copy (sensor after sensor) for segmented files.
+        """
+        if self._records is None:
+            records = np.empty(len(self), dtype=self.dtype)
+            start = 0
+            for sensor_id in self.sensor_ids:
+                columns = self.sensor(sensor_id)
+                part = records[start:start + len(columns)]
+                part["sensor"] = sensor_id
+                for name, array in columns.arrays.items():
+                    part[name] = array
+                start += len(columns)
+            self._records = records
+        return self._records
+
+    @property
+    def timestamps(self):
+        return self.records["timestamp"]
+
+    @property
+    def resistances(self):
+        return self.records["resistance"]
+
+    def sensor(self, sensor_id):
+        """Columns of one sensor, in arrival order."""
+        if self.version == 1:
+            records = self._records[self._records["sensor"] == sensor_id]
+            return Columns({name: records[name] for name, _ in self.columns})
+        parts = [segment_columns(self._data, offset, count, self.columns)
+                 for offset, count in self._segments.get(sensor_id, [])]
+        if len(parts) == 1:
+            return Columns(parts[0])
+        return Columns({name: np.concatenate([part[name] for part in parts]) if parts else np.empty(0, dtype)
+                        for name, dtype in self.columns})
+
+    def measured(self, sensor_id):
+        """Columns of one sensor without the saturated samples (the model input)."""
+        columns = self.sensor(sensor_id)
+        if self.has_status:
+            saturated = (columns["status"] & STATUS_SATURATED) != 0
+            if saturated.any():
+                columns = columns.select(~saturated)
+        return columns
+
+    def to_dataframe(self, sensor_id):
+        """Timestamp / Resistance (/ ButtonState / Saturated) DataFrame of one sensor, like the CSV files."""
+        import pandas as pd
+
+        records = self.sensor(sensor_id)
+        columns = {"Timestamp": records["timestamp"], "Resistance": records["resistance"]}
+        if self.has_labels:
+            columns["ButtonState"] = records["label"]
+        if self.has_status:
+            columns["Saturated"] = records["status"] & STATUS_SATURATED
+        return pd.DataFrame(columns)
+
+
+def open_session(path):
+    return Session(path)
+
+
+def read_sensor_dataframe(path, sensor_id=None):
+    """
+    Reads one sensor from a session file, or a CSV file as before. Lets the
+    training and inference scripts take either format.
+    """
+    if path.endswith(SESSION_EXTENSION):
+        session = open_session(path)
+        if sensor_id is None:
+            sensor_ids = session.sensor_ids
+            if len(sensor_ids) != 1:
+                raise ValueError(f"{path} holds several sensors, choose one of {sensor_ids}")
+            sensor_id = sensor_ids[0]
+        return session.to_dataframe(sensor_id)
+
+    import pandas as pd
+    return pd.read_csv(path)
+
+
+# ========== CSV EXPORT ==========
+
+def export_csv(path, output_dir=".", pattern=CSV_PATTERN):
+    """Writes one CSV file per sensor, in the format of the acquisition CSV files."""
+    session = open_session(path)
+    written = []
+    for sensor_id in session.sensor_ids:
+        records = session.sensor(sensor_id)
+        columns = [records["timestamp"].astype(np.int64), records["resistance"].astype(np.int64)]
+        header = "Timestamp,Resistance"
+        if session.has_labels:
+            columns.append(records["label"])
+            header += ",ButtonState"
+        if session.has_status:
+            columns.append(records["status"] & STATUS_SATURATED)
+            header += ",Saturated"
+        output = os.path.join(output_dir, pattern.format(sensor_id))
+        np.savetxt(output, np.column_stack(columns), fmt="%d", delimiter=",", header=header, comments="")
+        written.append(output)
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="K'e-mono session files.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export = subparsers.add_parser("export", help="Export a session to one CSV file per sensor")
+    export.add_argument("session")
+    export.add_argument("output_dir", nargs="?", default=".")
+    info = subparsers.add_parser("info", help="Print a session summary")
+    info.add_argument("session")
+    repair = subparsers.add_parser("recover", help="Remove the partial segment left by an interrupted recording")
+    repair.add_argument("session")
+    rewrite = subparsers.add_parser("compact", help="Rewrite a session with one segment per sensor")
+    rewrite.add_argument("session")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        for output in export_csv(args.session, args.output_dir):
+            print(output)
+    elif args.command == "recover":
+        count, removed = recover(args.session)
+        print(f"{args.session}: {count} records, {removed} bytes removed")
+    elif args.command == "compact":
+        before = compact(args.session)
+        print(f"{args.session}: {before} segments -> {Session(args.session).segment_count}")
+    else:
+        session = open_session(args.session)
+        print(f"{args.session}: {len(session)} records (version {session.version}, "
+              f"{session.segment_count} segments), labels: {session.has_labels}")
+        for sensor_id in session.sensor_ids:
+            records = session.sensor(sensor_id)
+            saturated = f", {len(records) - len(session.measured(sensor_id))} saturated" if session.has_status else ""
+            print(f"  sensor {sensor_id}: {len(records)} samples{saturated}, "
+                  f"{records['timestamp'].min()}-{records['timestamp'].max()} ms")
+
+
+if __name__ == "__main__":
+    main()